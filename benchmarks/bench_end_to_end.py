@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark against local stand-ins for the registry and Webflow
+Drives ShareholderScraper.run_scraper and WebflowAPI.update_shareholders (plus a
+full-register stream) and records wall time, request count and bytes per phase.
+No network access is needed.
+
+    python benchmarks/bench_end_to_end.py
+    python benchmarks/bench_end_to_end.py --sizes 20 5000 50000 --latency 0.05 --json e2e.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from standins import RegistryStandIn, WebflowStandIn  # noqa: E402
+
+
+def configure_environment(registry, webflow, rate_limit, state_dir):
+    """Point the pipeline at the stand-ins; must run before the shareholder modules are imported"""
+    os.environ.update({
+        'REGISTRY_BASE_URL': registry.url,
+        'REGISTRY_USERNAME': registry.username,
+        'REGISTRY_PASSWORD': registry.password,
+        'TWOFA_CODE': registry.code,
+        'WEBFLOW_BASE_URL': webflow.url,
+        'WEBFLOW_API_TOKEN': 'bench-token',
+        'WEBFLOW_COLLECTION_ID': 'bench-collection',
+        'WEBFLOW_RATE_LIMIT': str(rate_limit),
+        'SHAREHOLDER_STATE_DIR': state_dir,
+        'SESSION_CACHE_KEY': '',
+    })
+
+
+class PhaseRecorder:
+    def __init__(self, registry, webflow):
+        self.servers = {'registry': registry, 'webflow': webflow}
+        self.results = []
+
+    def run(self, scenario, phase, fn):
+        before = {name: server.stats.snapshot() for name, server in self.servers.items()}
+        started = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - started
+        result = {'scenario': scenario, 'phase': phase, 'seconds': elapsed}
+        for name, server in self.servers.items():
+            after = server.stats.snapshot()
+            result[f'{name}_requests'] = after['requests'] - before[name]['requests']
+            result[f'{name}_bytes'] = (after['bytes_in'] + after['bytes_out']
+                                       - before[name]['bytes_in'] - before[name]['bytes_out'])
+        self.results.append(result)
+        return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[20, 5000], help='Register sizes to serve')
+    parser.add_argument('--page-size', type=int, default=500, help='Register rows per page')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of latency added to every response')
+    parser.add_argument('--webflow-rate', type=int, default=600, help='Webflow requests/minute (client and stand-in)')
+    parser.add_argument('--server-rate', type=int, help='Stand-in rate limit if different, to exercise 429 handling')
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline logging')
+    args = parser.parse_args()
+
+    orgnrs = {str(900000001 + i): size for i, size in enumerate(args.sizes)}
+    registry = RegistryStandIn(registers=orgnrs, page_size=args.page_size, latency=args.latency).start()
+    webflow = WebflowStandIn(rate_limit=args.server_rate or args.webflow_rate, latency=args.latency).start()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        configure_environment(registry, webflow, args.webflow_rate, state_dir)
+        logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+        from shareholder_config import Config
+        from shareholder_scraper import ShareholderScraper
+        from shareholder_webflow_api import WebflowAPI
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        recorder = PhaseRecorder(registry, webflow)
+        for orgnr, size in orgnrs.items():
+            scenario = f'register={size}'
+            Config.TARGET_ORGNR = orgnr
+            scraper = ShareholderScraper()
+            shareholders = recorder.run(scenario, 'scrape (login + top-N)', scraper.run_scraper)
+            assert shareholders, 'scrape returned no rows'
+
+            webflow_api = WebflowAPI(collection_id=f'collection-{orgnr}')
+            recorder.run(scenario, 'sync cold', lambda: webflow_api.update_shareholders(shareholders))
+            recorder.run(scenario, 'sync unchanged', lambda: webflow_api.update_shareholders(shareholders))
+            changed = [s._replace(holdings=s.holdings + 1000) if s.rank % 5 == 0 else s for s in shareholders]
+            recorder.run(scenario, 'sync 20% changed', lambda: webflow_api.update_shareholders(changed))
+            webflow_api.transport.close()
+
+            rows = recorder.run(scenario, 'stream full register', lambda: sum(1 for _ in scraper.iter_register(orgnr)))
+            assert rows == size, f'streamed {rows} of {size} rows'
+
+    registry.stop()
+    webflow.stop()
+
+    print(f"{'scenario':<16} {'phase':<24} {'seconds':>8} {'reg req':>8} {'reg KB':>9} {'wf req':>7} {'wf KB':>7}")
+    for r in recorder.results:
+        print(f"{r['scenario']:<16} {r['phase']:<24} {r['seconds']:>8.3f} {r['registry_requests']:>8} "
+              f"{r['registry_bytes'] / 1024:>9.1f} {r['webflow_requests']:>7} {r['webflow_bytes'] / 1024:>7.1f}")
+    if webflow.throttled:
+        print(f"Webflow stand-in throttled {webflow.throttled} requests with 429")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(recorder.results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Parser benchmark for the shareholder table
+Runs every backend over saved registry HTML fixtures and reports rows/sec and peak memory.
+Before timing, it checks that every backend returns the same rows and next-page link
+for each fixture, and fails if one does not.
+
+    python benchmarks/bench_parser.py                       # saved fixtures only
+    python benchmarks/bench_parser.py --rows 1000 20000     # plus synthetic pages of these sizes
+    python benchmarks/bench_parser.py --json out.json --compare baseline.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT)
+
+from shareholder_parser import BACKENDS, parse_page, parse_shareholders  # noqa: E402
+
+
+def measure(backend: str, path: str, repeat: int) -> dict:
+    """Time one backend on one fixture; run in a fresh process so RSS is not shared"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    parse_shareholders(content, backend)  # warm up imports
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    rows = parse_shareholders(content, backend)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse_shareholders(content, backend)
+    elapsed = (time.perf_counter() - started) / repeat
+
+    return {
+        'backend': backend,
+        'fixture': os.path.basename(path),
+        'bytes': len(content),
+        'rows': len(rows),
+        'seconds': elapsed,
+        'rows_per_sec': len(rows) / elapsed if elapsed else 0.0,
+        'py_peak_kb': py_peak // 1024,
+        # libxml2 allocates outside the Python heap, so also report the RSS high-water growth
+        'rss_growth_kb': max(0, rss_after - rss_before),
+    }
+
+
+def mismatches(paths, backends) -> list:
+    """(fixture, backend) pairs whose rows or next-page link differ from the first backend's"""
+    found = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = f.read()
+        expected = parse_page(content, backends[0])
+        found.extend((os.path.basename(path), backend) for backend in backends[1:]
+                     if parse_page(content, backend) != expected)
+    return found
+
+
+def run_isolated(backend: str, path: str, repeat: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, '--worker', backend, path, '--repeat', str(repeat)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def generate_fixtures(sizes, directory):
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    from registry_pages import make_rows, render_security_page
+
+    paths = []
+    for size in sizes:
+        path = os.path.join(directory, f'security_synthetic_{size}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render_security_page(make_rows(size)))
+        paths.append(path)
+    return paths
+
+
+def compare(results, baseline_path, tolerance):
+    """Return the (fixture, backend) pairs that got slower than the baseline by more than ``tolerance``"""
+    with open(baseline_path) as f:
+        baseline = {(r['fixture'], r['backend']): r for r in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['fixture'], result['backend']))
+        if previous and result['rows_per_sec'] < previous['rows_per_sec'] * (1 - tolerance):
+            regressions.append((result['fixture'], result['backend'], previous['rows_per_sec'], result['rows_per_sec']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', nargs='*', type=int, default=[], help='Also benchmark synthetic pages with this many rows')
+    parser.add_argument('--backend', nargs='*', default=sorted(BACKENDS), help='Backends to run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='Fail if slower than this earlier --json output')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed rows/sec drop for --compare')
+    parser.add_argument('--worker', nargs=2, metavar=('BACKEND', 'FIXTURE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker[0], args.worker[1], args.repeat)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = sorted(glob.glob(os.path.join(FIXTURES, '*.html'))) + generate_fixtures(args.rows, tmp)
+        different = mismatches(fixtures, args.backend)
+        for fixture, backend in different:
+            print(f"MISMATCH {fixture}: {backend} output differs from {args.backend[0]}")
+        if different:
+            return 1
+        results = [run_isolated(backend, path, args.repeat) for path in fixtures for backend in args.backend]
+
+    print(f"{'fixture':<32} {'backend':<6} {'rows':>7} {'ms':>9} {'rows/sec':>11} {'py peak KB':>11} {'rss +KB':>9}")
+    for r in results:
+        print(f"{r['fixture']:<32} {r['backend']:<6} {r['rows']:>7} {r['seconds'] * 1000:>9.2f} "
+              f"{r['rows_per_sec']:>11.0f} {r['py_peak_kb']:>11} {r['rss_growth_kb']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for fixture, backend, before, after in regressions:
+            print(f"REGRESSION {fixture} [{backend}]: {before:.0f} -> {after:.0f} rows/sec")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
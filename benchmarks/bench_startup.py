@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the scraper entry points
+Imports each entry point in a fresh interpreter under ``python -X importtime``
+and reports the median import time, process wall time and module count, plus
+the modules with the most self time. ``eager`` imports shareholder_main
+together with the modules it used to load up front (bs4, asyncio, cProfile),
+as a baseline for the lazy imports.
+
+Lazy imports move work from the import into the first call. ``--first-call``
+therefore times cold start plus one full run (login, scrape, sync) against the
+stand-in servers, with fresh servers and state each time, so the comparison
+includes the imports the handler defers.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --first-call --repeat 5
+    python benchmarks/bench_startup.py --repeat 20 --top 15 --json out.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))  # stand-ins for --first-call
+
+TARGETS = {
+    'lambda': 'import shareholder_lambda',
+    'main': 'import shareholder_main',
+    'eager': 'import shareholder_main, bs4, asyncio, cProfile, pstats',
+    'python': 'pass',
+}
+
+# Cold start plus the first scrape-and-sync (--first-call)
+FIRST_CALL_TARGETS = {
+    'lambda': 'import shareholder_lambda; shareholder_lambda.handler({"action": "run"})',
+    'main': 'import shareholder_main; shareholder_main.main([])',
+    'eager': 'import shareholder_main, bs4, asyncio, cProfile, pstats; shareholder_main.main([])',
+    'python': 'pass',
+}
+
+
+def parse_importtime(stderr: str):
+    """(module, nesting depth, self µs, cumulative µs) for every line of ``-X importtime`` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        rows.append((module.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(code: str, stand_ins: bool = False) -> dict:
+    """Import time, wall time and modules loaded by ``code`` in one fresh interpreter
+
+    With ``stand_ins`` the code runs against new registry and Webflow stand-ins
+    and a new state directory, so every run logs in and syncs from scratch.
+    """
+    servers = ()
+    with tempfile.TemporaryDirectory() as state_dir:
+        env, cwd = None, ROOT
+        if stand_ins:
+            from bench_end_to_end import configure_environment
+            from standins import RegistryStandIn, WebflowStandIn
+
+            # No Webflow rate limit, so it does not dominate the timing
+            servers = (RegistryStandIn().start(), WebflowStandIn(rate_limit=10 ** 6).start())
+            saved = dict(os.environ)
+            configure_environment(*servers, 10 ** 6, state_dir)
+            env = dict(os.environ, PYTHONPATH=ROOT)
+            os.environ.clear()
+            os.environ.update(saved)
+            cwd = state_dir  # metrics, trace and log files land here
+        try:
+            started = time.perf_counter()
+            stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=env, check=True,
+                                    capture_output=True, text=True).stderr
+            wall = time.perf_counter() - started
+        finally:
+            for server in servers:
+                server.stop()
+    rows = parse_importtime(stderr)
+    # A module is listed after the ones it imported, so the code's own imports come after
+    # interpreter startup (which ends with site); of those, depth 0 are imported by the code itself
+    names = [module for module, *_ in rows]
+    code_rows = rows[names.index('site') + 1:] if 'site' in names else rows
+    return {
+        'wall_ms': wall * 1000,
+        'import_ms': sum(cumulative for _, depth, _, cumulative in code_rows if depth == 0) / 1000,
+        'modules': len(code_rows),
+        'self_us': {module: self_us for module, _, self_us, _ in code_rows},
+    }
+
+
+def benchmark(name: str, code: str, repeat: int, top: int, stand_ins: bool = False) -> dict:
+    runs = [measure(code, stand_ins) for _ in range(repeat)]
+    self_us = {}
+    for run in runs:
+        for module, value in run['self_us'].items():
+            self_us.setdefault(module, []).append(value)
+    heaviest = sorted(((statistics.median(values) / 1000, module) for module, values in self_us.items()), reverse=True)
+    return {
+        'target': name,
+        'code': code,
+        'import_ms': statistics.median(run['import_ms'] for run in runs),
+        'wall_ms': statistics.median(run['wall_ms'] for run in runs),
+        'modules': statistics.median(run['modules'] for run in runs),
+        'heaviest': [{'module': module, 'self_ms': round(ms, 2)} for ms, module in heaviest[:top]],
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Return the targets whose import time grew by more than ``tolerance`` over the baseline"""
+    with open(baseline_path) as f:
+        baseline = {r['target']: r for r in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['target'])
+        if previous and result['import_ms'] > previous['import_ms'] * (1 + tolerance):
+            regressions.append((result['target'], previous['import_ms'], result['import_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', nargs='*', choices=list(TARGETS), help='Entry points to run (default: all)')
+    parser.add_argument('--first-call', action='store_true',
+                        help='Time cold start plus one full run against the stand-in servers')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='Heaviest modules to list per target')
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='Fail if slower than this earlier --json output')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed import time growth for --compare')
+    args = parser.parse_args()
+
+    targets = FIRST_CALL_TARGETS if args.first_call else TARGETS
+    results = [benchmark(name, targets[name], args.repeat, args.top, args.first_call)
+               for name in args.target or targets if name in targets]
+
+    print(f"{'target':<8} {'import ms':>10} {'wall ms':>9} {'modules':>8}")
+    for r in results:
+        print(f"{r['target']:<8} {r['import_ms']:>10.1f} {r['wall_ms']:>9.1f} {r['modules']:>8.0f}")
+    for r in results:
+        print(f"\nHeaviest modules for {r['target']} (self time):")
+        for entry in r['heaviest']:
+            print(f"  {entry['self_ms']:>7.2f} ms  {entry['module']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for target, before, after in regressions:
+            print(f"REGRESSION {target}: {before:.1f} -> {after:.1f} ms import time")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+2FA latency benchmark against local registry and IMAP stand-ins
+Logs in with each code provider while the stand-in registry "e-mails" the code
+after a delay, and reports how long the 2FA step took beyond that delay.
+
+    python benchmarks/bench_twofa.py
+    python benchmarks/bench_twofa.py --delays 0.5 5 20 --providers imap fifo
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from standins import ImapStandIn, RegistryStandIn, WebflowStandIn  # noqa: E402
+from bench_end_to_end import configure_environment  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delays', nargs='+', type=float, default=[0.5, 3.0], help='Seconds until the code arrives')
+    parser.add_argument('--providers', nargs='+', default=['imap', 'file', 'fifo'], choices=['imap', 'file', 'fifo'])
+    parser.add_argument('--timeout', type=float, default=60, help='TWOFA_TIMEOUT for each login')
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON')
+    args = parser.parse_args()
+
+    mailbox = ImapStandIn().start()
+    registry = RegistryStandIn().start()
+    webflow = WebflowStandIn().start()
+    results = []
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        configure_environment(registry, webflow, 600, state_dir)
+        code_file = os.path.join(state_dir, 'twofa-code')
+        os.environ.update({
+            'TWOFA_CODE': '',
+            'TWOFA_TIMEOUT': str(args.timeout),
+            'TWOFA_FILE': code_file,
+            'TWOFA_IMAP_HOST': '127.0.0.1',
+            'TWOFA_IMAP_PORT': str(mailbox.port),
+            'TWOFA_IMAP_USERNAME': mailbox.username,
+            'TWOFA_IMAP_PASSWORD': mailbox.password,
+            'TWOFA_IMAP_SSL': 'false',
+        })
+        logging.basicConfig(level=logging.WARNING)
+        from shareholder_config import Config
+        from shareholder_scraper import ShareholderScraper
+
+        for provider in args.providers:
+            Config.TWOFA_PROVIDER = 'imap' if provider == 'imap' else 'file'
+            for delay in args.delays:
+                if os.path.exists(code_file):
+                    os.remove(code_file)
+                if provider == 'fifo':
+                    os.mkfifo(code_file)
+                if provider == 'imap':
+                    registry.mailbox, registry.mail_delay = mailbox, delay
+                else:
+                    registry.mailbox = None
+
+                    def write_code(delay=delay):
+                        time.sleep(delay)
+                        with open(code_file, 'w') as f:
+                            f.write(f'{registry.code}\n')
+                    threading.Thread(target=write_code, daemon=True).start()
+
+                scraper = ShareholderScraper()
+                ok = scraper.login()
+                results.append({'provider': provider, 'delay': delay, 'ok': ok,
+                                'twofa_seconds': scraper.twofa_seconds,
+                                'overshoot': scraper.twofa_seconds - delay})
+
+    registry.stop()
+    webflow.stop()
+    mailbox.stop()
+
+    print(f"{'provider':<8} {'delay':>7} {'2fa s':>7} {'over s':>7} {'ok':>4}")
+    for r in results:
+        print(f"{r['provider']:<8} {r['delay']:>7.2f} {r['twofa_seconds']:>7.2f} {r['overshoot']:>7.2f} "
+              f"{'yes' if r['ok'] else 'no':>4}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
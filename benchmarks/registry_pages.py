@@ -0,0 +1,68 @@
+"""
+Synthetic aksjeeierregisteret.no pages shaped like the real security page
+Used to build parser fixtures and by the local stand-in registry
+"""
+
+import random
+from html import escape
+from typing import List, Tuple
+
+SURNAMES = ['Hansen', 'Johansen', 'Olsen', 'Larsen', 'Andersen', 'Pedersen', 'Nilsen', 'Kristiansen']
+FIRST_NAMES = ['Ole', 'Kari', 'Per', 'Anne', 'Lars', 'Ingrid', 'Jon', 'Marit']
+COMPANIES = ['Stenshagen Invest AS', 'Folketrygdfondet', 'Verdipapirfondet DNB Norge',
+             'The Bank of New York Mellon', 'State Street Bank and Trust Comp', 'Awilhelmsen Capital AS',
+             'JPMorgan Chase Bank, N.A., London', 'Clearstream Banking S.A.']
+
+Row = Tuple[str, str, int]
+
+
+def make_rows(count: int, total_shares: int = 86_000_000, seed: int = 1) -> List[Row]:
+    """Generate ``count`` (surname_company, first_name, holdings) rows sorted by holdings"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        if i < 40 or rng.random() < 0.1:
+            name, first = rng.choice(COMPANIES), ''
+        else:
+            name, first = rng.choice(SURNAMES), rng.choice(FIRST_NAMES)
+        # Heavy-tailed holdings like a real register
+        holdings = max(1, int(total_shares * 0.08 / (i + 1) ** 1.1 * rng.uniform(0.9, 1.0)))
+        rows.append((name, first, holdings))
+    rows.sort(key=lambda row: -row[2])
+    return rows
+
+
+def format_holdings(holdings: int) -> str:
+    return f"{holdings:,}".replace(',', '\xa0')
+
+
+def format_percent(holdings: int, total_shares: int) -> str:
+    return f"{holdings * 100 / total_shares:.2f}".replace('.', ',') + ' %'
+
+
+def render_investor_rows(rows: List[Row], total_shares: int = 86_000_000, start: int = 0) -> str:
+    return ''.join(
+        f'<tr id="investor-{start + i}" class="investor">'
+        f'<td class="name">{escape(name)}</td><td>{escape(first)}</td>'
+        f'<td class="number">{format_holdings(holdings)}</td>'
+        f'<td class="number">{format_percent(holdings, total_shares)}</td></tr>\n'
+        for i, (name, first, holdings) in enumerate(rows)
+    )
+
+
+def render_security_page(rows: List[Row], orgnr: str = '985279721', company: str = 'Protector Forsikring ASA',
+                         total_shares: int = 86_000_000, start: int = 0, next_url: str = '') -> str:
+    """Render a security page with the navigation and chrome around the investor table"""
+    nav = ''.join(f'<li><a href="/content/security/?orgnr={900000000 + i}">Company {i}</a></li>' for i in range(200))
+    pager = f'<a class="next" rel="next" href="{escape(next_url)}">Neste</a>' if next_url else ''
+    return f"""<!DOCTYPE html>
+<html lang="no"><head><meta charset="utf-8"><title>{escape(company)} - Aksjeeierregisteret</title>
+<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script></head>
+<body><header><nav><ul>{nav}</ul></nav><a href="/logout/">Logg ut</a></header>
+<main><h1>{escape(company)}</h1><dl><dt>Org.nr</dt><dd>{orgnr}</dd><dt>Antall aksjer</dt>
+<dd>{format_holdings(total_shares)}</dd></dl>
+<table id="investors" class="table"><thead><tr><th>Etternavn/Selskap</th><th>Fornavn</th>
+<th>Beholdning</th><th>Andel</th></tr></thead><tbody>
+{render_investor_rows(rows, total_shares, start)}</tbody></table>{pager}</main>
+<footer><p>Kilde: Aksjeeierregisteret</p></footer></body></html>
+"""
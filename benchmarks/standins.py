@@ -0,0 +1,422 @@
+"""
+Local stand-ins for aksjeeierregisteret.no, the Webflow CMS API and an IMAP mailbox
+All run on 127.0.0.1 in a background thread, and the HTTP ones count requests and
+bytes, so the scraper and Webflow client can be exercised end to end without network access.
+"""
+
+import hashlib
+import json
+import re
+import secrets
+import shlex
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from registry_pages import make_rows, render_security_page
+
+
+class Stats:
+    """Thread-safe request/byte counters, grouped by route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.by_route: Dict[str, int] = {}
+
+    def add(self, route: str, bytes_in: int, bytes_out: int):
+        with self.lock:
+            self.requests += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.by_route[route] = self.by_route.get(route, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {'requests': self.requests, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                    'by_route': dict(self.by_route)}
+
+
+class StandInServer:
+    """Base class: a threaded HTTP server with counters and an optional per-request latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.stats = Stats()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if server.latency:
+                    time.sleep(server.latency)
+                route, status, headers, payload = server.handle(self, body)
+                # Counted before answering, so a client that got its response sees it in the stats
+                server.stats.add(route, len(body) + len(str(self.headers)), len(payload))
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(payload)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = do_PUT = do_HEAD = _handle
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self) -> 'StandInServer':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle(self, request: BaseHTTPRequestHandler, body: bytes):
+        raise NotImplementedError
+
+
+def _html(body: str, status: int = 200, headers: Optional[List] = None):
+    return status, [('Content-Type', 'text/html; charset=utf-8')] + (headers or []), body.encode('utf-8')
+
+
+class RegistryStandIn(StandInServer):
+    """Login form, e-mail 2FA step, dashboard with company search, and paginated security pages
+
+    ``registers`` maps org numbers to register sizes; pages hold ``page_size``
+    rows and link to the next one with ``rel="next"``. Security pages carry an
+    ETag and answer ``If-None-Match`` with 304. With a ``mailbox``
+    (``ImapStandIn``), each accepted password is followed ``mail_delay`` seconds
+    later by an e-mail carrying the 2FA code.
+    """
+
+    def __init__(self, username: str = 'bench', password: str = 'bench', code: str = '123456',
+                 registers: Optional[Dict[str, int]] = None, page_size: int = 500, latency: float = 0.0,
+                 mailbox: Optional['ImapStandIn'] = None, mail_delay: float = 0.0):
+        super().__init__(latency)
+        self.username, self.password, self.code = username, password, code
+        self.mailbox, self.mail_delay = mailbox, mail_delay
+        self.registers = {orgnr: make_rows(size, seed=int(orgnr) % 1000) for orgnr, size in
+                          (registers or {'985279721': 200}).items()}
+        self.page_size = page_size
+        self.pending: Dict[str, bool] = {}
+        self.sessions: Dict[str, bool] = {}
+
+    def _session(self, request) -> Optional[str]:
+        cookie = SimpleCookie(request.headers.get('Cookie', ''))
+        return cookie['sessionid'].value if 'sessionid' in cookie else None
+
+    def handle(self, request, body):
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+        session = self._session(request)
+        logged_in = session in self.sessions
+
+        if url.path == '/login/' and request.command == 'GET':
+            return ('GET /login/',) + _html(
+                '<html><body><form id="login-form" action="/login/" method="post">'
+                '<input type="hidden" name="csrfmiddlewaretoken" value="t0k3n">'
+                '<input name="username"><input name="password" type="password"></form></body></html>')
+
+        if url.path == '/login/' and request.command == 'POST':
+            if form.get('username') != self.username or form.get('password') != self.password:
+                return ('POST /login/',) + _html('<html><body>Feil brukernavn eller passord</body></html>', 200)
+            pending = secrets.token_hex(8)
+            self.pending[pending] = True
+            if self.mailbox:
+                timer = threading.Timer(self.mail_delay, self.mailbox.deliver,
+                                        args=('noreply@aksjeeierregisteret.no', 'Engangskode',
+                                              f'Din engangskode er {self.code}'))
+                timer.daemon = True
+                timer.start()
+            return ('POST /login/',) + _html(
+                '<html><body><h1>Tofaktor-autentisering</h1><form action="/login/2fa/" method="post">'
+                f'<input type="hidden" name="pending" value="{pending}"><input name="code"></form></body></html>')
+
+        if url.path == '/login/2fa/' and request.command == 'POST':
+            if self.pending.pop(form.get('pending', ''), False) and form.get('code') == self.code:
+                session = secrets.token_hex(16)
+                self.sessions[session] = True
+                return ('POST /login/2fa/',) + _html(
+                    '<html><body>OK</body></html>', headers=[('Set-Cookie', f'sessionid={session}; Path=/; HttpOnly')])
+            return ('POST /login/2fa/',) + _html('<html><body>Feil kode</body></html>', 200)
+
+        if url.path == '/' and request.command == 'GET':
+            nav = '<a href="/logout/">Logg ut</a>' if logged_in else '<a href="/login/">Logg inn</a>'
+            return ('GET /',) + _html(f'<html><body><header>{nav}</header><form><input name="companies-search">'
+                                      '</form></body></html>')
+
+        if url.path == '/' and request.command == 'POST':
+            term = form.get('companies-search', '').lower()
+            rows = ''.join(f'<tr data-orgnr="{orgnr}"><td>Company {orgnr}</td></tr>'
+                           for orgnr in self.registers if term)
+            return ('POST /',) + _html(f'<html><body><table>{rows}</table></body></html>')
+
+        if url.path == '/content/security/':
+            if not logged_in:
+                return 'GET /content/security/', 302, [('Location', '/login/')], b''
+            orgnr = query.get('orgnr', [''])[0]
+            rows = self.registers.get(orgnr)
+            if rows is None:
+                return ('GET /content/security/',) + _html('<html><body>Ukjent selskap</body></html>', 404)
+            page = int(query.get('page', ['0'])[0])
+            start = page * self.page_size
+            next_url = f'/content/security/?orgnr={orgnr}&page={page + 1}' if start + self.page_size < len(rows) else ''
+            payload = render_security_page(rows[start:start + self.page_size], orgnr=orgnr, start=start,
+                                           next_url=next_url).encode('utf-8')
+            etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+            if request.headers.get('If-None-Match') == etag:
+                return 'GET /content/security/', 304, [('ETag', etag)], b''
+            return 'GET /content/security/', 200, [('Content-Type', 'text/html; charset=utf-8'), ('ETag', etag)], payload
+
+        return ('other',) + _html('<html><body>Not found</body></html>', 404)
+
+
+class WebflowStandIn(StandInServer):
+    """Webflow v1 collection items endpoints with a per-minute rate limit
+
+    Supports collection metadata (``lastUpdated`` with an ETag, 304 on
+    If-None-Match), paginated listing, create, patch, single and bulk delete,
+    site domains and site publish (``fail_publish`` makes publishing return
+    500). Requests over ``rate_limit`` in the current minute get 429 with
+    Retry-After; every response carries X-RateLimit-Remaining.
+    """
+
+    ITEM_PATH = re.compile(r'^/collections/([^/]+)/items(?:/([^/]+))?$')
+    COLLECTION_PATH = re.compile(r'^/collections/([^/]+)$')
+
+    def __init__(self, rate_limit: int = 60, latency: float = 0.0, domains: Optional[List[str]] = None):
+        super().__init__(latency)
+        self.rate_limit = rate_limit
+        self.domains = domains if domains is not None else ['bench.example.com']
+        self.fail_publish = False
+        self.collections: Dict[str, Dict[str, Dict]] = {}
+        self.last_updated: Dict[str, str] = {}
+        self.publishes = 0
+        self.throttled = 0
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.lock = threading.Lock()
+
+    def _rate_check(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            remaining = self.rate_limit - self.window_count
+            retry_after = 60 - (now - self.window_start)
+        return remaining, retry_after
+
+    def handle(self, request, body):
+        remaining, retry_after = self._rate_check()
+        url = urlparse(request.path)
+        if remaining < 0:
+            self.throttled += 1
+            return ('429', 429, [('Retry-After', str(max(1, int(retry_after)))), ('X-RateLimit-Remaining', '0')],
+                    b'{"err": "Too Many Requests"}')
+        headers = [('Content-Type', 'application/json'), ('X-RateLimit-Remaining', str(remaining))]
+        data = json.loads(body) if body else {}
+
+        match = self.COLLECTION_PATH.match(url.path)
+        if match and request.command == 'GET':
+            collection_id = match.group(1)
+            with self.lock:
+                last_updated = self.last_updated.setdefault(collection_id, datetime.now(timezone.utc).isoformat())
+            etag = f'"{hashlib.sha1(last_updated.encode()).hexdigest()[:16]}"'
+            route = 'GET /collections/{id}'
+            if request.headers.get('If-None-Match') == etag:
+                return route, 304, [('ETag', etag)], b''
+            payload = {'_id': collection_id, 'name': 'Shareholders', 'lastUpdated': last_updated}
+            return route, 200, headers + [('ETag', etag)], json.dumps(payload).encode()
+
+        match = self.ITEM_PATH.match(url.path)
+        if match:
+            collection_id, item_id = match.groups()
+            with self.lock:
+                items = self.collections.setdefault(collection_id, {})
+                route = f"{request.command} /collections/{{id}}/items{'/{item}' if item_id else ''}"
+
+                if request.command == 'GET' and not item_id:
+                    query = parse_qs(url.query)
+                    offset = int(query.get('offset', ['0'])[0])
+                    limit = min(100, int(query.get('limit', ['100'])[0]))
+                    page = list(items.values())[offset:offset + limit]
+                    payload = {'items': page, 'count': len(page), 'limit': limit, 'offset': offset, 'total': len(items)}
+                    return route, 200, headers, json.dumps(payload).encode()
+
+                if request.command != 'GET':
+                    self.last_updated[collection_id] = datetime.now(timezone.utc).isoformat()
+
+                if request.command == 'POST' and not item_id:
+                    new_id = secrets.token_hex(12)
+                    items[new_id] = dict(data.get('fields', {}), _id=new_id)
+                    return route, 200, headers, json.dumps(items[new_id]).encode()
+
+                if request.command == 'PATCH' and item_id in items:
+                    items[item_id].update(data.get('fields', {}))
+                    return route, 200, headers, json.dumps(items[item_id]).encode()
+
+                if request.command == 'DELETE' and item_id in items:
+                    del items[item_id]
+                    return route, 200, headers, b'{"deleted": 1}'
+
+                if request.command == 'DELETE' and not item_id:
+                    ids = [i for i in data.get('itemIds', []) if i in items]
+                    for i in ids:
+                        del items[i]
+                    return route, 200, headers, json.dumps({'deletedItemIds': ids}).encode()
+
+            return route, 404, headers, b'{"err": "Not found"}'
+
+        if re.match(r'^/sites/[^/]+/domains$', url.path) and request.command == 'GET':
+            payload = [{'_id': secrets.token_hex(12), 'name': domain} for domain in self.domains]
+            return 'GET /sites/{id}/domains', 200, headers, json.dumps(payload).encode()
+
+        if re.match(r'^/sites/[^/]+/publish$', url.path) and request.command == 'POST':
+            if self.fail_publish:
+                return 'POST /sites/{id}/publish', 500, headers, b'{"err": "Internal error"}'
+            self.publishes += 1
+            return 'POST /sites/{id}/publish', 200, headers, b'{"queued": true}'
+
+        return 'other', 404, headers, b'{"err": "Not found"}'
+
+
+class ImapStandIn:
+    """Just enough IMAP4rev1 for the 2FA mailbox poller, over plain TCP
+
+    Handles CAPABILITY, LOGIN, SELECT, NOOP, SEARCH (ALL, UNSEEN, SINCE, FROM),
+    FETCH (RFC822, which marks the message seen, or BODY.PEEK[], which does
+    not), STORE +FLAGS \\Seen and LOGOUT. ``deliver`` drops a message into the
+    single mailbox.
+    """
+
+    def __init__(self, username: str = 'bench', password: str = 'bench'):
+        self.username, self.password = username, password
+        self.messages: List[Dict] = []
+        self.lock = threading.Lock()
+        self.commands = 0
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def send(self, line: str):
+                self.wfile.write(line.encode('utf-8') + b'\r\n')
+
+            def handle(self):
+                self.send('* OK IMAP4rev1 stand-in ready')
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    tag, command, *args = shlex.split(line.decode('utf-8').strip()) + ['']
+                    command = command.upper()
+                    args = [arg for arg in args if arg]
+                    with server.lock:
+                        server.commands += 1
+                    if command == 'LOGOUT':
+                        self.send('* BYE logging out')
+                        self.send(f'{tag} OK LOGOUT completed')
+                        return
+                    for response in server.respond(command, args):
+                        if isinstance(response, bytes):
+                            self.wfile.write(response)
+                        else:
+                            self.send(response)
+                    self.send(f'{tag} OK {command} completed' if command != 'LOGIN' or args == [
+                        server.username, server.password] else f'{tag} NO LOGIN failed')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> 'ImapStandIn':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def deliver(self, sender: str, subject: str, body: str, sent: Optional[datetime] = None):
+        message = EmailMessage()
+        message['From'] = sender
+        message['To'] = 'bench@example.com'
+        message['Subject'] = subject
+        message['Date'] = format_datetime(sent or datetime.now(timezone.utc))
+        message.set_content(body)
+        with self.lock:
+            self.messages.append({'sender': sender, 'date': (sent or datetime.now(timezone.utc)).date(),
+                                  'raw': message.as_bytes(), 'seen': False})
+
+    def _search(self, args: List[str]) -> List[int]:
+        with self.lock:
+            matches = []
+            for number, message in enumerate(self.messages, 1):
+                ok, tokens = True, list(args)
+                while tokens:
+                    key = tokens.pop(0).upper()
+                    if key == 'UNSEEN':
+                        ok &= not message['seen']
+                    elif key == 'SINCE':
+                        ok &= message['date'] >= datetime.strptime(tokens.pop(0), '%d-%b-%Y').date()
+                    elif key == 'FROM':
+                        ok &= tokens.pop(0).lower() in message['sender'].lower()
+                if ok:
+                    matches.append(number)
+            return matches
+
+    def respond(self, command: str, args: List[str]):
+        if command == 'CAPABILITY':
+            return ['* CAPABILITY IMAP4rev1']
+        if command == 'SELECT':
+            with self.lock:
+                return [f'* {len(self.messages)} EXISTS', '* 0 RECENT', '* FLAGS (\\Seen)']
+        if command == 'SEARCH':
+            return ['* SEARCH' + ''.join(f' {number}' for number in self._search(args))]
+        if command == 'STORE':
+            with self.lock:
+                message = self.messages[int(args[0]) - 1]
+                # shlex has already dropped the flag's backslash
+                message['seen'] = message['seen'] or 'SEEN' in ' '.join(args[1:]).upper()
+                flags = '\\Seen' if message['seen'] else ''
+            return [f'* {args[0]} FETCH (FLAGS ({flags}))']
+        if command == 'FETCH':
+            peek = 'BODY.PEEK[]' in ' '.join(args[1:]).upper()
+            with self.lock:
+                message = self.messages[int(args[0]) - 1]
+                message['seen'] = message['seen'] or not peek
+            raw = message['raw']
+            item = 'BODY[]' if peek else 'RFC822'
+            return [f'* {args[0]} FETCH ({item} {{{len(raw)}}}'.encode() + b'\r\n' + raw + b')\r\n']
+        return []
@@ -0,0 +1,94 @@
+"""
+Shared pytest fixtures
+Each test gets its own state directory, and the process-wide run budget,
+circuit breaker, scheduler, tracer and collection mirrors start fresh. The
+registry and Webflow fixtures point the configuration at the local stand-in
+servers from benchmarks/standins.py.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import shareholder_logging  # noqa: E402
+import shareholder_mirror  # noqa: E402
+from shareholder_config import Config  # noqa: E402
+from shareholder_resilience import registry_breaker, run_budget  # noqa: E402
+from shareholder_scheduler import registry_scheduler  # noqa: E402
+from shareholder_tracing import tracer  # noqa: E402
+from standins import RegistryStandIn, WebflowStandIn  # noqa: E402
+
+ORGNR = '985279721'
+COLLECTION_ID = 'test-collection'
+
+# Config paths derived from STATE_DIR when the class was created
+STATE_FILES = {
+    'SESSION_CACHE_PATH': 'session.bin',
+    'FINGERPRINT_PATH': 'fingerprints.json',
+    'HISTORY_DB_PATH': 'history.sqlite3',
+    'PUBLISH_PENDING_PATH': 'publish-pending',
+    'JOURNAL_DIR': 'sync-journal',
+    'WEBFLOW_MIRROR_DIR': 'webflow-mirror',
+    'TWOFA_FILE': 'twofa-code',
+    'TRACE_REPORT_PATH': 'shareholder-trace.json',
+    'METRICS_PATH': 'shareholder-metrics.prom',
+    'METRICS_JSON_PATH': 'shareholder-metrics.json',
+}
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    """A fresh state directory (also the working directory) and fresh process-wide state"""
+    monkeypatch.setattr(Config, 'STATE_DIR', str(tmp_path))
+    for name, filename in STATE_FILES.items():
+        monkeypatch.setattr(Config, name, str(tmp_path / filename))
+    monkeypatch.setattr(Config, 'LOG_FILE', '')
+    monkeypatch.setattr(Config, 'SESSION_CACHE_KEY', '')
+    monkeypatch.setattr(Config, 'WEBFLOW_SITE_ID', None)
+    monkeypatch.setattr(Config, 'WEBFLOW_ANALYTICS', False)
+    monkeypatch.setattr(Config, 'OUTPUT_SINKS', 'webflow')
+    monkeypatch.setattr(Config, 'CASSETTE_MODE', '')
+    monkeypatch.setattr(Config, 'RETRY_BACKOFF', 0.01)
+    # main() must not replace pytest's log capture with its own handlers
+    monkeypatch.setattr(shareholder_logging, '_configured', True)
+    monkeypatch.setattr(shareholder_mirror, '_mirrors', {})
+    monkeypatch.setattr(run_budget, 'total', Config.RUN_DEADLINE)
+    run_budget.reset()
+    registry_breaker.record_success()
+    with registry_scheduler.lock:
+        registry_scheduler.hosts.clear()
+    tracer.reset()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def webflow(state, monkeypatch):
+    """Webflow stand-in without a rate limit, configured as the default collection"""
+    server = WebflowStandIn(rate_limit=10 ** 6).start()
+    monkeypatch.setattr(Config, 'WEBFLOW_BASE_URL', server.url)
+    monkeypatch.setattr(Config, 'WEBFLOW_API_TOKEN', 'test-token')
+    monkeypatch.setattr(Config, 'WEBFLOW_COLLECTION_ID', COLLECTION_ID)
+    monkeypatch.setattr(Config, 'WEBFLOW_RATE_LIMIT', 10 ** 6)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def registry(state, monkeypatch):
+    """Registry stand-in with a 50-holder register for ORGNR, configured as the target"""
+    server = RegistryStandIn(registers={ORGNR: 50}).start()
+    base = server.url.rstrip('/')
+    monkeypatch.setattr(Config, 'REGISTRY_BASE_URL', base)
+    monkeypatch.setattr(Config, 'LOGIN_URL', f'{base}/login/')
+    monkeypatch.setattr(Config, 'DASHBOARD_URL', f'{base}/')
+    monkeypatch.setattr(Config, 'SECURITY_URL', base + '/content/security/?orgnr={orgnr}')
+    monkeypatch.setattr(Config, 'TARGET_ORGNR', ORGNR)
+    monkeypatch.setattr(Config, 'TARGET_URL', f'{base}/content/security/?orgnr={ORGNR}')
+    monkeypatch.setattr(Config, 'REGISTRY_USERNAME', server.username)
+    monkeypatch.setattr(Config, 'REGISTRY_PASSWORD', server.password)
+    monkeypatch.setattr(Config, 'TWOFA_CODE', server.code)
+    yield server
+    server.stop()
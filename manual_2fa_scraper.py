@@ -9,15 +9,42 @@ import sys
 import time
 from datetime import datetime
 from shareholder_scraper import ShareholderScraper
-from shareholder_webflow_api import WebflowAPI
+from shareholder_sinks import Snapshot, SinkFanOut, WebflowSink, build_sinks
 from shareholder_config import Config
+from shareholder_records import format_holdings
+from shareholder_logging import setup_logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Written synchronously so log lines stay in step with the input() prompts
+setup_logging(log_file='', background=False)
 logger = logging.getLogger(__name__)
 
+def interactive_login(scraper: ShareholderScraper) -> bool:
+    """Prompt for the 2FA code (or a browser login) and log in"""
+    logger.info("\n" + "="*50)
+    logger.info("IMPORTANT: 2FA AUTHENTICATION REQUIRED")
+    logger.info("="*50)
+    logger.info("1. The scraper will now attempt to log in")
+    logger.info("2. Check your email for the 2FA code")
+    logger.info("3. You have 2 options:")
+    logger.info("   Option A: Enter the code when prompted below")
+    logger.info(f"   Option B: Complete login manually in browser within {Config.TWOFA_TIMEOUT:.0f} seconds")
+    logger.info("="*50 + "\n")
+    
+    # Check if user wants to input 2FA code
+    use_manual_code = input("Do you want to enter the 2FA code here? (y/n): ").lower() == 'y'
+    
+    if use_manual_code:
+        twofa_code = input("Enter the 2FA code from your email: ").strip()
+        # Temporarily set the 2FA code
+        import os
+        os.environ['TWOFA_CODE'] = twofa_code
+        Config.TWOFA_CODE = twofa_code
+    else:
+        logger.info("Please complete the 2FA login manually in your browser.")
+        logger.info(f"You have {Config.TWOFA_TIMEOUT:.0f} seconds...")
+    
+    return scraper.login()
+
 def main():
     """Main execution with manual 2FA handling"""
     logger.info("=" * 50)
@@ -32,36 +59,14 @@ def main():
         # Initialize scraper
         scraper = ShareholderScraper()
         
-        # Attempt login
-        logger.info("\n" + "="*50)
-        logger.info("IMPORTANT: 2FA AUTHENTICATION REQUIRED")
-        logger.info("="*50)
-        logger.info("1. The scraper will now attempt to log in")
-        logger.info("2. Check your email for the 2FA code")
-        logger.info("3. You have 2 options:")
-        logger.info("   Option A: Enter the code when prompted below")
-        logger.info("   Option B: Complete login manually in browser within 30 seconds")
-        logger.info("="*50 + "\n")
-        
-        # Check if user wants to input 2FA code
-        use_manual_code = input("Do you want to enter the 2FA code here? (y/n): ").lower() == 'y'
-        
-        if use_manual_code:
-            twofa_code = input("Enter the 2FA code from your email: ").strip()
-            # Temporarily set the 2FA code
-            import os
-            os.environ['TWOFA_CODE'] = twofa_code
-            Config.TWOFA_CODE = twofa_code
-        else:
-            logger.info("Please complete the 2FA login manually in your browser.")
-            logger.info("You have 30 seconds...")
-        
-        # Run scraper
-        if not scraper.login():
+        # Skip the 2FA prompt entirely if a cached session is still valid
+        if scraper.restore_session():
+            logger.info("Cached session is valid - no 2FA needed")
+        elif not interactive_login(scraper):
             logger.error("Authentication failed. Please check your credentials and try again.")
             return False
         
-        # Scrape data
+        # Scrape data (reuses the authenticated session)
         shareholders_data = scraper.run_scraper()
         
         if not shareholders_data:
@@ -73,21 +78,14 @@ def main():
         # Ask if user wants to update Webflow
         update_webflow = input("\nUpdate Webflow with scraped data? (y/n): ").lower() == 'y'
         
-        if update_webflow:
-            # Initialize Webflow API
-            webflow_api = WebflowAPI()
-            
-            # Update Webflow with scraped data
-            success = webflow_api.update_shareholders(shareholders_data)
-            
-            if success:
-                logger.info("Webflow update completed successfully")
-                logger.info("Scraper run completed successfully!")
-                return True
-            else:
-                logger.error("Webflow update failed")
-                return False
-        else:
+        # The other configured sinks (files, webhooks) get the data either way
+        webflow = WebflowSink(scraper.fingerprints, force=True) if update_webflow else None
+        sinks = SinkFanOut(build_sinks(webflow=webflow))
+        sinks.submit(Snapshot.of(Config.TARGET_ORGNR, shareholders_data, Config.WEBFLOW_COLLECTION_ID,
+                                 scraper.page_validators.get(Config.TARGET_ORGNR)))
+        success = sinks.close()
+        
+        if not update_webflow:
             logger.info("Skipping Webflow update")
             logger.info("Data scraped successfully but not uploaded")
             
@@ -96,10 +94,14 @@ def main():
             logger.info("SCRAPED DATA:")
             logger.info("="*50)
             for shareholder in shareholders_data:
-                logger.info(f"{shareholder['rank']}. {shareholder['surname_company']} {shareholder['first_name']}")
-                logger.info(f"   Holdings: {shareholder['holdings']} ({shareholder['percent']}%)")
-            
-            return True
+                logger.info(f"{shareholder.rank}. {shareholder.name}")
+                logger.info(f"   Holdings: {format_holdings(shareholder.holdings)} ({shareholder.percent}%)")
+        
+        if success:
+            logger.info("Scraper run completed successfully!")
+        else:
+            logger.error("Delivering the scraped data failed")
+        return success
             
     except ValueError as e:
         logger.error(f"Configuration error: {str(e)}")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Ownership analytics
+Rank changes, holding deltas, top-N concentration and the Herfindahl-Hirschman
+index (HHI), computed with NumPy over whole snapshots at once. NumPy is
+optional: without it the functions return None and the scraper syncs the plain
+table as before.
+
+    python shareholder_analytics.py                     # one line per stored snapshot
+    python shareholder_analytics.py --orgnr 985279721 --since 2024-01-01 --json
+"""
+
+import argparse
+import json
+import logging
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Union
+from shareholder_config import Config
+from shareholder_history import HistoryStore, _print_rows
+from shareholder_metrics import metrics
+from shareholder_records import PERCENT_DECIMALS, ShareholderRecord, ShareholderTable
+from shareholder_sync import assign_identities
+
+logger = logging.getLogger(__name__)
+
+TOP_N = (5, 10, 20)
+PERCENT_SCALE = 10 ** PERCENT_DECIMALS
+# Holder keys in the panel: holder_id * OCCURRENCE_SPAN + occurrence
+OCCURRENCE_SPAN = 1 << 20
+
+Records = Union[Sequence[ShareholderRecord], ShareholderTable]
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """The numpy module, or None (logged once) when it is not installed"""
+    try:
+        import numpy
+    except ImportError:
+        logger.warning("numpy is not installed; ownership analytics are skipped (pip install numpy)")
+        return None
+    return numpy
+
+
+def _percent_text(scaled: int) -> str:
+    return format(Decimal(scaled).scaleb(-PERCENT_DECIMALS), 'f')
+
+
+def _columns(np, records: Records):
+    """(rank, holdings, percent * PERCENT_SCALE) as int64 arrays
+
+    A ShareholderTable's ``array('q')`` columns are wrapped without copying.
+    """
+    if isinstance(records, ShareholderTable):
+        return (np.frombuffer(records.ranks, dtype=np.int64), np.frombuffer(records.holdings, dtype=np.int64),
+                np.frombuffer(records.percents, dtype=np.int64))
+    count = len(records)
+    ranks = np.fromiter((record.rank for record in records), dtype=np.int64, count=count)
+    holdings = np.fromiter((record.holdings for record in records), dtype=np.int64, count=count)
+    percents = np.fromiter((int(record.percent.scaleb(PERCENT_DECIMALS)) for record in records),
+                           dtype=np.int64, count=count)
+    return ranks, holdings, percents
+
+
+def _concentration(np, percents) -> Dict:
+    """Top-N shares and HHI for each row of a (snapshots x holders) matrix of scaled percentages"""
+    shares = -np.sort(-percents, axis=1) / PERCENT_SCALE  # percent of all shares, largest first
+    result = {f'top{n}': shares[:, :n].sum(axis=1) for n in TOP_N}
+    # Shares in percent give the usual 0-10 000 scale
+    result['hhi'] = np.square(shares).sum(axis=1)
+    return result
+
+
+def concentration(records: Records) -> Optional[Dict]:
+    """Top-5/10/20 share of all shares (in percent) and HHI of one snapshot
+
+    Over a top-20 table the HHI is a lower bound; over a full register it is
+    exact.
+    """
+    np = _numpy()
+    if np is None:
+        return None
+    _, _, percents = _columns(np, records)
+    values = _concentration(np, percents.reshape(1, -1))
+    result = {name: round(float(column[0]), 4) for name, column in values.items()}
+    result['holders'] = len(percents)
+    return result
+
+
+def holder_changes(current: Sequence[ShareholderRecord],
+                   previous: Sequence[ShareholderRecord]) -> Optional[List[Dict]]:
+    """Change of each current holder since ``previous``, in the order of ``current``
+
+    Holders are matched by the same identity the Webflow sync uses. Rank
+    change is positive for a move up and None for a new holder, whose holding
+    and percentage changes are its whole position.
+    """
+    np = _numpy()
+    if np is None:
+        return None
+    ranks, holdings, percents = _columns(np, current)
+    if not len(previous):
+        matched = np.zeros(len(current), dtype=bool)
+        index = np.zeros(len(current), dtype=np.int64)
+        previous_columns = (np.zeros(1, dtype=np.int64),) * 3
+    else:
+        current_ids = np.array(assign_identities([(r.surname_company, r.first_name) for r in current]))
+        previous_ids = np.array(assign_identities([(r.surname_company, r.first_name) for r in previous]))
+        order = np.argsort(previous_ids)
+        position = np.searchsorted(previous_ids[order], current_ids).clip(max=len(previous_ids) - 1)
+        index = order[position]
+        matched = previous_ids[index] == current_ids
+        previous_columns = _columns(np, previous)
+
+    previous_ranks, previous_holdings, previous_percents = (np.where(matched, column[index], 0)
+                                                            for column in previous_columns)
+    rank_changes = np.where(matched, previous_ranks - ranks, 0)
+    holdings_changes = holdings - previous_holdings
+    percent_changes = percents - previous_percents
+    return [{'rank-change': rank_change if found else None,
+             'holdings-change': holdings_change,
+             'percentage-change': _percent_text(percent_change)}
+            for found, rank_change, holdings_change, percent_change
+            in zip(matched.tolist(), rank_changes.tolist(), holdings_changes.tolist(), percent_changes.tolist())]
+
+
+def _comparison_cutoff() -> str:
+    # Change fields compare against the last snapshot before today's
+    return (date.today() - timedelta(days=1)).isoformat()
+
+
+def sync_basis(orgnr: str, store: Optional[HistoryStore] = None) -> Optional[str]:
+    """Date of the snapshot the change fields compare against; None with WEBFLOW_ANALYTICS off
+
+    The fields depend on this date as well as on the table, so the sync
+    fingerprint includes it: once the comparison snapshot moves, an
+    unchanged register is synced again and stale changes are reset.
+    """
+    if not Config.WEBFLOW_ANALYTICS:
+        return None
+    try:
+        own_store = store is None
+        store = store or HistoryStore()
+        try:
+            return store.snapshot_date(orgnr, _comparison_cutoff())
+        finally:
+            if own_store:
+                store.close()
+    except Exception as e:
+        logger.warning(f"[{orgnr}] Could not look up the comparison snapshot: {str(e)}")
+        return None
+
+
+def item_analytics(orgnr: str, records: List[ShareholderRecord],
+                   store: Optional[HistoryStore] = None) -> Optional[List[Dict]]:
+    """Webflow fields derived from the scraped table and the last snapshot before today
+
+    Also exports the table's concentration as gauges. Returns None without
+    NumPy or an earlier snapshot; never fails the sync.
+    """
+    try:
+        summary = concentration(records)
+        if summary is None:
+            return None
+        for n in TOP_N:
+            metrics.set('ownership_top_percent', summary[f'top{n}'], orgnr=orgnr, top=n)
+        metrics.set('ownership_hhi', summary['hhi'], orgnr=orgnr)
+
+        own_store = store is None
+        store = store or HistoryStore()
+        try:
+            previous_date, previous = store.snapshot(orgnr, _comparison_cutoff())
+        finally:
+            if own_store:
+                store.close()
+        if previous_date is None:
+            logger.info(f"[{orgnr}] No earlier snapshot in history; skipping change fields")
+            return None
+        logger.info(f"[{orgnr}] Change fields are relative to the snapshot of {previous_date} "
+                    f"(top 20 hold {summary['top20']}%, HHI {summary['hhi']:.0f})")
+        return holder_changes(records, previous)
+    except Exception as e:
+        logger.warning(f"[{orgnr}] Could not compute ownership analytics: {str(e)}")
+        return None
+
+
+class OwnershipPanel:
+    """Every stored snapshot of one issuer as (snapshots x holders) matrices
+
+    Built from one history query: holders are aligned across days with
+    ``numpy.unique`` and absent holders are zero, so per-day concentration
+    and day-over-day changes are whole-matrix operations.
+    """
+
+    def __init__(self, orgnr: str, dates: List[str], ranks, holdings, percents):
+        self.orgnr = orgnr
+        self.dates = dates
+        self.ranks = ranks  # 0 where the holder is not in that snapshot
+        self.holdings = holdings
+        self.percents = percents  # percent * PERCENT_SCALE
+
+    @classmethod
+    def from_history(cls, store: HistoryStore, orgnr: str, since: Optional[str] = None) -> Optional['OwnershipPanel']:
+        np = _numpy()
+        if np is None:
+            return None
+        snapshots = store.conn.execute(
+            'SELECT id, snapshot_date FROM snapshots WHERE orgnr = ? AND snapshot_date >= ? ORDER BY snapshot_date',
+            (orgnr, since or '')).fetchall()
+        rows = store.conn.execute(
+            'SELECT h.snapshot_id, h.holder_id, h.occurrence, h.rank, h.shares, h.percent '
+            'FROM holdings h JOIN snapshots s ON s.id = h.snapshot_id WHERE s.orgnr = ? AND s.snapshot_date >= ?',
+            (orgnr, since or '')).fetchall()
+        data = np.array(rows, dtype=np.int64).reshape(-1, 6)
+
+        snapshot_ids = np.array([snapshot_id for snapshot_id, _ in snapshots], dtype=np.int64)
+        order = np.argsort(snapshot_ids)
+        day = order[np.searchsorted(snapshot_ids[order], data[:, 0])]
+        holder_keys, holder = np.unique(data[:, 1] * OCCURRENCE_SPAN + data[:, 2], return_inverse=True)
+
+        shape = (len(snapshots), len(holder_keys))
+        matrices = []
+        for column in (3, 4, 5):
+            matrix = np.zeros(shape, dtype=np.int64)
+            matrix[day, holder] = data[:, column]
+            matrices.append(matrix)
+        return cls(orgnr, [snapshot_date for _, snapshot_date in snapshots], *matrices)
+
+    def summary(self) -> List[Dict]:
+        """Per snapshot: holder count, concentration, entries/exits and share turnover since the one before"""
+        np = _numpy()
+        present = self.ranks > 0
+        values = _concentration(np, self.percents)
+        entered = np.zeros(len(self.dates), dtype=np.int64)
+        exited = np.zeros(len(self.dates), dtype=np.int64)
+        turnover = np.zeros(len(self.dates), dtype=np.int64)
+        movers = np.zeros(len(self.dates), dtype=np.int64)
+        if len(self.dates) > 1:
+            entered[1:] = (present[1:] & ~present[:-1]).sum(axis=1)
+            exited[1:] = (present[:-1] & ~present[1:]).sum(axis=1)
+            # Shares that changed hands among the tracked holders: half the absolute changes
+            turnover[1:] = np.abs(np.diff(self.holdings, axis=0)).sum(axis=1) // 2
+            movers[1:] = ((self.ranks[1:] != self.ranks[:-1]) & present[1:] & present[:-1]).sum(axis=1)
+        return [{'date': snapshot_date, 'holders': holders,
+                 **{name: round(value, 4) for name, value in zip(values, row)},
+                 'entered': new, 'exited': gone, 'rank_moves': moved, 'turnover': traded}
+                for snapshot_date, holders, row, new, gone, moved, traded
+                in zip(self.dates, present.sum(axis=1).tolist(), zip(*(column.tolist() for column in values.values())),
+                       entered.tolist(), exited.tolist(), movers.tolist(), turnover.tolist())]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orgnr', nargs='+', default=[Config.TARGET_ORGNR],
+                        help='Issuer org numbers (default: TARGET_ORGNR)')
+    parser.add_argument('--since', help='First snapshot date to include (YYYY-MM-DD)')
+    parser.add_argument('--db', default=None, help='History database (default: HISTORY_DB_PATH)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    if _numpy() is None:
+        return 1
+    store = HistoryStore(args.db)
+    try:
+        report = {}
+        for orgnr in args.orgnr:
+            panel = OwnershipPanel.from_history(store, orgnr, args.since)
+            report[orgnr] = panel.summary()
+    finally:
+        store.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    for orgnr, rows in report.items():
+        print(f"Ownership of {orgnr}")
+        if rows:
+            headers = list(rows[0])
+            _print_rows(headers, [tuple(row[header] for header in headers) for row in rows])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
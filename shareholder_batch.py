@@ -0,0 +1,100 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord
+from shareholder_scraper import ShareholderScraper
+
+logger = logging.getLogger(__name__)
+
+class CompanyResult:
+    """Scrape outcome and timing for one issuer"""
+
+    def __init__(self, orgnr: str, collection_id: Optional[str] = None):
+        self.orgnr = orgnr
+        self.collection_id = collection_id
+        self.shareholders: List[ShareholderRecord] = []
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.shareholders)
+
+    def as_dict(self) -> Dict:
+        return {
+            'orgnr': self.orgnr,
+            'collection_id': self.collection_id,
+            'shareholders': [shareholder.as_dict() for shareholder in self.shareholders],
+            'elapsed': round(self.elapsed, 3),
+            'error': self.error,
+        }
+
+
+def load_manifest(path: str) -> Dict[str, Optional[str]]:
+    """Read a JSON manifest mapping org numbers to Webflow collection IDs
+
+    Accepts either ``{"985279721": "<collection id>"}`` or
+    ``{"985279721": {"collection_id": "<collection id>"}}``. Issuers with a null
+    collection are scraped but not synced.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+
+    companies = {}
+    for orgnr, entry in manifest.items():
+        if isinstance(entry, dict):
+            entry = entry.get('collection_id')
+        companies[str(orgnr)] = entry
+    return companies
+
+
+class BatchScraper:
+    """Scrape many issuers concurrently over one authenticated session
+
+    All worker threads share the scraper's ``requests.Session``, so they reuse
+    its cookies and keep-alive connections. The session's connection pool is
+    created with ``pool_block=True`` and ``BATCH_MAX_PER_HOST`` connections, so
+    extra workers wait for a free connection instead of opening new ones, and
+    the registry scheduler keeps concurrency below that while the registry
+    shows strain.
+    """
+
+    def __init__(self, scraper: Optional[ShareholderScraper] = None, max_workers: Optional[int] = None):
+        self.scraper = scraper or ShareholderScraper()
+        self.max_workers = max_workers or Config.BATCH_MAX_WORKERS
+
+    def _scrape_one(self, orgnr: str, collection_id: Optional[str]) -> CompanyResult:
+        result = CompanyResult(orgnr, collection_id)
+        started = time.perf_counter()
+        try:
+            result.shareholders = self.scraper.fetch_shareholders(orgnr)
+            if not result.shareholders:
+                result.error = "no shareholder rows found"
+        except Exception as e:
+            result.error = str(e)
+        result.elapsed = time.perf_counter() - started
+
+        if result.error:
+            logger.error(f"[{orgnr}] scrape failed after {result.elapsed:.2f}s: {result.error}")
+        else:
+            logger.info(f"[{orgnr}] scraped {len(result.shareholders)} shareholders in {result.elapsed:.2f}s")
+        return result
+
+    def scrape(self, companies: Dict[str, Optional[str]]) -> List[CompanyResult]:
+        """Log in once, then scrape every org number; results keep the input order"""
+        if not self.scraper.ensure_login():
+            logger.error("Authentication failed")
+            return []
+
+        started = time.perf_counter()
+        workers = max(1, min(self.max_workers, len(companies)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scrape') as pool:
+            results = list(pool.map(lambda item: self._scrape_one(*item), companies.items()))
+
+        succeeded = sum(1 for result in results if result.ok)
+        logger.info(f"Batch scraped {succeeded}/{len(results)} companies in {time.perf_counter() - started:.2f}s "
+                    f"with {workers} workers")
+        return results
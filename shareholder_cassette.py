@@ -0,0 +1,223 @@
+import atexit
+import base64
+import gzip
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+from collections import deque
+from io import BytesIO
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+from shareholder_config import Config
+
+logger = logging.getLogger(__name__)
+
+SCRUBBED = '[scrubbed]'
+# Hop-by-hop and body-encoding headers; bodies are stored decoded, so these would be wrong on replay
+DROPPED_HEADERS = frozenset(['connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length'])
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """A request made in replay mode that the cassette has no response for"""
+
+
+def _secrets() -> List[str]:
+    # The 2FA code is only ever sent in form bodies, which are not stored, and scrubbing
+    # six digits out of pages would corrupt holdings; short values are skipped for the same reason
+    values = (Config.REGISTRY_USERNAME, Config.REGISTRY_PASSWORD, Config.WEBFLOW_API_TOKEN, Config.TWOFA_IMAP_PASSWORD)
+    # Longest first, so a secret containing another is replaced whole
+    return sorted({value for value in values if value and len(value) >= 6}, key=len, reverse=True)
+
+
+def scrub(text: str) -> str:
+    for secret in _secrets():
+        text = text.replace(secret, SCRUBBED)
+    return text
+
+
+def scrub_bytes(data: bytes) -> bytes:
+    for secret in _secrets():
+        data = data.replace(secret.encode('utf-8'), SCRUBBED.encode('utf-8'))
+    return data
+
+
+def _scrub_cookie(value: str) -> str:
+    """Keep the cookie's name and attributes, drop its value"""
+    name, _, rest = value.partition('=')
+    attributes = rest.partition(';')[2]
+    return f"{name}={SCRUBBED}" + (f";{attributes}" if attributes else '')
+
+
+def request_key(client: str, request: requests.PreparedRequest) -> Tuple[str, str, str]:
+    """(client, method, URL with sorted query and secrets scrubbed); matching ignores headers"""
+    parts = urlsplit(request.url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+    return client, request.method, scrub(url)
+
+
+def body_hash(request: requests.PreparedRequest) -> Optional[str]:
+    """Hash of a JSON request body, used to tell Webflow writes to the same URL apart
+
+    Form bodies (the registry login) carry credentials and are never hashed.
+    """
+    body = request.body
+    if not body or 'json' not in request.headers.get('Content-Type', ''):
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(scrub_bytes(body)).hexdigest()[:16]
+
+
+class Cassette:
+    """Recorded HTTP exchanges, stored as gzipped JSON
+
+    Record mode appends each exchange after scrubbing: request headers and form
+    bodies are not stored, cookie values and configured credentials are
+    replaced. Replay mode serves the recorded responses in order for each
+    (client, method, URL), preferring one with the same JSON body, and keeps
+    serving the last one once a URL's recordings run out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.interactions: List[Dict] = []
+        self.queues: Dict[Tuple[str, str, str], Deque[Dict]] = {}
+
+    def load(self) -> 'Cassette':
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            self.interactions = json.load(f)['interactions']
+        for interaction in self.interactions:
+            key = tuple(interaction['request'][field] for field in ('client', 'method', 'url'))
+            self.queues.setdefault(key, deque()).append(interaction)
+        logger.info(f"Replaying {len(self.interactions)} recorded HTTP exchanges from {self.path}")
+        return self
+
+    def save(self):
+        with self.lock:
+            interactions = list(self.interactions)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': 1, 'interactions': interactions}, f)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Recorded {len(interactions)} HTTP exchanges to {self.path}")
+
+    def record(self, client: str, request: requests.PreparedRequest, response: requests.Response):
+        headers = []
+        # iteritems keeps repeated headers such as Set-Cookie apart
+        for name, value in response.raw.headers.iteritems():
+            if name.lower() in DROPPED_HEADERS:
+                continue
+            headers.append([name, _scrub_cookie(value) if name.lower() == 'set-cookie' else scrub(value)])
+        _, method, url = request_key(client, request)
+        interaction = {
+            'request': {'client': client, 'method': method, 'url': url, 'body_hash': body_hash(request)},
+            'response': {'status': response.status_code, 'reason': response.reason, 'headers': headers,
+                         'body': base64.b64encode(scrub_bytes(response.content)).decode('ascii')},
+        }
+        with self.lock:
+            self.interactions.append(interaction)
+
+    def next_response(self, client: str, request: requests.PreparedRequest) -> Dict:
+        key = request_key(client, request)
+        with self.lock:
+            queue = self.queues.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded response for {request.method} {key[2]} in {self.path}")
+            wanted = body_hash(request)
+            match = next((i for i in queue if wanted and i['request']['body_hash'] == wanted), queue[0])
+            if len(queue) > 1:
+                queue.remove(match)
+            return match['response']
+
+
+class RecordingAdapter(BaseAdapter):
+    """Passes requests to the real adapter and records what came back"""
+
+    def __init__(self, adapter: BaseAdapter, cassette: Cassette, client: str):
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+        self.client = client
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        self.cassette.record(self.client, request, response)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Answers every request from the cassette; nothing goes over the network"""
+
+    def __init__(self, cassette: Cassette, client: str):
+        super().__init__()
+        self.cassette = cassette
+        self.client = client
+
+    def send(self, request, **kwargs):
+        recorded = self.cassette.next_response(self.client, request)
+        body = base64.b64decode(recorded['body'])
+        headers = HTTPHeaderDict()
+        message = http.client.HTTPMessage()
+        for name, value in recorded['headers'] + [['Content-Length', str(len(body))]]:
+            headers.add(name, value)
+            message[name] = value
+
+        # requests reads Set-Cookie through the http.client response, so give it one
+        class OriginalResponse:
+            msg = message
+
+            def isclosed(self):
+                return True
+
+        raw = HTTPResponse(body=BytesIO(body), headers=headers, status=recorded['status'], reason=recorded['reason'],
+                           preload_content=False, decode_content=False, original_response=OriginalResponse())
+        return self.build_response(request, raw)
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def _shared_cassette() -> Cassette:
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(Config.CASSETTE_PATH)
+            if Config.CASSETTE_MODE == 'replay':
+                _cassette.load()
+            else:
+                atexit.register(_cassette.save)
+        return _cassette
+
+
+def install(session: requests.Session, client: str) -> Optional[str]:
+    """Put the session in CASSETTE_MODE ('record' or 'replay'); returns the mode applied, if any
+
+    Call after the session's adapters are mounted. All sessions in the process
+    share one cassette, which record mode writes out at exit.
+    """
+    mode = Config.CASSETTE_MODE
+    if mode not in ('record', 'replay'):
+        if mode:
+            logger.error(f"Unknown CASSETTE_MODE '{mode}' (expected 'record' or 'replay')")
+        return None
+    cassette = _shared_cassette()
+    for prefix, adapter in list(session.adapters.items()):
+        if mode == 'replay':
+            session.mount(prefix, ReplayAdapter(cassette, client))
+        elif not isinstance(adapter, RecordingAdapter):
+            session.mount(prefix, RecordingAdapter(adapter, cassette, client))
+    return mode
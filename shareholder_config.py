@@ -9,16 +9,122 @@ class Config:
     REGISTRY_PASSWORD = os.getenv('REGISTRY_PASSWORD')
     TWOFA_CODE = os.getenv('TWOFA_CODE')  # Optional: for automated 2FA if possible
     
-    # Target URL - Protector Forsikring ASA
-    TARGET_URL = 'https://www.aksjeeierregisteret.no/content/security/?orgnr=985279721'
-    LOGIN_URL = 'https://www.aksjeeierregisteret.no/login/'
+    # Registry endpoints
+    REGISTRY_BASE_URL = os.getenv('REGISTRY_BASE_URL', 'https://www.aksjeeierregisteret.no').rstrip('/')
+    LOGIN_URL = f'{REGISTRY_BASE_URL}/login/'
+    DASHBOARD_URL = f'{REGISTRY_BASE_URL}/'
+    SECURITY_URL = REGISTRY_BASE_URL + '/content/security/?orgnr={orgnr}'
+    
+    # Target company - Protector Forsikring ASA
+    TARGET_ORGNR = os.getenv('TARGET_ORGNR', '985279721')
+    TARGET_SEARCH = os.getenv('TARGET_SEARCH', 'Protector')
+    TARGET_URL = SECURITY_URL.format(orgnr=TARGET_ORGNR)
     
     # Webflow API
+    WEBFLOW_BASE_URL = os.getenv('WEBFLOW_BASE_URL', 'https://api.webflow.com').rstrip('/')
     WEBFLOW_API_TOKEN = os.getenv('WEBFLOW_API_TOKEN')
     WEBFLOW_COLLECTION_ID = os.getenv('WEBFLOW_COLLECTION_ID')
+    WEBFLOW_SITE_ID = os.getenv('WEBFLOW_SITE_ID')  # Optional: publish the site after changes
+    # Domains to publish to (comma-separated); looked up from the site when unset
+    WEBFLOW_DOMAINS = [domain.strip() for domain in os.getenv('WEBFLOW_DOMAINS', '').split(',') if domain.strip()]
+    WEBFLOW_RATE_LIMIT = int(os.getenv('WEBFLOW_RATE_LIMIT', 60))  # requests per minute for the API key
+    WEBFLOW_BURST = int(os.getenv('WEBFLOW_BURST', 10))
+    # Add rank-change/holdings-change/percentage-change to each item (needs numpy and those collection fields)
+    WEBFLOW_ANALYTICS = os.getenv('WEBFLOW_ANALYTICS', 'false').lower() not in ('0', 'false', 'no')
+    WEBFLOW_MAX_WORKERS = int(os.getenv('WEBFLOW_MAX_WORKERS', 4))
+    WEBFLOW_TIMEOUT = (5, 30)  # connect, read (seconds)
+    
+    # Resilience: registry timeouts, overall run deadline split across phases, retries, circuit breaker
+    REGISTRY_TIMEOUT = (float(os.getenv('REGISTRY_CONNECT_TIMEOUT', 5)), float(os.getenv('REGISTRY_READ_TIMEOUT', 30)))
+    RUN_DEADLINE = float(os.getenv('RUN_DEADLINE', 20 * 60))  # seconds for the whole run
+    PHASE_BUDGETS = os.getenv('PHASE_BUDGETS', 'login=0.25,scrape=0.25,sync=0.5')  # shares of RUN_DEADLINE
+    LAMBDA_TIMEOUT_MARGIN = float(os.getenv('LAMBDA_TIMEOUT_MARGIN', 30))  # seconds kept free before Lambda's timeout
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 3))  # for idempotent requests
+    RETRY_BACKOFF = float(os.getenv('RETRY_BACKOFF', 0.5))  # seconds, doubled per attempt, full jitter
+    RETRY_BACKOFF_MAX = float(os.getenv('RETRY_BACKOFF_MAX', 10))
+    BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))  # consecutive registry errors
+    BREAKER_RESET = float(os.getenv('BREAKER_RESET', 60))  # seconds before a trial request
+    
+    # Local state (session cache and other files kept between runs)
+    STATE_DIR = os.getenv('SHAREHOLDER_STATE_DIR', '.shareholder-state')
+    SESSION_CACHE_PATH = os.path.join(STATE_DIR, 'session.bin')
+    SESSION_CACHE_KEY = os.getenv('SESSION_CACHE_KEY')  # Fernet key; cache is disabled when unset
+    SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', 12 * 60 * 60))  # seconds
+    FINGERPRINT_PATH = os.path.join(STATE_DIR, 'fingerprints.json')
+    HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', os.path.join(STATE_DIR, 'history.sqlite3'))
+    PUBLISH_PENDING_PATH = os.path.join(STATE_DIR, 'publish-pending')  # set while a publish is owed
+    # Write-ahead journal of each Webflow sync, for finishing a failed sync with --resume
+    SYNC_JOURNAL = os.getenv('SYNC_JOURNAL', 'true').lower() not in ('0', 'false', 'no')
+    JOURNAL_DIR = os.path.join(STATE_DIR, 'sync-journal')
+    # On-disk copy of each Webflow collection, re-listed only when the collection changed
+    WEBFLOW_MIRROR = os.getenv('WEBFLOW_MIRROR', 'true').lower() not in ('0', 'false', 'no')
+    WEBFLOW_MIRROR_DIR = os.path.join(STATE_DIR, 'webflow-mirror')
+    WEBFLOW_MIRROR_TTL = float(os.getenv('WEBFLOW_MIRROR_TTL', 60))  # seconds before re-checking the collection
+    WEBFLOW_MIRROR_MAX_AGE = float(os.getenv('WEBFLOW_MIRROR_MAX_AGE', 24 * 60 * 60))  # full re-list at least this often
+    
+    # 2FA code provider used when TWOFA_CODE is unset: 'imap', 'file' or empty (wait for manual login)
+    TWOFA_PROVIDER = os.getenv('TWOFA_PROVIDER', '').lower()
+    TWOFA_TIMEOUT = float(os.getenv('TWOFA_TIMEOUT', 180))  # seconds to wait for the code
+    TWOFA_SENDER = os.getenv('TWOFA_SENDER', 'aksjeeierregisteret.no')  # From: filter for code e-mails
+    TWOFA_FILE = os.getenv('TWOFA_FILE', os.path.join(STATE_DIR, 'twofa-code'))  # file or FIFO
+    TWOFA_IMAP_HOST = os.getenv('TWOFA_IMAP_HOST')
+    TWOFA_IMAP_PORT = int(os.getenv('TWOFA_IMAP_PORT', 993))
+    TWOFA_IMAP_USERNAME = os.getenv('TWOFA_IMAP_USERNAME')
+    TWOFA_IMAP_PASSWORD = os.getenv('TWOFA_IMAP_PASSWORD')
+    TWOFA_IMAP_SSL = os.getenv('TWOFA_IMAP_SSL', 'true').lower() not in ('0', 'false', 'no')
+    TWOFA_IMAP_FOLDER = os.getenv('TWOFA_IMAP_FOLDER', 'INBOX')
+    
+    # Logging: console is text (LOG_FORMAT=json for JSON), the log file is JSON lines
+    LOG_FILE = os.getenv('LOG_FILE', 'shareholder-scraper.log')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+    LOG_ROW_SAMPLE = int(os.getenv('LOG_ROW_SAMPLE', 5))  # per-row events logged at INFO before summarising
+    
+    # Request tracing
+    TRACE_REQUESTS = os.getenv('TRACE_REQUESTS', 'true').lower() not in ('0', 'false', 'no')
+    TRACE_REPORT_PATH = os.getenv('TRACE_REPORT_PATH', 'shareholder-trace.json')
+    # Per-run metrics export (Prometheus text file and JSON); empty disables a format
+    METRICS_PATH = os.getenv('METRICS_PATH', 'shareholder-metrics.prom')
+    METRICS_JSON_PATH = os.getenv('METRICS_JSON_PATH', 'shareholder-metrics.json')
+    PROFILE_PATH = os.getenv('PROFILE_PATH', 'shareholder-profile.pstats')  # used with --profile
+    # HTTP cassettes for offline runs: 'record' saves every exchange, 'replay' serves them without network access
+    CASSETTE_MODE = os.getenv('CASSETTE_MODE', '').lower()
+    CASSETTE_PATH = os.getenv('CASSETTE_PATH', 'cassettes/shareholder.json.gz')
     
     # Scraping settings
     MAX_SHAREHOLDERS = 20
+    PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'lxml')  # 'lxml' or 'soup'
+    REGISTER_PREFETCH_PAGES = int(os.getenv('REGISTER_PREFETCH_PAGES', 2))  # full-register read-ahead
+    # Skip the dashboard visit and company search before fetching a security page
+    LEAN_NAVIGATION = os.getenv('LEAN_NAVIGATION', 'true').lower() not in ('0', 'false', 'no')
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 8))  # threads for multi-company runs
+    BATCH_MAX_PER_HOST = int(os.getenv('BATCH_MAX_PER_HOST', 4))  # concurrent requests to the registry
+    # Adaptive registry concurrency (shareholder_scheduler): starts at START, grows while responses are healthy
+    # up to BATCH_MAX_PER_HOST, and is multiplied by DECREASE on 429/5xx, errors or latency above TOLERANCE x normal
+    REGISTRY_CONCURRENCY_START = float(os.getenv('REGISTRY_CONCURRENCY_START', 2))
+    REGISTRY_CONCURRENCY_MIN = float(os.getenv('REGISTRY_CONCURRENCY_MIN', 1))
+    REGISTRY_CONCURRENCY_DECREASE = float(os.getenv('REGISTRY_CONCURRENCY_DECREASE', 0.5))
+    REGISTRY_LATENCY_TOLERANCE = float(os.getenv('REGISTRY_LATENCY_TOLERANCE', 3.0))
+    REGISTRY_LATENCY_FLOOR = float(os.getenv('REGISTRY_LATENCY_FLOOR', 1.0))  # seconds; faster is never overload
+    REGISTRY_DECREASE_INTERVAL = float(os.getenv('REGISTRY_DECREASE_INTERVAL', 2.0))  # seconds between cuts
+    REGISTRY_MIN_INTERVAL = float(os.getenv('REGISTRY_MIN_INTERVAL', 0))  # seconds between request starts
+    # Async pipeline (--pipeline): workers per stage and queue depth between stages
+    PIPELINE_SCRAPE_WORKERS = int(os.getenv('PIPELINE_SCRAPE_WORKERS', 4))
+    PIPELINE_PARSE_WORKERS = int(os.getenv('PIPELINE_PARSE_WORKERS', 2))
+    PIPELINE_SYNC_WORKERS = int(os.getenv('PIPELINE_SYNC_WORKERS', 2))
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+    # Where scraped tables go: comma-separated webflow, csv:PATH, jsonl:PATH, webhook:URL (see shareholder_sinks)
+    OUTPUT_SINKS = os.getenv('OUTPUT_SINKS', 'webflow')
+    SINK_QUEUE_SIZE = int(os.getenv('SINK_QUEUE_SIZE', 8))  # snapshots queued per sink
+    SINK_QUEUE_TIMEOUT = float(os.getenv('SINK_QUEUE_TIMEOUT', 30))  # seconds to wait on a full sink queue
+    WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 30))  # read timeout for webhook deliveries
+    # Daemon mode (--daemon): poll interval bounds in seconds, backoff while unchanged,
+    # and UTC windows ("HH:MM-HH:MM,...") when the registry usually updates
+    DAEMON_MIN_INTERVAL = float(os.getenv('DAEMON_MIN_INTERVAL', 300))
+    DAEMON_MAX_INTERVAL = float(os.getenv('DAEMON_MAX_INTERVAL', 3600))
+    DAEMON_BACKOFF = float(os.getenv('DAEMON_BACKOFF', 2.0))
+    DAEMON_HOT_WINDOWS = os.getenv('DAEMON_HOT_WINDOWS', '06:00-08:00')
+    DAEMON_MAX_CYCLES = int(os.getenv('DAEMON_MAX_CYCLES', 0))  # 0 runs until stopped
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     
     @classmethod
@@ -0,0 +1,161 @@
+"""
+Long-running scrape loop for shareholder_main.py --daemon
+Keeps one authenticated registry session and one Webflow transport across
+cycles and re-scrapes on an adaptive schedule instead of a daily cold start.
+"""
+
+import asyncio
+import logging
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from shareholder_config import Config
+from shareholder_http import WebflowTransport
+from shareholder_metrics import metrics
+from shareholder_pipeline import Pipeline
+from shareholder_resilience import run_budget
+from shareholder_scheduler import registry_scheduler
+from shareholder_scraper import ShareholderScraper
+from shareholder_tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def parse_windows(spec: str) -> List[Tuple[int, int]]:
+    """``"05:00-09:00,15:30-16:30"`` as (start, end) minutes after midnight UTC"""
+    windows = []
+    for part in filter(None, (chunk.strip() for chunk in spec.split(','))):
+        start, end = part.split('-')
+        windows.append(tuple(int(hours) * 60 + int(minutes)
+                             for hours, minutes in (start.split(':'), end.split(':'))))
+    return windows
+
+
+class AdaptiveSchedule:
+    """Decides how long to sleep between scrape cycles
+
+    Starts at ``min_interval`` and multiplies the interval by ``backoff`` after
+    every cycle that found no change, up to ``max_interval``. A detected change
+    resets it to ``min_interval``, as does being inside one of the hot windows
+    (the registry's usual update times). A long sleep is cut short so the
+    daemon wakes when the next hot window opens.
+    """
+
+    def __init__(self, min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 backoff: Optional[float] = None, hot_windows: Optional[str] = None, jitter: float = 0.1):
+        self.min_interval = min_interval or Config.DAEMON_MIN_INTERVAL
+        self.max_interval = max(self.min_interval, max_interval or Config.DAEMON_MAX_INTERVAL)
+        self.backoff = backoff or Config.DAEMON_BACKOFF
+        self.windows = parse_windows(Config.DAEMON_HOT_WINDOWS if hot_windows is None else hot_windows)
+        self.jitter = jitter
+        self.interval = self.min_interval
+
+    def in_hot_window(self, now: datetime) -> bool:
+        minute = now.hour * 60 + now.minute
+        return any(start <= minute < end if start <= end else minute >= start or minute < end
+                   for start, end in self.windows)
+
+    def seconds_to_next_window(self, now: datetime) -> Optional[float]:
+        if not self.windows:
+            return None
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        starts = [midnight + timedelta(minutes=start) for start, _ in self.windows]
+        return min(((start if start > now else start + timedelta(days=1)) - now).total_seconds()
+                   for start in starts)
+
+    def next_delay(self, changed: bool, now: Optional[datetime] = None) -> float:
+        """Seconds until the next cycle, given whether the last cycle found a change"""
+        now = now or datetime.now(timezone.utc)
+        if changed or self.in_hot_window(now):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+        delay = self.interval
+        to_window = self.seconds_to_next_window(now)
+        if to_window is not None and to_window < delay:
+            delay = max(to_window, 1.0)
+        # Spread polls a little so they do not land on the same second every time
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Daemon:
+    """Scrape and sync ``companies`` in a loop until stopped
+
+    The scraper (and its logged-in session) and the Webflow transport live for
+    the whole process, so later cycles cost one conditional page request per
+    issuer while the register is unchanged. When every scrape in a cycle fails
+    the session is re-checked (and re-established) and the cycle runs again.
+    """
+
+    def __init__(self, companies: Dict[str, Optional[str]], schedule: Optional[AdaptiveSchedule] = None,
+                 force: bool = False, max_cycles: Optional[int] = None):
+        self.companies = companies
+        self.schedule = schedule or AdaptiveSchedule()
+        self.force = force
+        self.max_cycles = Config.DAEMON_MAX_CYCLES if max_cycles is None else max_cycles
+        self.scraper = ShareholderScraper()
+        self.transport = WebflowTransport(Config.WEBFLOW_API_TOKEN) if any(companies.values()) else None
+        self.stopping = threading.Event()
+        self.cycles = 0
+
+    def stop(self, *args):
+        logger.info("Stop requested, finishing after the current cycle")
+        self.stopping.set()
+
+    def _run_pipeline(self) -> Tuple[Pipeline, bool]:
+        # Listings are not prefetched: most cycles find nothing to sync
+        pipeline = Pipeline(self.scraper, self.transport, force=self.force and self.cycles == 0,
+                            prefetch_listings=False)
+        results = asyncio.run(pipeline.run(self.companies))
+        return pipeline, any(result.shareholders for result in results)
+
+    def run_cycle(self) -> bool:
+        """One scrape-and-sync pass; returns True if anything was synced to Webflow"""
+        started = time.perf_counter()
+        run_budget.reset()
+        pipeline, scraped = self._run_pipeline()
+        if not scraped and self.scraper.authenticated:
+            # Most likely the registry session expired while we slept
+            logger.warning("No issuer could be scraped, re-checking the registry session and retrying")
+            self.scraper.authenticated = False
+            pipeline, scraped = self._run_pipeline()
+
+        logger.info(f"Cycle {self.cycles + 1} took {time.perf_counter() - started:.2f}s "
+                    f"(synced={pipeline.synced}, unchanged={pipeline.unchanged}); "
+                    f"HTTP requests: {tracer.summary_line()}; registry concurrency: {registry_scheduler.summary_line()}")
+        tracer.reset()
+        metrics.count('daemon_cycles_total')
+        metrics.set('run_duration_seconds', round(time.perf_counter() - started, 3))
+        metrics.set('run_last_timestamp_seconds', round(time.time()))
+        try:
+            metrics.write()
+        except Exception as e:
+            logger.warning(f"Could not write metrics: {str(e)}")
+        return pipeline.synced > 0
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.stop)
+
+        logger.info(f"Daemon started for {len(self.companies)} issuer(s)")
+        while not self.stopping.is_set():
+            try:
+                changed = self.run_cycle()
+            except Exception as e:
+                logger.error(f"Cycle failed: {str(e)}")
+                changed = False
+            self.cycles += 1
+            if self.max_cycles and self.cycles >= self.max_cycles:
+                break
+
+            delay = self.schedule.next_delay(changed)
+            logger.info(f"Next scrape in {delay:.0f}s")
+            self.stopping.wait(delay)
+
+        if self.transport:
+            self.transport.close()
+        logger.info(f"Daemon stopped after {self.cycles} cycles")
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(shareholders: List[ShareholderRecord]) -> str:
+    """Hash of the normalized shareholder table; equal tables give equal fingerprints"""
+    digest = hashlib.sha256()
+    for record in shareholders:
+        row = (record.rank, ' '.join(record.surname_company.split()), ' '.join(record.first_name.split()),
+               record.holdings, str(record.percent.normalize()))
+        digest.update(json.dumps(row, ensure_ascii=False).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def page_validators(response) -> Dict[str, Optional[str]]:
+    """What we need to recognise this page again: HTTP validators plus a hash of the raw bytes"""
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'raw_sha256': hashlib.sha256(response.content).hexdigest(),
+    }
+
+
+class FingerprintStore:
+    """Per-issuer record of the last table that was successfully synced to Webflow
+
+    Kept as JSON in the state directory. Besides the fingerprint it holds the
+    page's ETag/Last-Modified and raw-byte hash, and the synced rows, so an
+    unchanged page can be answered without parsing it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.FINGERPRINT_PATH
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable fingerprint store {self.path}: {str(e)}")
+            return {}
+
+    def get(self, orgnr: str) -> Optional[Dict]:
+        with self.lock:
+            return self.entries.get(orgnr)
+
+    def last_fingerprint(self, orgnr: str) -> Optional[str]:
+        entry = self.get(orgnr)
+        return entry['fingerprint'] if entry else None
+
+    def conditional_headers(self, orgnr: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since for the last synced page"""
+        entry = self.get(orgnr) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def cached_records(self, orgnr: str) -> Optional[List[ShareholderRecord]]:
+        entry = self.get(orgnr)
+        if not entry or 'rows' not in entry:
+            return None
+        return [ShareholderRecord.from_dict(row) for row in entry['rows']]
+
+    def is_unchanged(self, orgnr: str, shareholders: List[ShareholderRecord], basis: Optional[str] = None) -> bool:
+        """True if the table, and whatever else the synced items were derived from (``basis``), is as last synced"""
+        entry = self.get(orgnr)
+        return bool(entry) and entry['fingerprint'] == fingerprint(shareholders) and entry.get('basis') == basis
+
+    def record_sync(self, orgnr: str, shareholders: List[ShareholderRecord], validators: Optional[Dict] = None,
+                    basis: Optional[str] = None):
+        """Remember a successfully synced table; call only after Webflow accepted it"""
+        entry = {
+            'fingerprint': fingerprint(shareholders),
+            'basis': basis,  # e.g. the date the change fields were computed against
+            'synced_at': time.time(),
+            'rows': [shareholder.as_dict() for shareholder in shareholders],
+        }
+        entry.update(validators or {})
+        with self.lock:
+            self.entries[orgnr] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
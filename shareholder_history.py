@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Shareholder history
+Daily snapshots of scraped registers in a local SQLite database, with queries for
+the latest snapshot, changes between two dates and one holder's history.
+
+    python shareholder_history.py latest
+    python shareholder_history.py changes 2024-01-01 2024-06-30
+    python shareholder_history.py history "Folketrygdfondet"
+    python shareholder_history.py dates --orgnr 985279721
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from shareholder_config import Config
+from shareholder_records import PERCENT_DECIMALS, ShareholderRecord, format_holdings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS holders (
+    id INTEGER PRIMARY KEY,
+    surname_company TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    UNIQUE (surname_company, first_name)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    orgnr TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    scraped_at TEXT NOT NULL DEFAULT (datetime('now')),
+    row_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (orgnr, snapshot_date)
+);
+-- One row per (snapshot, shareholder); occurrence separates repeated nominee names
+CREATE TABLE IF NOT EXISTS holdings (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    holder_id INTEGER NOT NULL REFERENCES holders (id),
+    occurrence INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    shares INTEGER NOT NULL,
+    percent INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, holder_id, occurrence)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS holdings_by_holder ON holdings (holder_id, snapshot_id);
+"""
+
+
+def _percent(value: int) -> Decimal:
+    return Decimal(value).scaleb(-PERCENT_DECIMALS)
+
+
+class HoldingChange(NamedTuple):
+    """How one shareholder's position differs between two snapshots"""
+    surname_company: str
+    first_name: str
+    old_rank: Optional[int]
+    new_rank: Optional[int]
+    old_holdings: int
+    new_holdings: int
+
+    @property
+    def status(self) -> str:
+        if self.old_rank is None:
+            return 'new'
+        if self.new_rank is None:
+            return 'exited'
+        return 'changed'
+
+    @property
+    def delta(self) -> int:
+        return self.new_holdings - self.old_holdings
+
+
+class HistoryEntry(NamedTuple):
+    snapshot_date: str
+    rank: int
+    holdings: int
+    percent: Decimal
+
+
+class HistoryStore:
+    """SQLite store of shareholder snapshots keyed by (orgnr, date, shareholder)
+
+    Snapshots are one per issuer per day (a later scrape the same day replaces
+    the earlier one). Lookups by date go through the (orgnr, snapshot_date)
+    unique index and holder histories through ``holdings_by_holder``, so query
+    cost does not grow with the number of stored days.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.HISTORY_DB_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _holder_id(self, surname_company: str, first_name: str) -> int:
+        self.conn.execute('INSERT OR IGNORE INTO holders (surname_company, first_name) VALUES (?, ?)',
+                          (surname_company, first_name))
+        return self.conn.execute('SELECT id FROM holders WHERE surname_company = ? AND first_name = ?',
+                                 (surname_company, first_name)).fetchone()[0]
+
+    def record_snapshot(self, orgnr: str, shareholders: Iterable[ShareholderRecord],
+                        snapshot_date: Optional[str] = None) -> int:
+        """Store a scrape as the snapshot for ``snapshot_date`` (default today); returns the row count"""
+        snapshot_date = snapshot_date or date.today().isoformat()
+        with self.conn:
+            self.conn.execute('DELETE FROM snapshots WHERE orgnr = ? AND snapshot_date = ?', (orgnr, snapshot_date))
+            snapshot_id = self.conn.execute('INSERT INTO snapshots (orgnr, snapshot_date) VALUES (?, ?)',
+                                            (orgnr, snapshot_date)).lastrowid
+
+            holder_ids = {}
+            occurrences = {}
+
+            def rows():
+                for record in shareholders:
+                    key = (record.surname_company, record.first_name)
+                    if key not in holder_ids:
+                        holder_ids[key] = self._holder_id(*key)
+                    occurrences[key] = occurrences.get(key, 0) + 1
+                    yield (snapshot_id, holder_ids[key], occurrences[key], record.rank, record.holdings,
+                           int(record.percent.scaleb(PERCENT_DECIMALS)))
+
+            count = self.conn.executemany('INSERT INTO holdings VALUES (?, ?, ?, ?, ?, ?)', rows()).rowcount
+            self.conn.execute('UPDATE snapshots SET row_count = ? WHERE id = ?', (count, snapshot_id))
+
+        logger.info(f"[{orgnr}] Recorded {count} holdings in history for {snapshot_date}")
+        return count
+
+    def snapshot_dates(self, orgnr: str) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            'SELECT snapshot_date FROM snapshots WHERE orgnr = ? ORDER BY snapshot_date', (orgnr,))]
+
+    def _snapshot_on_or_before(self, orgnr: str, snapshot_date: Optional[str]) -> Optional[Tuple[int, str]]:
+        if snapshot_date is None:
+            return self.conn.execute('SELECT id, snapshot_date FROM snapshots WHERE orgnr = ? '
+                                     'ORDER BY snapshot_date DESC LIMIT 1', (orgnr,)).fetchone()
+        return self.conn.execute('SELECT id, snapshot_date FROM snapshots WHERE orgnr = ? AND snapshot_date <= ? '
+                                 'ORDER BY snapshot_date DESC LIMIT 1', (orgnr, snapshot_date)).fetchone()
+
+    def snapshot_date(self, orgnr: str, snapshot_date: Optional[str] = None) -> Optional[str]:
+        """Date of the snapshot taken on or before ``snapshot_date`` (default: the latest), without loading it"""
+        found = self._snapshot_on_or_before(orgnr, snapshot_date)
+        return found[1] if found else None
+
+    def snapshot(self, orgnr: str, snapshot_date: Optional[str] = None) -> Tuple[Optional[str], List[ShareholderRecord]]:
+        """The snapshot taken on or before ``snapshot_date`` (default: the latest), with its actual date"""
+        found = self._snapshot_on_or_before(orgnr, snapshot_date)
+        if not found:
+            return None, []
+        snapshot_id, actual_date = found
+        rows = self.conn.execute(
+            'SELECT h.rank, p.surname_company, p.first_name, h.shares, h.percent '
+            'FROM holdings h JOIN holders p ON p.id = h.holder_id WHERE h.snapshot_id = ? ORDER BY h.rank',
+            (snapshot_id,))
+        return actual_date, [ShareholderRecord(rank, surname, first, shares, _percent(percent))
+                             for rank, surname, first, shares, percent in rows]
+
+    def latest_snapshot(self, orgnr: str) -> Tuple[Optional[str], List[ShareholderRecord]]:
+        return self.snapshot(orgnr)
+
+    def changes(self, orgnr: str, from_date: str, to_date: str) -> List[HoldingChange]:
+        """Holders that entered, left or changed position between the snapshots on or before two dates"""
+        old = self._snapshot_on_or_before(orgnr, from_date)
+        new = self._snapshot_on_or_before(orgnr, to_date)
+        if not old or not new:
+            return []
+
+        query = """
+            SELECT p.surname_company, p.first_name, o.rank, n.rank, COALESCE(o.shares, 0), COALESCE(n.shares, 0)
+            FROM holdings o
+            LEFT JOIN holdings n ON n.snapshot_id = :new AND n.holder_id = o.holder_id AND n.occurrence = o.occurrence
+            JOIN holders p ON p.id = o.holder_id
+            WHERE o.snapshot_id = :old AND (n.shares IS NULL OR n.shares != o.shares OR n.rank != o.rank)
+            UNION ALL
+            SELECT p.surname_company, p.first_name, NULL, n.rank, 0, n.shares
+            FROM holdings n
+            JOIN holders p ON p.id = n.holder_id
+            WHERE n.snapshot_id = :new AND NOT EXISTS (
+                SELECT 1 FROM holdings o
+                WHERE o.snapshot_id = :old AND o.holder_id = n.holder_id AND o.occurrence = n.occurrence)
+        """
+        changes = [HoldingChange(*row) for row in self.conn.execute(query, {'old': old[0], 'new': new[0]})]
+        changes.sort(key=lambda change: -abs(change.delta))
+        return changes
+
+    def holder_history(self, orgnr: str, surname_company: str, first_name: str = '') -> List[HistoryEntry]:
+        """Rank and holdings of one shareholder in every snapshot of an issuer"""
+        rows = self.conn.execute(
+            'SELECT s.snapshot_date, h.rank, h.shares, h.percent '
+            'FROM holders p JOIN holdings h ON h.holder_id = p.id JOIN snapshots s ON s.id = h.snapshot_id '
+            'WHERE p.surname_company = ? AND p.first_name = ? AND s.orgnr = ? AND h.occurrence = 1 '
+            'ORDER BY s.snapshot_date',
+            (surname_company, first_name, orgnr))
+        return [HistoryEntry(snapshot_date, rank, shares, _percent(percent))
+                for snapshot_date, rank, shares, percent in rows]
+
+
+def record_history(orgnr: str, shareholders: List[ShareholderRecord]):
+    """Keep today's scrape in the local history database; never fails the run"""
+    try:
+        store = HistoryStore()
+        try:
+            store.record_snapshot(orgnr, shareholders)
+        finally:
+            store.close()
+    except Exception as e:
+        logger.warning(f"[{orgnr}] Could not record history snapshot: {str(e)}")
+
+
+def _print_rows(headers: List[str], rows: List[Tuple]):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print('  '.join(str(value).ljust(width) for value, width in zip(row, widths)))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orgnr', default=Config.TARGET_ORGNR, help='Issuer org number (default: TARGET_ORGNR)')
+    parser.add_argument('--db', default=None, help='History database (default: HISTORY_DB_PATH)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    commands = parser.add_subparsers(dest='command', required=True)
+    latest = commands.add_parser('latest', help='Latest snapshot (or the one on or before --date)')
+    latest.add_argument('--date')
+    changes = commands.add_parser('changes', help='Changes between the snapshots on or before two dates')
+    changes.add_argument('from_date')
+    changes.add_argument('to_date')
+    history = commands.add_parser('history', help="One shareholder's holdings over time")
+    history.add_argument('surname_company')
+    history.add_argument('first_name', nargs='?', default='')
+    commands.add_parser('dates', help='Dates with a stored snapshot')
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.db)
+    try:
+        if args.command == 'latest':
+            snapshot_date, records = store.snapshot(args.orgnr, args.date)
+            if args.json:
+                print(json.dumps({'date': snapshot_date, 'shareholders': [r.as_dict() for r in records]},
+                                 ensure_ascii=False, indent=2))
+            else:
+                print(f"Snapshot {snapshot_date} for {args.orgnr}")
+                _print_rows(['rank', 'name', 'holdings', 'percent'],
+                            [(r.rank, r.name, format_holdings(r.holdings), r.percent) for r in records])
+        elif args.command == 'changes':
+            result = store.changes(args.orgnr, args.from_date, args.to_date)
+            if args.json:
+                print(json.dumps([dict(c._asdict(), status=c.status, delta=c.delta) for c in result],
+                                 ensure_ascii=False, indent=2))
+            else:
+                _print_rows(['status', 'name', 'old rank', 'new rank', 'delta'],
+                            [(c.status, f"{c.surname_company} {c.first_name}".strip(), c.old_rank or '-',
+                              c.new_rank or '-', f"{c.delta:+,}".replace(',', ' ')) for c in result])
+        elif args.command == 'history':
+            result = store.holder_history(args.orgnr, args.surname_company, args.first_name)
+            if args.json:
+                print(json.dumps([dict(e._asdict(), percent=str(e.percent)) for e in result], indent=2))
+            else:
+                _print_rows(['date', 'rank', 'holdings', 'percent'],
+                            [(e.snapshot_date, e.rank, format_holdings(e.holdings), e.percent) for e in result])
+        elif args.command == 'dates':
+            dates = store.snapshot_dates(args.orgnr)
+            print(json.dumps(dates) if args.json else '\n'.join(dates))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterable, List, Optional
+import requests
+from shareholder_cassette import install as install_cassette
+from shareholder_config import Config
+from shareholder_resilience import IDEMPOTENT_METHODS, ResilientAdapter, budget_phase, run_budget
+from shareholder_tracing import attach as trace_session, current_phase
+
+logger = logging.getLogger(__name__)
+
+REPLAY_RATE = 10 ** 9  # requests per minute while replaying a cassette, i.e. unlimited
+
+class TokenBucket:
+    """Thread-safe token bucket that never lets more than ``per_minute`` calls through in any minute
+
+    A bucket of capacity C refilled at r tokens/s admits C + 60r calls in a
+    minute, so the refill rate is set to (per_minute - burst) / 60.
+    """
+
+    def __init__(self, per_minute: int, burst: int):
+        self.capacity = max(1, min(burst, per_minute - 1))
+        self.rate = max(1, per_minute - self.capacity) / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self, seconds: float = 0.0):
+        """Empty the bucket (and keep it empty for ``seconds``) when the server says we are over quota"""
+        with self.lock:
+            self._refill()
+            self.tokens = -seconds * self.rate
+
+
+def retry_after_seconds(response: requests.Response, default: float) -> float:
+    """Read a Retry-After header given either as seconds or as an HTTP date"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class WebflowTransport:
+    """Keep-alive, rate-limited HTTP client for the Webflow API
+
+    Every request waits for a token from a bucket sized to the API key's
+    per-minute quota, so ``map`` can run item operations on a worker pool
+    without overrunning it. 429 responses, and 503 responses to idempotent
+    methods, are retried after the server's Retry-After delay (or exponential
+    backoff without one). A 429 means the request was refused unprocessed, so
+    a POST is safe to send again; after a 503 it may already have been applied.
+    """
+
+    RETRY_STATUSES = (429, 503)
+
+    def __init__(self, token: str, base_url: Optional[str] = None,
+                 requests_per_minute: Optional[int] = None, max_workers: Optional[int] = None,
+                 max_retries: int = 4, timeout=None):
+        self.base_url = (base_url or Config.WEBFLOW_BASE_URL).rstrip('/')
+        self.max_workers = max_workers or Config.WEBFLOW_MAX_WORKERS
+        self.max_retries = max_retries
+        self.timeout = timeout or Config.WEBFLOW_TIMEOUT
+        self.bucket = TokenBucket(requests_per_minute or Config.WEBFLOW_RATE_LIMIT, burst=Config.WEBFLOW_BURST)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+        trace_session(self.session, 'webflow')
+        # 429 and 503 are handled in request() with Retry-After; the adapter retries
+        # idempotent calls on connection errors, timeouts and gateway errors
+        adapter = ResilientAdapter(self.timeout, retry_statuses=(502, 504), pool_connections=1,
+                                   pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if install_cassette(self.session, 'webflow') == 'replay':
+            # Replayed responses cost no API quota
+            self.bucket = TokenBucket(REPLAY_RATE, burst=REPLAY_RATE)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send one rate-limited request; ``path`` is relative to the API base URL"""
+        url = path if path.startswith('http') else f"{self.base_url}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            response = self.session.request(method, url, **kwargs)
+
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                self.bucket.drain()
+            retryable = response.status_code in self.RETRY_STATUSES and (
+                response.status_code == 429 or method.upper() in IDEMPOTENT_METHODS)
+            if not retryable or attempt == self.max_retries:
+                return response
+
+            delay = retry_after_seconds(response, default=min(60.0, 2.0 ** attempt))
+            logger.warning(f"Webflow returned {response.status_code} for {method} {path}, "
+                           f"retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+            # Hold back every worker, not just this one
+            self.bucket.drain(delay)
+            run_budget.sleep(budget_phase(current_phase()), delay)
+
+        return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', path, **kwargs)
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """Run ``fn`` over ``items`` on the worker pool, returning results in input order"""
+        items = list(items)
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [fn(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='webflow')
+        return list(self._executor.map(fn, items))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
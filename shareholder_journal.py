@@ -0,0 +1,147 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord
+
+logger = logging.getLogger(__name__)
+
+
+def operation_key(op: Dict) -> Tuple[str, str]:
+    """What an acknowledgement refers to: item ID for updates and deletes, slug for creates"""
+    if op['op'] == 'create':
+        return 'create', op['fields']['slug']
+    return op['op'], op['item_id']
+
+
+class SyncJournal:
+    """Write-ahead log of one Webflow sync, so an interrupted sync can be finished later
+
+    Before the first write the journal stores the scraped rows and every
+    planned operation; each completed operation is then appended as an
+    acknowledgement. Lines are flushed and fsynced as they are written, and a
+    torn last line from a crash is ignored on load. The file is removed once
+    every operation is done; used as a context manager, the journal is closed
+    (but kept) however the sync ends. There is one journal per collection: a new sync
+    of the collection plans from its current state and replaces the old one.
+    """
+
+    def __init__(self, path: str, collection_id: str, records: List[ShareholderRecord], operations: List[Dict],
+                 orgnr: Optional[str] = None, validators: Optional[Dict] = None, started: Optional[float] = None):
+        self.path = path
+        self.collection_id = collection_id
+        self.records = records
+        self.operations = operations
+        self.orgnr = orgnr
+        self.validators = validators
+        self.started = started or time.time()
+        self.done: Set[Tuple[str, str]] = set()
+        self.created: Dict[str, str] = {}  # slug -> new item ID
+        self.lock = threading.Lock()
+        self.file = None
+
+    @staticmethod
+    def path_for(collection_id: str) -> str:
+        return os.path.join(Config.JOURNAL_DIR, f"{collection_id}.jsonl")
+
+    @classmethod
+    def begin(cls, collection_id: str, records: List[ShareholderRecord], plan, orgnr: Optional[str] = None,
+              validators: Optional[Dict] = None) -> 'SyncJournal':
+        """Write the payload and the planned operations to disk before any of them runs"""
+        operations = ([{'op': 'update', 'item_id': item_id, 'fields': fields} for item_id, fields in plan.updates]
+                      + [{'op': 'create', 'fields': fields} for fields in plan.creates]
+                      + [{'op': 'delete', 'item_id': item_id} for item_id in plan.deletes])
+        journal = cls(cls.path_for(collection_id), collection_id, records, operations, orgnr, validators)
+        os.makedirs(os.path.dirname(journal.path) or '.', exist_ok=True)
+        journal.file = open(journal.path, 'w', encoding='utf-8')
+        journal._append({
+            'collection_id': collection_id,
+            'orgnr': orgnr,
+            'validators': validators,
+            'started': journal.started,
+            'records': [record.as_dict() for record in records],
+            'operations': operations,
+        })
+        return journal
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SyncJournal']:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        entries = []
+        for number, line in enumerate(lines):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if number == len(lines) - 1:
+                    break  # torn write from a crash; that acknowledgement never happened
+                raise
+        if not entries:
+            return None
+        header = entries[0]
+        journal = cls(path, header['collection_id'], [ShareholderRecord.from_dict(row) for row in header['records']],
+                      header['operations'], header.get('orgnr'), header.get('validators'), header.get('started'))
+        for ack in entries[1:]:
+            for key in ack['done']:
+                journal.done.add(tuple(key))
+            journal.created.update(ack.get('created', {}))
+        journal.file = open(path, 'a', encoding='utf-8')
+        return journal
+
+    @classmethod
+    def pending(cls) -> List['SyncJournal']:
+        """Journals of syncs that did not finish, oldest first"""
+        journals = []
+        for path in sorted(glob.glob(os.path.join(Config.JOURNAL_DIR, '*.jsonl'))):
+            try:
+                journal = cls.load(path)
+            except Exception as e:
+                logger.error(f"Unreadable sync journal {path}: {str(e)}")
+                continue
+            if journal is not None:
+                journals.append(journal)
+        return sorted(journals, key=lambda journal: journal.started)
+
+    def _append(self, entry: Dict):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def ack(self, op: str, keys: List[str], created: Optional[Dict[str, str]] = None):
+        """Record operations as done; ``created`` maps slugs of created items to their new IDs"""
+        entry = {'done': [[op, key] for key in keys]}
+        if created:
+            entry['created'] = created
+        with self.lock:
+            self._append(entry)
+            self.done.update((op, key) for key in keys)
+            self.created.update(created or {})
+
+    def outstanding(self) -> List[Dict]:
+        with self.lock:
+            return [op for op in self.operations if operation_key(op) not in self.done]
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self) -> 'SyncJournal':
+        return self
+
+    def __exit__(self, *exc_info):
+        # The file stays on disk for --resume; only the handle is released
+        self.close()
+
+    def complete(self):
+        """Every operation is done; the journal is no longer needed"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
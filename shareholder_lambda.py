@@ -0,0 +1,213 @@
+"""
+AWS Lambda entry point for the shareholder scraper
+The Python counterpart of src/lambda-handler.js, wrapping shareholder_main.main.
+Importing this module loads only the configuration; the scraper, requests and
+the Webflow client are imported on the first run. The registry session and the
+Webflow transport are module globals, so a warm invocation reuses the login
+and open connections of the one before it.
+
+    handler: shareholder_lambda.handler
+    event:   {"action": "run", "orgnr": ["985279721"], "force": false, "pipeline": false}
+             {"action": "resume"} | {"action": "health"} | {"action": "stats"}
+             EventBridge schedules and API Gateway (/run, /resume, /health, /stats) work too
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    # Only /tmp is writable in Lambda; explicit settings still win
+    os.environ.setdefault('SHAREHOLDER_STATE_DIR', '/tmp/shareholder-state')
+    os.environ.setdefault('LOG_FILE', '')  # CloudWatch gets stdout
+    for name, filename in (('METRICS_PATH', 'shareholder-metrics.prom'),
+                           ('METRICS_JSON_PATH', 'shareholder-metrics.json'),
+                           ('TRACE_REPORT_PATH', 'shareholder-trace.json')):
+        os.environ.setdefault(name, os.path.join('/tmp', filename))
+
+# Loaded once per container, in the init phase
+from shareholder_config import Config
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('run', 'resume', 'health', 'stats')
+
+# Survive between warm invocations of the same container
+_scraper = None
+_transport = None
+_invocations = 0
+_started = time.time()
+
+
+def _clients():
+    """The container's registry scraper and Webflow transport, created on first use"""
+    global _scraper, _transport
+    if _scraper is None:
+        from shareholder_scraper import ShareholderScraper
+        _scraper = ShareholderScraper()
+    if _transport is None:
+        from shareholder_http import WebflowTransport
+        _transport = WebflowTransport(Config.WEBFLOW_API_TOKEN)
+    return _scraper, _transport
+
+
+def _flag(value) -> bool:
+    """An event option as a boolean; query strings and JSON bodies may pass "false" or "0" as text"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def build_argv(options: Dict) -> List[str]:
+    """shareholder_main arguments for an event's options (orgnr, manifest, force, pipeline, resume)"""
+    if options.get('action') == 'resume':
+        return ['--resume']
+    argv = []
+    orgnr = options.get('orgnr')
+    if orgnr:
+        # A list, or a comma-separated string from a query string
+        numbers = orgnr.split(',') if isinstance(orgnr, str) else orgnr
+        argv += ['--orgnr'] + [str(number).strip() for number in numbers if str(number).strip()]
+    elif options.get('manifest'):
+        argv += ['--manifest', options['manifest']]
+    if _flag(options.get('force', False)):
+        argv.append('--force')
+    if _flag(options.get('pipeline', False)):
+        argv.append('--pipeline')
+    return argv
+
+
+def fit_budget(context) -> float:
+    """Shorten the run budget to end LAMBDA_TIMEOUT_MARGIN before Lambda's own timeout
+
+    Lambda stops a function at its timeout (15 minutes at most) wherever it
+    is; running out of budget instead ends the run cleanly, with the sync
+    journal and metrics written. Returns the budget in seconds.
+    """
+    from shareholder_resilience import run_budget
+
+    total = Config.RUN_DEADLINE
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        total = min(total, context.get_remaining_time_in_millis() / 1000 - Config.LAMBDA_TIMEOUT_MARGIN)
+    run_budget.total = max(total, 1.0)
+    return run_budget.total
+
+
+def run(options: Dict, context=None) -> Dict:
+    """One scraper run with the container's warm clients"""
+    import shareholder_main
+    from shareholder_tracing import tracer
+
+    cold_start = _scraper is None
+    scraper, transport = _clients()
+    reused_login = scraper.authenticated
+    argv = build_argv(options)
+    started = time.perf_counter()
+    try:
+        logger.info(f"Run budget {fit_budget(context):.0f}s")
+        exit_code = shareholder_main.main(argv, scraper, transport)
+        if exit_code == shareholder_main.EXIT_FAILURE and reused_login and options.get('action') != 'resume':
+            # Most likely the registry session expired while the container was idle
+            logger.warning("Run failed on a reused registry session, logging in again and retrying")
+            tracer.reset()
+            scraper.authenticated = False
+            # The retry gets what is left before the timeout, not a fresh budget
+            fit_budget(context)
+            exit_code = shareholder_main.main(argv, scraper, transport)
+    finally:
+        # The trace report covers one invocation, not the container's lifetime
+        tracer.reset()
+    status = {shareholder_main.EXIT_SUCCESS: 'synced', shareholder_main.EXIT_UNCHANGED: 'unchanged'}
+    return {
+        'exit_code': exit_code,
+        'status': status.get(exit_code, 'failed'),
+        'duration': round(time.perf_counter() - started, 2),
+        'cold_start': cold_start,
+    }
+
+
+def health() -> Dict:
+    try:
+        Config.validate_config()
+        problem = None
+    except ValueError as e:
+        problem = str(e)
+    return {
+        'status': 'unhealthy' if problem else 'healthy',
+        'error': problem,
+        'invocations': _invocations,
+        'container_age': round(time.time() - _started),
+        'registry_session': bool(_scraper and _scraper.authenticated),
+    }
+
+
+def stats() -> Dict:
+    """Metrics written by the container's last run (counters accumulate across warm runs)"""
+    try:
+        with open(Config.METRICS_JSON_PATH, encoding='utf-8') as f:
+            return {'invocations': _invocations, 'metrics': json.load(f)}
+    except (OSError, ValueError):
+        return {'invocations': _invocations, 'metrics': None}
+
+
+def _is_http(event: Dict) -> bool:
+    # REST APIs set httpMethod; HTTP APIs and function URLs only requestContext
+    return bool(event.get('httpMethod') or event.get('requestContext'))
+
+
+def _event_options(event: Dict) -> Optional[Dict]:
+    """The action and run options of a direct, EventBridge or API Gateway event; None if unknown"""
+    if event.get('source') == 'aws.events':
+        return {'action': 'run'}
+    if _is_http(event):
+        path = event.get('path') or event.get('rawPath') or ''
+        try:
+            options = json.loads(event.get('body') or '{}')
+        except ValueError:
+            options = {}
+        options.update(event.get('queryStringParameters') or {})
+        options['action'] = path.rstrip('/').rsplit('/', 1)[-1]
+        return options if options['action'] in ACTIONS else None
+    options = dict(event)
+    options.setdefault('action', 'run')
+    return options if options['action'] in ACTIONS else None
+
+
+def handler(event: Optional[Dict], context=None) -> Dict:
+    """Lambda handler; API Gateway events get an HTTP response, others the result itself"""
+    global _invocations
+    from shareholder_logging import setup_logging
+    # Log synchronously: a frozen container would hold queued records until the next invocation
+    setup_logging(background=False)
+
+    event = event or {}
+    _invocations += 1
+    options = _event_options(event)
+    if options is None:
+        result = {'error': 'Unknown action', 'availableActions': list(ACTIONS)}
+        status_code = 404
+    elif options['action'] == 'health':
+        result = health()
+        status_code = 200 if result['status'] == 'healthy' else 503
+    elif options['action'] == 'stats':
+        result = stats()
+        status_code = 200
+    else:
+        try:
+            result = run(options, context)
+            status_code = 500 if result['status'] == 'failed' else 200
+        except Exception as e:
+            logger.exception(f"Lambda run failed: {str(e)}")
+            result = {'exit_code': 1, 'status': 'failed', 'error': str(e)}
+            status_code = 500
+    logger.info(f"Invocation {_invocations} ({options['action'] if options else 'unknown'}): HTTP {status_code}")
+
+    if _is_http(event):
+        return {
+            'statusCode': status_code,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps(result),
+        }
+    return result
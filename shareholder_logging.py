@@ -0,0 +1,120 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Sequence
+from shareholder_config import Config
+from shareholder_tracing import current_phase
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via ``extra=`` and goes into the JSON
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[QueueListener] = None
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, phase, message and any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class PhaseFilter(logging.Filter):
+    """Stamps records with the caller's trace phase before they leave its thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.phase = current_phase()
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread
+
+    The stock handler renders ``msg % args`` in the logging thread; here the
+    record is queued as is, so the caller only pays for creating it. Log
+    arguments should therefore not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(log_file: Optional[str] = None, level: Optional[str] = None,
+                  background: bool = True) -> Optional[QueueListener]:
+    """Configure the root logger once for the whole process
+
+    Console output is plain text (or JSON with LOG_FORMAT=json); the log
+    file, if any, gets JSON lines. With ``background`` the handlers run on a
+    QueueListener thread, so scraping never waits on log I/O; interactive
+    scripts pass ``background=False`` to keep log lines in step with prompts.
+    Later calls keep the first configuration, whichever mode it chose.
+    """
+    global _listener, _configured
+    if _configured:
+        return _listener
+    _configured = True
+
+    log_file = Config.LOG_FILE if log_file is None else log_file
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(JsonFormatter() if Config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+    handlers = [console]
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel((level or Config.LOG_LEVEL).upper())
+
+    if not background:
+        for handler in handlers:
+            handler.addFilter(PhaseFilter())
+            root.addHandler(handler)
+        return None
+
+    records = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    queue_handler.addFilter(PhaseFilter())
+    root.addHandler(queue_handler)
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Drain the queue on exit so the last lines of a run are not lost
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def log_sampled(log: logging.Logger, message: str, items: Sequence, limit: Optional[int] = None):
+    """Log per-row events without the cost growing with the row count
+
+    The first ``limit`` items (LOG_ROW_SAMPLE) are logged at INFO, the rest
+    only at DEBUG, and a single line says how many were left out. When DEBUG
+    is off the loop stops after the sample.
+    """
+    limit = Config.LOG_ROW_SAMPLE if limit is None else limit
+    for index, item in enumerate(items):
+        level = logging.INFO if index < limit else logging.DEBUG
+        if not log.isEnabledFor(level):
+            if index >= limit:
+                break
+            continue
+        log.log(level, message, item)
+    if len(items) > limit:
+        log.info("... %d more not shown (LOG_ROW_SAMPLE=%d)", len(items) - limit, limit)
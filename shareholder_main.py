@@ -4,73 +4,293 @@ Norwegian Shareholder Registry Scraper
 Scrapes top 20 shareholders from aksjeeierregisteret.no and updates Webflow
 """
 
+import argparse
+import csv
+import json
 import logging
 import sys
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 from shareholder_scraper import ShareholderScraper
-from shareholder_webflow_api import WebflowAPI
+from shareholder_webflow_api import SitePublisher, WebflowAPI
+from shareholder_http import WebflowTransport
 from shareholder_config import Config
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('shareholder-scraper.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from shareholder_fingerprint import FingerprintStore
+from shareholder_journal import SyncJournal
+from shareholder_records import ShareholderRecord
+from shareholder_history import record_history
+from shareholder_logging import setup_logging
+from shareholder_metrics import metrics, profile_call
+from shareholder_resilience import run_budget
+from shareholder_sinks import Snapshot, SinkFanOut, WebflowSink, build_sinks
+from shareholder_tracing import tracer
 
 logger = logging.getLogger(__name__)
 
-def main():
-    """Main execution function"""
-    logger.info("=" * 50)
-    logger.info(f"Starting shareholder scraper run at {datetime.now()}")
-    logger.info("=" * 50)
+# Exit codes
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_UNCHANGED = 3  # register matches the last successful sync; Webflow was not touched
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    batch = parser.add_mutually_exclusive_group()
+    batch.add_argument('--orgnr', nargs='+', metavar='ORGNR',
+                       help='Scrape these issuers in batch mode (no Webflow sync)')
+    batch.add_argument('--manifest', metavar='PATH',
+                       help='JSON manifest mapping org numbers to Webflow collection IDs')
+    parser.add_argument('--output', metavar='PATH',
+                        help='Write batch results with per-company timing to this JSON file')
+    parser.add_argument('--force', action='store_true',
+                        help='Sync to Webflow even if the register is unchanged since the last sync')
+    parser.add_argument('--full-register', metavar='PATH',
+                        help='Stream the whole register (first --orgnr, or TARGET_ORGNR) to a .csv or .jsonl file')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Overlap login, scraping, parsing and Webflow sync (asyncio pipeline)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running and re-scrape on an adaptive schedule (stop with SIGTERM/Ctrl-C)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Finish Webflow syncs left incomplete by an earlier run, without scraping')
+    parser.add_argument('--profile', nargs='?', const=Config.PROFILE_PATH, metavar='PATH',
+                        help=f'Run under cProfile and dump the stats (default: {Config.PROFILE_PATH})')
+    return parser.parse_args(argv)
+
+def run_single(force: bool = False, scraper: Optional[ShareholderScraper] = None,
+               transport: Optional[WebflowTransport] = None) -> int:
+    """Scrape the configured company and sync it to the default collection"""
+    # Initialize scraper (a warm one from an earlier invocation keeps its login)
+    scraper = scraper or ShareholderScraper()
+    
+    # Run scraper
+    shareholders_data = scraper.run_scraper()
+    
+    if not shareholders_data:
+        logger.error("No data scraped. Exiting.")
+        return EXIT_FAILURE
+    
+    logger.info(f"Successfully scraped {len(shareholders_data)} shareholders")
+    
+    orgnr = Config.TARGET_ORGNR
+    record_history(orgnr, shareholders_data)
+    
+    # Webflow and any other configured sinks get the table in parallel
+    webflow = WebflowSink(scraper.fingerprints, force=force, transport=transport)
+    sinks = SinkFanOut(build_sinks(webflow=webflow))
+    sinks.submit(Snapshot.of(orgnr, shareholders_data, Config.WEBFLOW_COLLECTION_ID,
+                             scraper.page_validators.get(orgnr)))
+    if not sinks.close():
+        logger.error("Delivering the scraped data failed")
+        return EXIT_FAILURE
+    
+    if webflow.unchanged and not webflow.synced:
+        logger.info("Shareholder register unchanged since last sync - Webflow was not touched")
+        return EXIT_UNCHANGED
+    logger.info("Scraper run completed successfully!")
+    return EXIT_SUCCESS
+
+def run_full_register(args: argparse.Namespace, scraper: Optional[ShareholderScraper] = None) -> int:
+    """Stream every holder of one issuer to a file without holding the register in memory"""
+    orgnr = args.orgnr[0] if args.orgnr else Config.TARGET_ORGNR
+    scraper = scraper or ShareholderScraper()
+    if not scraper.ensure_login():
+        logger.error("Authentication failed")
+        return EXIT_FAILURE
+    
+    count = 0
+    with open(args.full_register, 'w', newline='', encoding='utf-8') as f:
+        if args.full_register.endswith('.jsonl'):
+            for row in scraper.iter_register(orgnr):
+                f.write(json.dumps(row.as_dict(), ensure_ascii=False) + '\n')
+                count += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(ShareholderRecord._fields)
+            for row in scraper.iter_register(orgnr):
+                writer.writerow(row)
+                count += 1
+    
+    logger.info(f"Wrote {count} register rows for {orgnr} to {args.full_register}")
+    return EXIT_SUCCESS if count else EXIT_FAILURE
+
+def run_batch(args: argparse.Namespace, scraper: Optional[ShareholderScraper] = None,
+              transport: Optional[WebflowTransport] = None) -> int:
+    """Scrape several issuers over one login and sync those that map to a collection"""
+    from shareholder_batch import BatchScraper, load_manifest
+    
+    companies = load_manifest(args.manifest) if args.manifest else dict.fromkeys(args.orgnr)
+    batch = BatchScraper(scraper)
+    results = batch.scrape(companies)
+    if not results:
+        return EXIT_FAILURE
+    
+    # The Webflow sink uses one transport for all collections, so they share connections and
+    # the API rate limit, and publishes the site once at the end however many collections changed
+    webflow = WebflowSink(batch.scraper.fingerprints, force=args.force, transport=transport)
+    sinks = SinkFanOut(build_sinks(webflow=webflow))
+    success = all(result.ok for result in results)
+    for result in results:
+        if not result.ok:
+            continue
+        record_history(result.orgnr, result.shareholders)
+        sinks.submit(Snapshot.of(result.orgnr, result.shareholders, result.collection_id,
+                                 batch.scraper.page_validators.get(result.orgnr)))
+    if not sinks.close():
+        success = False
+    
+    if args.output:
+        write_results(args.output, results)
+    
+    if not success:
+        return EXIT_FAILURE
+    return EXIT_UNCHANGED if webflow.unchanged and not webflow.synced else EXIT_SUCCESS
+
+def companies_from_args(args: argparse.Namespace) -> Dict[str, Optional[str]]:
+    """Issuers to scrape mapped to their collection (None = scrape only)"""
+    from shareholder_batch import load_manifest
+    
+    if args.manifest:
+        return load_manifest(args.manifest)
+    if args.orgnr:
+        return dict.fromkeys(args.orgnr)
+    return {Config.TARGET_ORGNR: Config.WEBFLOW_COLLECTION_ID}
+
+def run_pipeline(args: argparse.Namespace, scraper: Optional[ShareholderScraper] = None,
+                 transport: Optional[WebflowTransport] = None) -> int:
+    """Run the single-company or batch job through the overlapping asyncio pipeline"""
+    import asyncio
+    from shareholder_pipeline import Pipeline
+    
+    pipeline = Pipeline(scraper, transport, force=args.force)
+    results = asyncio.run(pipeline.run(companies_from_args(args)))
+    if not results:
+        return EXIT_FAILURE
+    
+    if args.output:
+        write_results(args.output, results)
     
+    if not (all(result.ok for result in results) and pipeline.published and pipeline.delivered):
+        return EXIT_FAILURE
+    return EXIT_UNCHANGED if pipeline.unchanged and not pipeline.synced else EXIT_SUCCESS
+
+def run_resume(transport: Optional[WebflowTransport] = None) -> int:
+    """Finish Webflow syncs that an earlier run left incomplete, from their journals only"""
+    journals = SyncJournal.pending()
+    if not journals:
+        logger.info("No unfinished Webflow syncs to resume")
+        # A publish an earlier run owed still goes out, which counts as touching Webflow
+        publisher = SitePublisher(transport)
+        owed = publisher.pending
+        if not publisher.flush():
+            return EXIT_FAILURE
+        return EXIT_SUCCESS if owed else EXIT_UNCHANGED
+    
+    shared = transport is not None
+    transport = transport or WebflowTransport(Config.WEBFLOW_API_TOKEN)
+    publisher = SitePublisher(transport)
+    fingerprints = FingerprintStore()
+    success = True
+    for journal in journals:
+        if not WebflowAPI(journal.collection_id, transport).resume_sync(journal, publisher):
+            logger.error(f"Sync of {journal.collection_id} is still incomplete; run --resume again")
+            success = False
+        elif journal.orgnr:
+            fingerprints.record_sync(journal.orgnr, journal.records, journal.validators)
+    
+    if not publisher.flush():
+        logger.error("Site publish failed; it will be retried on the next run")
+        success = False
+    if not shared:
+        transport.close()
+    return EXIT_SUCCESS if success else EXIT_FAILURE
+
+def run_daemon(args: argparse.Namespace) -> int:
+    """Scrape and sync repeatedly over one warm session until stopped"""
+    from shareholder_daemon import Daemon
+    
+    Daemon(companies_from_args(args), force=args.force).run()
+    return EXIT_SUCCESS
+
+def write_results(path: str, results: List) -> None:
+    with open(path, 'w') as f:
+        json.dump([result.as_dict() for result in results], f, indent=2, ensure_ascii=False)
+    logger.info(f"Batch results written to {path}")
+
+def run(args: argparse.Namespace, scraper: Optional[ShareholderScraper] = None,
+        transport: Optional[WebflowTransport] = None) -> int:
+    """Validate the configuration and run the selected mode
+
+    ``scraper`` and ``transport`` let a long-lived caller (shareholder_lambda)
+    reuse its registry login and Webflow connections across runs.
+    """
     try:
         # Validate configuration
         Config.validate_config()
         logger.info("Configuration validated successfully")
+        run_budget.reset()
         
-        # Initialize scraper
-        scraper = ShareholderScraper()
-        
-        # Run scraper
-        shareholders_data = scraper.run_scraper()
-        
-        if not shareholders_data:
-            logger.error("No data scraped. Exiting.")
-            return False
-        
-        logger.info(f"Successfully scraped {len(shareholders_data)} shareholders")
-        
-        # Initialize Webflow API
-        webflow_api = WebflowAPI()
-        
-        # Update Webflow with scraped data
-        success = webflow_api.update_shareholders(shareholders_data)
-        
-        if success:
-            logger.info("Webflow update completed successfully")
-            logger.info("Scraper run completed successfully!")
-            return True
-        else:
-            logger.error("Webflow update failed")
-            return False
+        if args.resume:
+            return run_resume(transport)
+        if args.full_register:
+            return run_full_register(args, scraper)
+        if args.daemon:
+            return run_daemon(args)
+        if args.pipeline:
+            return run_pipeline(args, scraper, transport)
+        if args.orgnr or args.manifest:
+            return run_batch(args, scraper, transport)
+        return run_single(args.force, scraper, transport)
             
     except ValueError as e:
         logger.error(f"Configuration error: {str(e)}")
-        return False
+        return EXIT_FAILURE
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        return False
+        return EXIT_FAILURE
+
+def write_metrics(exit_code: int, elapsed: float):
+    """Export the run's metrics next to the log for the workflow to upload"""
+    metrics.set('run_exit_code', exit_code)
+    metrics.set('run_duration_seconds', round(elapsed, 3))
+    metrics.set('run_last_timestamp_seconds', round(time.time()))
+    try:
+        paths = metrics.write()
+        if paths:
+            logger.info(f"Metrics written to {', '.join(paths)}")
+    except Exception as e:
+        logger.warning(f"Could not write metrics: {str(e)}")
+
+def main(argv: Optional[List[str]] = None, scraper: Optional[ShareholderScraper] = None,
+         transport: Optional[WebflowTransport] = None) -> int:
+    """Main execution function; returns the process exit code"""
+    args = parse_args(argv)
+    # Log records are written on a background thread; see shareholder_logging
+    setup_logging()
+    
+    logger.info("=" * 50)
+    logger.info(f"Starting shareholder scraper run at {datetime.now()}")
+    logger.info("=" * 50)
+    
+    started = time.perf_counter()
+    exit_code = EXIT_FAILURE
+    try:
+        if args.profile:
+            exit_code = profile_call(run, args, scraper, transport, path=args.profile)
+        else:
+            exit_code = run(args, scraper, transport)
+        return exit_code
     finally:
+        write_metrics(exit_code, time.perf_counter() - started)
+        logger.info(f"HTTP requests: {tracer.summary_line()}")
+        try:
+            report_path = tracer.write_report()
+            if report_path:
+                logger.info(f"Request trace written to {report_path}")
+        except Exception as e:
+            logger.warning(f"Could not write request trace: {str(e)}")
         logger.info("=" * 50)
         logger.info(f"Shareholder scraper run ended at {datetime.now()}")
         logger.info("=" * 50)
 
 if __name__ == "__main__":
-    success = main()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(main())
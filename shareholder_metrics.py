@@ -0,0 +1,170 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from shareholder_config import Config
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'shareholder_'
+
+HELP = {
+    'phase_seconds': 'Time spent in each scraper and Webflow phase',
+    'http_requests_total': 'HTTP requests by client, phase and status class',
+    'http_response_bytes_total': 'HTTP response bytes by client',
+    'shareholders_parsed_total': 'Shareholder rows parsed from registry pages',
+    'webflow_items_total': 'Webflow collection items by sync outcome',
+    'sink_snapshots_total': 'Snapshots handed to output sinks by sink and outcome',
+    'sink_delivery_seconds': 'Time each output sink took per snapshot',
+    'ownership_top_percent': 'Percent of all shares held by the top N holders in the last scrape',
+    'ownership_hhi': 'Herfindahl-Hirschman index of the last scrape (top-20 tables give a lower bound)',
+    'scheduler_limit': 'Current adaptive concurrency limit per registry host',
+    'scheduler_in_flight': 'Registry requests in flight per host',
+    'scheduler_waiting': 'Registry requests waiting for a slot per host',
+    'scheduler_decreases_total': 'Concurrency limit cuts per host and reason',
+    'daemon_cycles_total': 'Scrape cycles run by the daemon',
+    'twofa_seconds': 'Seconds the last login waited for the 2FA code',
+    'run_duration_seconds': 'Wall-clock duration of the last run',
+    'run_exit_code': 'Exit code of the last run (0 ok, 1 failed, 3 unchanged)',
+    'run_last_timestamp_seconds': 'Unix time the last run finished',
+}
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict) -> MetricKey:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """Process-wide counters, gauges and timers, exported per run
+
+    Timers are summaries (count, sum and max of the observed durations).
+    Counters and timers accumulate for the life of the process, as Prometheus
+    expects, so a daemon's export grows from cycle to cycle; gauges hold the
+    last value set.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters: Dict[MetricKey, float] = {}
+            self.gauges: Dict[MetricKey, float] = {}
+            self.summaries: Dict[MetricKey, Dict[str, float]] = {}
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            summary = self.summaries.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            summary['count'] += 1
+            summary['sum'] += seconds
+            summary['max'] = max(summary['max'], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the block and add it to the ``name`` summary, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def as_dict(self) -> Dict:
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                'timers': [dict(summary, name=name, labels=dict(labels))
+                           for (name, labels), summary in sorted(self.summaries.items())],
+            }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format (for the node_exporter textfile collector)"""
+        lines = []
+        with self.lock:
+            families = [('counter', self.counters), ('gauge', self.gauges), ('summary', self.summaries)]
+            for kind, values in families:
+                for name in sorted({name for name, _ in values}):
+                    full_name = PREFIX + name
+                    if name in HELP:
+                        lines.append(f"# HELP {full_name} {HELP[name]}")
+                    lines.append(f"# TYPE {full_name} {kind}")
+                    for (metric, labels), value in sorted(values.items()):
+                        if metric != name:
+                            continue
+                        if kind == 'summary':
+                            lines.append(f"{full_name}_sum{_labels(labels)} {value['sum']:.6f}")
+                            lines.append(f"{full_name}_count{_labels(labels)} {value['count']}")
+                        else:
+                            lines.append(f"{full_name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, prometheus_path: Optional[str] = None, json_path: Optional[str] = None):
+        """Write the text-file and JSON exports; an empty path skips that format"""
+        prometheus_path = Config.METRICS_PATH if prometheus_path is None else prometheus_path
+        json_path = Config.METRICS_JSON_PATH if json_path is None else json_path
+        exports = []
+        if prometheus_path:
+            exports.append((prometheus_path, self.prometheus()))
+        if json_path:
+            exports.append((json_path, json.dumps(self.as_dict(), indent=2)))
+        for path, content in exports:
+            # Write and rename, so a collector never reads a half-written file
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return [path for path, _ in exports]
+
+
+def profile_call(fn: Callable, *args, path: Optional[str] = None, top: int = 25):
+    """Run ``fn(*args)`` under cProfile, dump the stats to ``path`` and log the top entries
+
+    Only the calling thread is profiled; work on worker threads (Webflow item
+    writes, pipeline stages) shows up as time spent waiting for them.
+    """
+    import cProfile
+    import pstats
+
+    path = path or Config.PROFILE_PATH
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn, *args)
+    finally:
+        try:
+            profiler.dump_stats(path)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+            logger.info(f"Profile written to {path} (view with: python -m pstats {path})\n{stream.getvalue()}")
+        except Exception as e:
+            logger.warning(f"Could not write profile: {str(e)}")
+
+
+# Shared by the scraper, the Webflow client and the entry points
+metrics = Metrics()
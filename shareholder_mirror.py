@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from shareholder_config import Config
+from shareholder_sync import MANAGED_FIELDS, existing_identities, fields_hash
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionMirror:
+    """Local copy of a Webflow collection's scraper-managed fields, kept between runs
+
+    Items are stored by ID with their managed fields and a hash of them, and
+    indexed by slug and by shareholder identity for O(1) lookups. The copy
+    remembers the collection's ``lastUpdated`` and ETag: a refresh first asks
+    Webflow for the collection metadata and only lists the items again when
+    it changed, or when the copy is older than WEBFLOW_MIRROR_MAX_AGE. The sync
+    applies its own writes to the mirror, so the next run can start from it.
+    """
+
+    def __init__(self, collection_id: str, path: Optional[str] = None):
+        self.collection_id = collection_id
+        self.path = path or os.path.join(Config.WEBFLOW_MIRROR_DIR, f"{collection_id}.json")
+        self.lock = threading.RLock()
+        self.items: Dict[str, Dict] = {}
+        self.hashes: Dict[str, str] = {}
+        self.by_slug: Dict[str, str] = {}
+        self.by_identity: Dict[str, str] = {}
+        self.etag: Optional[str] = None
+        self.last_updated: Optional[str] = None
+        self.listed_at = 0.0
+        self.checked_at: Optional[float] = None  # monotonic; not kept between runs
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Webflow mirror {self.path}: {str(e)}")
+            return
+        self.etag = state.get('etag')
+        self.last_updated = state.get('last_updated')
+        self.listed_at = state.get('listed_at', 0.0)
+        self.items = {item_id: entry['fields'] for item_id, entry in state.get('items', {}).items()}
+        self.hashes = {item_id: entry['hash'] for item_id, entry in state.get('items', {}).items()}
+        self._reindex()
+
+    def save(self):
+        state = {
+            'etag': self.etag,
+            'last_updated': self.last_updated,
+            'listed_at': self.listed_at,
+            'items': {item_id: {'slug': fields.get('slug'), 'hash': self.hashes[item_id], 'fields': fields}
+                      for item_id, fields in self.items.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save Webflow mirror {self.path}: {str(e)}")
+
+    def _reindex(self):
+        self.by_slug = {fields.get('slug'): item_id for item_id, fields in self.items.items() if fields.get('slug')}
+        identities = existing_identities(self.snapshot())
+        self.by_identity = {identity: item['_id'] for identity, item in identities.items()}
+
+    def _put(self, item_id: str, fields: Dict):
+        self.items[item_id] = {key: fields.get(key) for key in MANAGED_FIELDS}
+        self.hashes[item_id] = fields_hash(fields)
+
+    def get(self, item_id: str) -> Optional[Dict]:
+        fields = self.items.get(item_id)
+        return dict(fields, _id=item_id) if fields is not None else None
+
+    def find_slug(self, slug: str) -> Optional[Dict]:
+        return self.get(self.by_slug.get(slug))
+
+    def find_identity(self, identity: str) -> Optional[Dict]:
+        return self.get(self.by_identity.get(identity))
+
+    def snapshot(self) -> List[Dict]:
+        """Mirrored items in the shape the Webflow listing returns"""
+        with self.lock:
+            return [dict(fields, _id=item_id) for item_id, fields in self.items.items()]
+
+    def identity_index(self) -> Dict[str, Dict]:
+        """Items by shareholder identity, as ``plan_sync`` consumes them"""
+        with self.lock:
+            return {identity: self.get(item_id) for identity, item_id in self.by_identity.items()}
+
+    def refresh(self, api, force: bool = False):
+        """Bring the mirror up to date, listing the collection only if it changed since the last look"""
+        with self.lock:
+            if (not force and self.checked_at is not None
+                    and time.monotonic() - self.checked_at < Config.WEBFLOW_MIRROR_TTL):
+                return
+            expired = not self.listed_at or time.time() - self.listed_at > Config.WEBFLOW_MIRROR_MAX_AGE
+            try:
+                # Validators are read before listing, so a change that lands during the listing shows up next time
+                info = api.collection_info(None if force or expired else self.etag)
+            except Exception as e:
+                logger.warning(f"Could not check Webflow collection {self.collection_id} for changes: {str(e)}")
+                info = {}
+            if info is None or (not force and not expired and self.last_updated
+                                and info.get('lastUpdated') == self.last_updated):
+                self.etag = (info or {}).get('etag') or self.etag
+                logger.info(f"Webflow mirror of {self.collection_id} is current ({len(self.items)} items)")
+            else:
+                self.replace(api.list_items(), info.get('etag'), info.get('lastUpdated'))
+            self.checked_at = time.monotonic()
+
+    def _validators(self, api) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            info = api.collection_info()
+        except Exception as e:
+            logger.warning(f"Could not read Webflow collection {self.collection_id} metadata: {str(e)}")
+            return None, None
+        return info.get('etag'), info.get('lastUpdated')
+
+    def replace(self, items: List[Dict], etag: Optional[str] = None, last_updated: Optional[str] = None):
+        """Take a full listing as the new mirror"""
+        with self.lock:
+            previous = self.hashes
+            self.items, self.hashes = {}, {}
+            for item in items:
+                self._put(item['_id'], item)
+            changed = sum(1 for item_id, digest in self.hashes.items() if previous.get(item_id) != digest)
+            removed = len(previous.keys() - self.hashes.keys())
+            logger.info(f"Listed Webflow collection {self.collection_id}: {len(self.items)} items "
+                        f"({changed} new or changed, {removed} removed since the last listing)")
+            self.etag, self.last_updated = etag, last_updated
+            self.listed_at = time.time()
+            self._reindex()
+            self.save()
+
+    def record_writes(self, api, updates: List[Tuple[str, Dict]], creates: List[Tuple[str, Dict]],
+                      deletes: List[str]):
+        """Apply the sync's own successful writes, then take the collection's new validators"""
+        with self.lock:
+            for item_id, fields in updates + creates:
+                self._put(item_id, fields)
+            for item_id in deletes:
+                self.items.pop(item_id, None)
+                self.hashes.pop(item_id, None)
+            # Our writes moved lastUpdated; without the new value the next run would re-list for nothing
+            self.etag, self.last_updated = self._validators(api)
+            self._reindex()
+            self.save()
+
+    def invalidate(self):
+        """Forget the validators so the next refresh lists the collection again"""
+        with self.lock:
+            self.etag = self.last_updated = None
+            self.listed_at = 0.0
+            self.checked_at = None
+            self.save()
+
+
+_mirrors: Dict[str, CollectionMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def collection_mirror(collection_id: str) -> CollectionMirror:
+    """The process-wide mirror of a collection, shared by every WebflowAPI for it"""
+    with _mirrors_lock:
+        if collection_id not in _mirrors:
+            _mirrors[collection_id] = CollectionMirror(collection_id)
+        return _mirrors[collection_id]
@@ -0,0 +1,94 @@
+import logging
+from typing import List, Optional, Tuple
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord, parse_holdings, parse_percent
+
+logger = logging.getLogger(__name__)
+
+# (surname_company, first_name, holdings, percent) as they appear in the table, or None for short rows
+RawRow = Optional[Tuple[str, str, str, str]]
+
+INVESTOR_ROWS_XPATH = "//tr[starts-with(@id, 'investor-')]"
+NEXT_PAGE_XPATH = "//a[contains(concat(' ', normalize-space(@rel), ' '), ' next ')]/@href"
+
+
+def _lxml_page(content: bytes, limit: Optional[int]) -> Tuple[List[RawRow], Optional[str]]:
+    from lxml import etree
+
+    root = etree.fromstring(content, etree.HTMLParser())
+    if root is None:
+        return [], None
+
+    rows = []
+    for row in root.xpath(INVESTOR_ROWS_XPATH)[:limit]:
+        cells = row.findall('td')
+        if len(cells) < 4:
+            rows.append(None)
+            continue
+        # Same normalization as BeautifulSoup's get_text(strip=True)
+        rows.append(tuple(''.join(text.strip() for text in cell.itertext()) for cell in cells[:4]))
+
+    next_links = root.xpath(NEXT_PAGE_XPATH)
+    return rows, (next_links[0] if next_links else None)
+
+
+def _soup_page(content: bytes, limit: Optional[int]) -> Tuple[List[RawRow], Optional[str]]:
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # One pass that only builds table rows and links (for the next-page link), not the whole page
+    soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer(['tr', 'a']))
+
+    rows = []
+    for row in soup.find_all('tr', id=lambda x: x and x.startswith('investor-'))[:limit]:
+        cells = row.find_all('td')
+        if len(cells) < 4:
+            rows.append(None)
+            continue
+        rows.append(tuple(cell.get_text(strip=True) for cell in cells[:4]))
+
+    next_link = soup.find('a', rel='next')
+    return rows, (next_link.get('href') if next_link else None)
+
+
+BACKENDS = {
+    'lxml': _lxml_page,
+    'soup': _soup_page,
+}
+
+
+def parse_page(content: bytes, backend: Optional[str] = None,
+               limit: Optional[int] = None) -> Tuple[List[RawRow], Optional[str]]:
+    """Pull the raw cell text of the investor rows, and the next-page link, out of a security page
+
+    ``lxml`` is the default; ``soup`` (BeautifulSoup with the stdlib parser) is
+    used when lxml is unavailable or requested via ``PARSER_BACKEND``.
+    """
+    backend = backend or Config.PARSER_BACKEND
+    if backend == 'lxml':
+        try:
+            return _lxml_page(content, limit)
+        except ImportError:
+            logger.warning("lxml is not installed, falling back to BeautifulSoup parser")
+            backend = 'soup'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend: {backend}")
+    return BACKENDS[backend](content, limit)
+
+
+def extract_rows(content: bytes, backend: Optional[str] = None, limit: Optional[int] = None) -> List[RawRow]:
+    """Raw investor rows of a security page, ignoring pagination"""
+    return parse_page(content, backend, limit)[0]
+
+
+def build_shareholders(rows: List[RawRow], start_rank: int = 1) -> List[ShareholderRecord]:
+    """Parse raw rows into records; rank follows the row's position in the register"""
+    return [
+        ShareholderRecord(start_rank + i, row[0], row[1], parse_holdings(row[2]), parse_percent(row[3]))
+        for i, row in enumerate(rows) if row is not None
+    ]
+
+
+def parse_shareholders(content: bytes, backend: Optional[str] = None,
+                       limit: Optional[int] = None) -> List[ShareholderRecord]:
+    """Parse the investor rows of a single security page"""
+    return build_shareholders(extract_rows(content, backend, limit))
@@ -0,0 +1,208 @@
+"""
+Overlapping scrape -> parse -> sync run for one or many issuers
+The registry and Webflow clients stay synchronous; each stage runs their calls
+in worker threads with asyncio.to_thread and hands results on over bounded queues.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from shareholder_analytics import sync_basis
+from shareholder_batch import CompanyResult
+from shareholder_config import Config
+from shareholder_history import record_history
+from shareholder_http import WebflowTransport
+from shareholder_mirror import collection_mirror
+from shareholder_scraper import ShareholderScraper
+from shareholder_sinks import SinkFanOut, Snapshot, build_sinks
+from shareholder_webflow_api import SitePublisher, WebflowAPI
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed down the queues, one per downstream worker
+_DONE = object()
+
+
+class Pipeline:
+    """Scrape, parse and sync issuers as concurrent stages
+
+    Webflow collections are listed while the registry login runs, and once
+    logged in issuer N+1 is scraped while issuer N is parsed or uploaded. Each
+    stage has its own number of workers, which is its concurrency limit, and
+    the queues between stages hold at most ``queue_size`` items, so a fast
+    stage waits for a slow one instead of piling up pages in memory. All
+    collections changed in a run are published with one site publish at the end.
+    Every parsed table is also handed to the other OUTPUT_SINKS (files,
+    webhooks), which deliver on their own threads alongside the sync stage.
+    """
+
+    def __init__(self, scraper: Optional[ShareholderScraper] = None, transport: Optional[WebflowTransport] = None,
+                 scrape_workers: Optional[int] = None, parse_workers: Optional[int] = None,
+                 sync_workers: Optional[int] = None, queue_size: Optional[int] = None, force: bool = False,
+                 prefetch_listings: bool = True):
+        self.scraper = scraper or ShareholderScraper()
+        self.transport = transport
+        self.scrape_workers = scrape_workers or Config.PIPELINE_SCRAPE_WORKERS
+        self.parse_workers = parse_workers or Config.PIPELINE_PARSE_WORKERS
+        self.sync_workers = sync_workers or Config.PIPELINE_SYNC_WORKERS
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+        self.force = force
+        self.prefetch_listings = prefetch_listings
+        self.synced = 0
+        self.unchanged = 0
+        self.publisher: Optional[SitePublisher] = None
+        self.published = True
+        self.sinks: Optional[SinkFanOut] = None
+        self.delivered = True
+        self.listings: Dict[str, asyncio.Task] = {}
+        self.collection_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _list_collection(self, collection_id: str) -> Optional[List[Dict]]:
+        """Listing for the first sync into a collection; None when the collection mirror is used instead"""
+        api = WebflowAPI(collection_id, self.transport)
+        try:
+            if Config.WEBFLOW_MIRROR:
+                await asyncio.to_thread(collection_mirror(collection_id).refresh, api)
+                return None
+            return await asyncio.to_thread(api.list_items)
+        except Exception as e:
+            logger.warning(f"Could not prefetch Webflow collection {collection_id}: {str(e)}")
+            return None
+
+    async def _scrape(self, pending: asyncio.Queue, pages: asyncio.Queue):
+        """Fetch security pages; unchanged pages come back as the last synced rows"""
+        while True:
+            try:
+                result = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                content, cached = await asyncio.to_thread(self.scraper.fetch_page, result.orgnr)
+            except Exception as e:
+                result.elapsed = time.perf_counter() - started
+                result.error = str(e)
+                logger.error(f"[{result.orgnr}] scrape failed after {result.elapsed:.2f}s: {result.error}")
+                continue
+            result.elapsed = time.perf_counter() - started
+            await pages.put((result, content, cached))
+
+    async def _parse(self, pages: asyncio.Queue, tables: asyncio.Queue):
+        """Turn pages into records, store the history snapshot and pass syncable tables on"""
+        while True:
+            item = await pages.get()
+            if item is _DONE:
+                return
+            result, content, cached = item
+            started = time.perf_counter()
+            try:
+                if cached is not None:
+                    result.shareholders = cached
+                else:
+                    result.shareholders = await asyncio.to_thread(self.scraper.parse_shareholders, content)
+                if not result.shareholders:
+                    result.error = "no shareholder rows found"
+            except Exception as e:
+                result.error = str(e)
+            result.elapsed += time.perf_counter() - started
+
+            if result.error:
+                logger.error(f"[{result.orgnr}] scrape failed after {result.elapsed:.2f}s: {result.error}")
+                continue
+            logger.info(f"[{result.orgnr}] scraped {len(result.shareholders)} shareholders in {result.elapsed:.2f}s")
+            await asyncio.to_thread(record_history, result.orgnr, result.shareholders)
+            if self.sinks:
+                # Blocks while a sink's queue is full, which holds this stage back to the sinks' pace
+                await asyncio.to_thread(self.sinks.submit, Snapshot.of(
+                    result.orgnr, result.shareholders, result.collection_id,
+                    self.scraper.page_validators.get(result.orgnr)))
+            if result.collection_id:
+                await tables.put(result)
+
+    async def _sync(self, tables: asyncio.Queue):
+        """Sync changed tables to their collections, one sync per collection at a time"""
+        fingerprints = self.scraper.fingerprints
+        while True:
+            result = await tables.get()
+            if result is _DONE:
+                return
+            basis = await asyncio.to_thread(sync_basis, result.orgnr)
+            if not self.force and fingerprints.is_unchanged(result.orgnr, result.shareholders, basis):
+                logger.info(f"[{result.orgnr}] Unchanged since last sync - skipping Webflow")
+                self.unchanged += 1
+                continue
+
+            lock = self.collection_locks.setdefault(result.collection_id, asyncio.Lock())
+            async with lock:
+                # The prefetched listing is only current for the first sync into a collection
+                listing = self.listings.pop(result.collection_id, None)
+                existing_items = await listing if listing else None
+                api = WebflowAPI(result.collection_id, self.transport)
+                ok = await asyncio.to_thread(api.update_shareholders, result.shareholders, existing_items,
+                                             self.publisher, result.orgnr,
+                                             self.scraper.page_validators.get(result.orgnr))
+
+            if not ok:
+                result.error = "Webflow update failed"
+                logger.error(f"[{result.orgnr}] Webflow update failed")
+                continue
+            try:
+                await asyncio.to_thread(fingerprints.record_sync, result.orgnr, result.shareholders,
+                                        self.scraper.page_validators.get(result.orgnr), basis)
+            except Exception as e:
+                logger.warning(f"[{result.orgnr}] Could not record sync fingerprint: {str(e)}")
+            self.synced += 1
+
+    async def run(self, companies: Dict[str, Optional[str]]) -> List[CompanyResult]:
+        """Scrape every org number and sync those mapped to a collection; results keep the input order"""
+        started = time.perf_counter()
+        results = [CompanyResult(orgnr, collection_id) for orgnr, collection_id in companies.items()]
+        if self.transport is None and any(companies.values()):
+            # One transport for all collections so they share connections and the API rate limit
+            self.transport = WebflowTransport(Config.WEBFLOW_API_TOKEN)
+        # Changed collections are published together once the sync stage is done
+        self.publisher = SitePublisher(self.transport)
+        # Webflow is the sync stage's job; this fans out to the other sinks only
+        self.sinks = SinkFanOut(build_sinks())
+
+        # Refreshing the collection mirrors warms the Webflow connections while the login runs
+        if self.prefetch_listings:
+            self.listings = {collection_id: asyncio.create_task(self._list_collection(collection_id))
+                             for collection_id in set(companies.values()) if collection_id}
+        if not await asyncio.to_thread(self.scraper.ensure_login):
+            logger.error("Authentication failed")
+            for listing in self.listings.values():
+                listing.cancel()
+            await asyncio.to_thread(self.sinks.close)
+            return []
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for result in results:
+            pending.put_nowait(result)
+        pages: asyncio.Queue = asyncio.Queue(self.queue_size)
+        tables: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        sync_tasks = [asyncio.create_task(self._sync(tables)) for _ in range(self.sync_workers)]
+        parse_tasks = [asyncio.create_task(self._parse(pages, tables)) for _ in range(self.parse_workers)]
+        scrape_workers = max(1, min(self.scrape_workers, len(results)))
+        await asyncio.gather(*(self._scrape(pending, pages) for _ in range(scrape_workers)))
+        for _ in parse_tasks:
+            await pages.put(_DONE)
+        await asyncio.gather(*parse_tasks)
+        for _ in sync_tasks:
+            await tables.put(_DONE)
+        await asyncio.gather(*sync_tasks)
+
+        for listing in self.listings.values():
+            listing.cancel()
+        if any(companies.values()):
+            self.published = await asyncio.to_thread(self.publisher.flush)
+            if not self.published:
+                logger.error("Site publish failed; it will be retried on the next run")
+        if self.sinks:
+            self.delivered = await asyncio.to_thread(self.sinks.close)
+        succeeded = sum(1 for result in results if result.ok)
+        logger.info(f"Pipeline finished {succeeded}/{len(results)} companies in {time.perf_counter() - started:.2f}s "
+                    f"(synced={self.synced}, unchanged={self.unchanged})")
+        return results
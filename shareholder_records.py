@@ -0,0 +1,156 @@
+import heapq
+from array import array
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Percentages are stored as integers in the columnar table, scaled to this many decimals
+PERCENT_DECIMALS = 4
+
+
+def parse_holdings(value: str) -> int:
+    """Registry share counts ("6 583 612", "6,583,612") as an integer"""
+    digits = ''.join(ch for ch in value if ch.isdigit())
+    return int(digits) if digits else 0
+
+
+def parse_percent(value: str) -> Decimal:
+    """Registry percentages ("7,66 %") as a Decimal"""
+    cleaned = value.replace('%', '').replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        return Decimal(cleaned) if cleaned else Decimal(0)
+    except InvalidOperation:
+        return Decimal(0)
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """The numpy module, or None when it is not installed; imported on first use to keep startup light"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _column_sum(column: array) -> int:
+    """Sum of an ``array('q')`` column, in NumPy over the array's buffer when it is installed"""
+    np = _numpy()
+    if np is None:
+        return sum(column)
+    return int(np.frombuffer(column, dtype=np.int64).sum())
+
+
+def format_holdings(holdings: int) -> str:
+    """Space-grouped share count, as shown on the registry and in Webflow"""
+    return f"{holdings:,}".replace(',', ' ')
+
+
+class ShareholderRecord(NamedTuple):
+    """One row of the shareholder register, parsed once at scrape time"""
+    rank: int
+    surname_company: str
+    first_name: str
+    holdings: int
+    percent: Decimal
+
+    @property
+    def name(self) -> str:
+        return f"{self.surname_company} {self.first_name}".strip()
+
+    def as_dict(self) -> Dict:
+        """JSON-friendly form; the percentage stays a string to keep its precision"""
+        return {
+            'rank': self.rank,
+            'surname_company': self.surname_company,
+            'first_name': self.first_name,
+            'holdings': self.holdings,
+            'percent': str(self.percent),
+        }
+
+    @classmethod
+    def from_dict(cls, row: Dict) -> 'ShareholderRecord':
+        """Inverse of ``as_dict``"""
+        return cls(row['rank'], row['surname_company'], row['first_name'], row['holdings'], Decimal(row['percent']))
+
+
+class ShareholderTable:
+    """Columnar container for full-register runs
+
+    Rank, holdings and percent live in parallel ``array('q')`` columns and
+    names are interned in a shared table, so 100k holders cost a few MB
+    instead of 100k Python dicts. Rows come back as ``ShareholderRecord`` on
+    access.
+    """
+
+    __slots__ = ('ranks', 'holdings', 'percents', 'name_ids', 'names', '_name_lookup')
+
+    def __init__(self):
+        self.ranks = array('q')
+        self.holdings = array('q')
+        self.percents = array('q')  # percent * 10 ** PERCENT_DECIMALS
+        self.name_ids = array('l')
+        self.names: List[Tuple[str, str]] = []
+        self._name_lookup: Dict[Tuple[str, str], int] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[ShareholderRecord]) -> 'ShareholderTable':
+        table = cls()
+        table.extend(records)
+        return table
+
+    def _intern(self, surname_company: str, first_name: str) -> int:
+        key = (surname_company, first_name)
+        name_id = self._name_lookup.get(key)
+        if name_id is None:
+            name_id = self._name_lookup[key] = len(self.names)
+            self.names.append(key)
+        return name_id
+
+    def append(self, record: ShareholderRecord):
+        self.ranks.append(record.rank)
+        self.holdings.append(record.holdings)
+        self.percents.append(int(record.percent.scaleb(PERCENT_DECIMALS)))
+        self.name_ids.append(self._intern(record.surname_company, record.first_name))
+
+    def extend(self, records: Iterable[ShareholderRecord]):
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    def __getitem__(self, index: int) -> ShareholderRecord:
+        surname_company, first_name = self.names[self.name_ids[index]]
+        return ShareholderRecord(self.ranks[index], surname_company, first_name, self.holdings[index],
+                                 Decimal(self.percents[index]).scaleb(-PERCENT_DECIMALS))
+
+    def __iter__(self) -> Iterator[ShareholderRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def total_holdings(self) -> int:
+        return _column_sum(self.holdings)
+
+    def total_percent(self) -> Decimal:
+        return Decimal(_column_sum(self.percents)).scaleb(-PERCENT_DECIMALS)
+
+    def _take(self, order: List[int]) -> 'ShareholderTable':
+        """New table of the rows at ``order``, with its own name table holding only their names"""
+        table = ShareholderTable()
+        for column in ('ranks', 'holdings', 'percents'):
+            source = getattr(self, column)
+            getattr(table, column).extend(source[i] for i in order)
+        table.name_ids.extend(table._intern(*self.names[self.name_ids[i]]) for i in order)
+        return table
+
+    def sorted(self, by: str = 'holdings', reverse: Optional[bool] = None) -> 'ShareholderTable':
+        """New table ordered by a column; holdings and percent sort largest first by default"""
+        column = {'holdings': self.holdings, 'percent': self.percents, 'rank': self.ranks}[by]
+        if reverse is None:
+            reverse = by != 'rank'
+        return self._take(sorted(range(len(self)), key=column.__getitem__, reverse=reverse))
+
+    def top(self, n: int) -> List[ShareholderRecord]:
+        """The ``n`` largest holders without sorting the whole table"""
+        return [self[i] for i in heapq.nlargest(n, range(len(self)), key=self.holdings.__getitem__)]
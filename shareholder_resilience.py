@@ -0,0 +1,216 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+import requests
+from requests.adapters import HTTPAdapter
+from shareholder_config import Config
+from shareholder_tracing import current_phase
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# Trace phases grouped into the budget phases; webflow.* phases count as sync
+BUDGET_PHASES = {
+    'session-restore': 'login',
+    'login': 'login',
+    'login.2fa': 'login',
+    'navigation': 'scrape',
+    'fetch': 'scrape',
+    'register': 'scrape',
+}
+
+
+def budget_phase(trace_phase: str) -> str:
+    if trace_phase.startswith('webflow.'):
+        return 'sync'
+    return BUDGET_PHASES.get(trace_phase, trace_phase)
+
+
+def parse_shares(spec: str) -> Dict[str, float]:
+    """``"login=0.25,scrape=0.25,sync=0.5"`` as a dict of fractions"""
+    shares = {}
+    for part in filter(None, (chunk.strip() for chunk in spec.split(','))):
+        name, share = part.split('=')
+        shares[name.strip()] = float(share)
+    return shares
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The run (or one of its phases) is out of time; no further requests are sent"""
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while the circuit breaker is open"""
+
+
+class RunBudget:
+    """Wall-clock budget for one run, split across the login, scrape and sync phases
+
+    A phase's clock starts with its first request and it may use its share of
+    the total, but never more than what is left of the whole run. Requests
+    outside those phases are only bound by the overall deadline.
+    """
+
+    def __init__(self, total: Optional[float] = None, shares: Optional[Dict[str, float]] = None):
+        self.total = total or Config.RUN_DEADLINE
+        self.shares = shares or parse_shares(Config.PHASE_BUDGETS)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new run, e.g. for each daemon cycle"""
+        with self.lock:
+            self.started = time.monotonic()
+            self.phase_started: Dict[str, float] = {}
+
+    def deadline(self, phase: Optional[str] = None) -> float:
+        overall = self.started + self.total
+        if phase not in self.shares:
+            return overall
+        with self.lock:
+            started = self.phase_started.setdefault(phase, time.monotonic())
+        return min(overall, started + self.shares[phase] * self.total)
+
+    def remaining(self, phase: Optional[str] = None) -> float:
+        return self.deadline(phase) - time.monotonic()
+
+    def timeout(self, phase: str, timeout: Union[float, Tuple[float, float]]) -> Tuple[float, float]:
+        """(connect, read) timeout clipped to the time the phase has left; raises when none is left"""
+        remaining = self.remaining(phase)
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{phase} phase ran out of time")
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return min(connect, remaining), min(read, remaining)
+
+    def sleep(self, phase: str, seconds: float):
+        """Sleep before a retry, unless that would run past the deadline"""
+        if seconds >= self.remaining(phase):
+            raise DeadlineExceeded(f"{phase} phase has no time left for another retry")
+        time.sleep(seconds)
+
+
+class CircuitBreaker:
+    """Fails requests fast after ``threshold`` consecutive errors
+
+    Once open, requests raise CircuitOpenError without touching the network
+    for ``reset_after`` seconds. After that one trial request is let through;
+    success closes the breaker and another failure opens it again.
+    """
+
+    def __init__(self, name: str, threshold: Optional[int] = None, reset_after: Optional[float] = None):
+        self.name = name
+        self.threshold = threshold or Config.BREAKER_THRESHOLD
+        self.reset_after = reset_after or Config.BREAKER_RESET
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_after:
+                raise CircuitOpenError(f"{self.name} circuit open after {self.failures} consecutive errors")
+            # Half-open: let this request through as a trial; the clock restarts if it fails
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                logger.error(f"{self.name} circuit opened after {self.failures} consecutive errors")
+                self.opened_at = time.monotonic()
+
+
+class ResilientAdapter(HTTPAdapter):
+    """HTTPAdapter with timeouts, deadline budget, retries and an optional circuit breaker
+
+    Every request gets (connect, read) timeouts clipped to its phase's budget.
+    Idempotent requests are retried on connection errors, timeouts and
+    ``retry_statuses`` with full-jitter exponential backoff, as long as the
+    phase has time left. With a ``scheduler`` (shareholder_scheduler), each
+    attempt first waits for a slot under the host's adaptive concurrency limit
+    and holds it until the body is read (for ``stream=True`` requests, only
+    until the headers arrive).
+    """
+
+    def __init__(self, timeout: Tuple[float, float], retries: Optional[int] = None, retry_statuses=(),
+                 breaker: Optional[CircuitBreaker] = None, budget: Optional[RunBudget] = None,
+                 scheduler=None, **kwargs):
+        super().__init__(**kwargs)
+        self.default_timeout = timeout
+        self.retries = Config.HTTP_RETRIES if retries is None else retries
+        self.retry_statuses = frozenset(retry_statuses)
+        self.breaker = breaker
+        self.budget = budget
+        self.scheduler = scheduler
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(Config.RETRY_BACKOFF_MAX, Config.RETRY_BACKOFF * 2 ** attempt))
+
+    def send(self, request, **kwargs):
+        budget = self.budget or run_budget
+        phase = budget_phase(current_phase())
+        attempts = self.retries + 1 if request.method in IDEMPOTENT_METHODS else 1
+        timeout = kwargs.get('timeout') or self.default_timeout
+
+        for attempt in range(attempts):
+            # Out of time: fail before the breaker, the scheduler or the network sees the request
+            budget.timeout(phase, timeout)
+            if self.breaker:
+                self.breaker.before_request()
+            slot = self.scheduler.acquire(request.url, budget) if self.scheduler else None
+            response = None
+            try:
+                # Clipped again, since waiting for the slot used some of the budget
+                kwargs['timeout'] = budget.timeout(phase, timeout)
+                response = super().send(request, **kwargs)
+                if not kwargs.get('stream'):
+                    # Download the body inside the slot, so the limit and its latency samples cover it
+                    response.content
+            except DeadlineExceeded:
+                # Never sent, so not a failure of the host; it is also a Timeout, so it must not reach the retry below
+                if slot:
+                    slot.cancel()
+                raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                response = None  # the slot sees a failed request
+                if self.breaker:
+                    self.breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+                problem = type(e).__name__
+            else:
+                if self.breaker:
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                if response.status_code not in self.retry_statuses or attempt == attempts - 1:
+                    return response
+                problem = f"HTTP {response.status_code}"
+                response.close()
+            finally:
+                if slot:
+                    slot.release(response)
+
+            delay = self._backoff(attempt)
+            logger.warning(f"{request.method} {request.url} failed ({problem}), "
+                           f"retrying in {delay:.1f}s ({attempt + 1}/{attempts - 1})")
+            budget.sleep(phase, delay)
+
+
+# Shared by the scraper and the Webflow client for the whole run
+run_budget = RunBudget()
+registry_breaker = CircuitBreaker('registry')
@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import requests
+from shareholder_config import Config
+from shareholder_metrics import metrics
+from shareholder_resilience import DeadlineExceeded, RunBudget, budget_phase, run_budget
+from shareholder_tracing import current_phase
+
+logger = logging.getLogger(__name__)
+
+# Lower goes first: getting (and staying) logged in and reaching the company page
+# before bulk downloads; register pages are the bulk
+PRIORITIES = {
+    'session-restore': 0,
+    'login': 0,
+    'login.2fa': 0,
+    'navigation': 0,
+    'fetch': 1,
+    'register': 2,
+}
+DEFAULT_PRIORITY = 1
+
+# Statuses that mean "slow down", as opposed to a failed request
+OVERLOAD_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class HostLimiter:
+    """Adaptive concurrency limit for one host (additive increase, multiplicative decrease)
+
+    The limit grows by about one slot per ``limit`` healthy responses that
+    came back while the limit was in use, up to ``maximum``. A 429 or 5xx
+    response, a connection error, or a latency above ``latency_tolerance``
+    times the healthy baseline multiplies it by ``decrease``. Small login
+    pages and large register pages take very different times, so there is a
+    baseline per kind of request (its trace phase), and a latency under
+    ``latency_floor`` never counts. Cuts are at least ``decrease_interval``
+    (or the baseline, if longer) apart, so one burst of bad responses
+    counts once. A 429 with Retry-After also holds all new requests until
+    then. Waiting requests are admitted by priority, then in arrival order,
+    and request starts are kept ``min_interval`` seconds apart.
+    """
+
+    def __init__(self, host: str, initial: Optional[float] = None, minimum: Optional[float] = None,
+                 maximum: Optional[float] = None, decrease: Optional[float] = None,
+                 latency_tolerance: Optional[float] = None, min_interval: Optional[float] = None,
+                 latency_floor: Optional[float] = None, decrease_interval: Optional[float] = None):
+        self.host = host
+        self.minimum = minimum or Config.REGISTRY_CONCURRENCY_MIN
+        self.maximum = maximum or Config.BATCH_MAX_PER_HOST
+        self.limit = min(self.maximum, max(self.minimum, initial or Config.REGISTRY_CONCURRENCY_START))
+        self.decrease = decrease or Config.REGISTRY_CONCURRENCY_DECREASE
+        self.latency_tolerance = latency_tolerance or Config.REGISTRY_LATENCY_TOLERANCE
+        self.min_interval = Config.REGISTRY_MIN_INTERVAL if min_interval is None else min_interval
+        self.latency_floor = Config.REGISTRY_LATENCY_FLOOR if latency_floor is None else latency_floor
+        self.decrease_interval = (Config.REGISTRY_DECREASE_INTERVAL if decrease_interval is None
+                                  else decrease_interval)
+        self.in_flight = 0
+        self.baselines: Dict[str, float] = {}  # EWMA of healthy response latency, per kind of request
+        self.last_decrease = 0.0
+        self.last_start = 0.0
+        self.paused_until = 0.0
+        self.waiting: List = []  # heap of (priority, arrival) tickets
+        self.arrivals = itertools.count()
+        self.condition = threading.Condition()
+
+    def _export(self):
+        metrics.set('scheduler_limit', round(self.limit, 2), host=self.host)
+        metrics.set('scheduler_in_flight', self.in_flight, host=self.host)
+        metrics.set('scheduler_waiting', len(self.waiting), host=self.host)
+
+    def _admissible_at(self, ticket) -> Optional[float]:
+        """Earliest start time for the ticket, or None while it waits for a slot or its turn"""
+        if self.waiting[0] != ticket or self.in_flight >= int(self.limit):
+            return None
+        return max(self.paused_until, self.last_start + self.min_interval)
+
+    def acquire(self, priority: int, deadline: float) -> float:
+        """Wait for a slot; returns the start time. Raises DeadlineExceeded if none frees up in time"""
+        with self.condition:
+            ticket = (priority, next(self.arrivals))
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    start_at = self._admissible_at(ticket)
+                    if start_at is not None and start_at <= now:
+                        break
+                    if now >= deadline:
+                        raise DeadlineExceeded(f"no {self.host} request slot before the deadline "
+                                               f"({self.in_flight} in flight, limit {int(self.limit)})")
+                    self.condition.wait((deadline if start_at is None else min(deadline, start_at)) - now)
+                heapq.heappop(self.waiting)
+                self.in_flight += 1
+                self.last_start = now
+                self._export()
+                return now
+            except BaseException:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                raise
+            finally:
+                # The next ticket in line may be admissible now
+                self.condition.notify_all()
+
+    def _cut(self, reason: str, kind: str):
+        now = time.monotonic()
+        if self.limit <= self.minimum:
+            return  # nothing left to cut
+        if now - self.last_decrease < max(self.decrease_interval, self.baselines.get(kind, 0.0)):
+            return
+        previous = self.limit
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self.last_decrease = now
+        metrics.count('scheduler_decreases_total', host=self.host, reason=reason)
+        logger.warning(f"{self.host}: {reason}, concurrency limit {previous:.1f} -> {self.limit:.1f}")
+
+    def release(self, started: float, response: Optional[requests.Response] = None, kind: str = ''):
+        """Account for a finished request; ``response`` is None when it failed without one"""
+        latency = time.monotonic() - started
+        with self.condition:
+            baseline = self.baselines.get(kind)
+            busy = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            status = response.status_code if response is not None else None
+            if response is None:
+                self._cut("connection error", kind)
+            elif status in OVERLOAD_STATUSES:
+                if status == 429:
+                    pause = response.headers.get('Retry-After', '')
+                    if pause.isdigit():
+                        self.paused_until = max(self.paused_until, time.monotonic() + int(pause))
+                self._cut(f"HTTP {status}", kind)
+            elif (baseline is not None and latency > self.latency_floor
+                  and latency > baseline * self.latency_tolerance):
+                self._cut(f"{kind or 'request'} latency {latency:.2f}s against a {baseline:.2f}s baseline", kind)
+            else:
+                self.baselines[kind] = latency if baseline is None else 0.9 * baseline + 0.1 * latency
+                # Only grow a limit that is actually being used
+                if busy and self.limit < self.maximum:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._export()
+            self.condition.notify_all()
+
+    def cancel(self):
+        """Give back a slot whose request was never sent; no latency sample, no limit change"""
+        with self.condition:
+            self.in_flight -= 1
+            self._export()
+            self.condition.notify_all()
+
+    def snapshot(self) -> Dict:
+        with self.condition:
+            return {
+                'host': self.host,
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': len(self.waiting),
+                'baseline_latency': {kind or 'request': round(value, 3) for kind, value in self.baselines.items()},
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 1),
+            }
+
+
+class Slot:
+    """One admitted request; release it with the response (or None on failure)"""
+
+    def __init__(self, limiter: HostLimiter, started: float, kind: str = ''):
+        self.limiter = limiter
+        self.started = started
+        self.kind = kind
+        self.released = False
+
+    def release(self, response: Optional[requests.Response] = None):
+        if not self.released:
+            self.released = True
+            self.limiter.release(self.started, response, self.kind)
+
+    def cancel(self):
+        if not self.released:
+            self.released = True
+            self.limiter.cancel()
+
+
+class RequestScheduler:
+    """Per-host concurrency limits shared by every thread using a session
+
+    ResilientAdapter takes a slot before each attempt. The request's priority
+    comes from its trace phase (see PRIORITIES), and waiting for a slot counts
+    against the phase's time budget.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts: Dict[str, HostLimiter] = {}
+
+    def limiter(self, host: str) -> HostLimiter:
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host)
+            return self.hosts[host]
+
+    def acquire(self, url: str, budget: Optional[RunBudget] = None) -> Slot:
+        trace_phase = current_phase()
+        limiter = self.limiter(urlsplit(url).netloc)
+        deadline = (budget or run_budget).deadline(budget_phase(trace_phase))
+        return Slot(limiter, limiter.acquire(PRIORITIES.get(trace_phase, DEFAULT_PRIORITY), deadline),
+                    trace_phase)
+
+    def snapshot(self) -> List[Dict]:
+        """Current limit, load and baseline latency of each host, for logs and monitoring"""
+        with self.lock:
+            limiters = list(self.hosts.values())
+        return [limiter.snapshot() for limiter in limiters]
+
+    def summary_line(self) -> str:
+        return '; '.join(f"{s['host']}: limit {s['limit']}, {s['in_flight']} in flight, {s['waiting']} waiting"
+                         for s in self.snapshot()) or 'no requests'
+
+
+# Shared by every registry session in the process
+registry_scheduler = RequestScheduler()
@@ -1,13 +1,30 @@
 import requests
 import logging
+import queue
+import threading
 import time
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
+from urllib.parse import urljoin
+from shareholder_cassette import install as install_cassette
 from shareholder_config import Config
+from shareholder_fingerprint import FingerprintStore, page_validators
+from shareholder_logging import log_sampled
+from shareholder_metrics import metrics
+from shareholder_parser import build_shareholders, parse_page, parse_shareholders
+from shareholder_records import ShareholderRecord
+from shareholder_resilience import ResilientAdapter, registry_breaker, run_budget
+from shareholder_scheduler import registry_scheduler
+from shareholder_session_cache import SessionCache
+from shareholder_tracing import attach as trace_session, in_phase, tracer
+from shareholder_twofa import poll_until, provider_from_config
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _soup(content: bytes):
+    """Parse a login or search page; bs4 is imported on first use, since most runs restore a session"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, 'html.parser')
+
 class ShareholderScraper:
     def __init__(self):
         self.session = requests.Session()
@@ -19,7 +36,52 @@ class ShareholderScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        # Size the pool for batch runs; pool_block caps concurrent connections per host
+        # Timeouts, retries, the circuit breaker and the adaptive concurrency limit are applied per request
+        adapter = ResilientAdapter(Config.REGISTRY_TIMEOUT, retry_statuses=(502, 503, 504), breaker=registry_breaker,
+                                   scheduler=registry_scheduler, pool_connections=4,
+                                   pool_maxsize=Config.BATCH_MAX_PER_HOST, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        trace_session(self.session, 'registry')
+        install_cassette(self.session, 'registry')
+        self.session_cache = SessionCache()
+        self.authenticated = False
+        self.twofa_seconds: Optional[float] = None  # time spent in the last 2FA step
+        # Last synced state per issuer, and validators of the pages fetched this run
+        self.fingerprints = FingerprintStore()
+        self.page_validators: Dict[str, Dict] = {}
+    
+    @in_phase('session-restore')
+    def restore_session(self) -> bool:
+        """Reuse cached cookies if a single dashboard probe shows they are still logged in"""
+        cookies = self.session_cache.load()
+        if cookies is None:
+            return False
+        
+        self.session.cookies.update(cookies)
+        if self.verify_login():
+            logger.info("Reusing cached registry session")
+            self.authenticated = True
+            return True
+        
+        logger.info("Cached session is no longer valid, logging in again")
+        self.session.cookies.clear()
+        self.session_cache.clear()
+        return False
     
+    def ensure_login(self) -> bool:
+        """Authenticate only if needed: current session, then cached session, then full login"""
+        if self.authenticated:
+            return True
+        return self.restore_session() or self.login()
+    
+    def _login_succeeded(self) -> bool:
+        self.authenticated = True
+        self.session_cache.save(self.session.cookies)
+        return True
+    
+    @in_phase('login')
     def login(self) -> bool:
         """Authenticate with the shareholder registry including 2FA"""
         try:
@@ -29,7 +91,7 @@ class ShareholderScraper:
             login_page = self.session.get(Config.LOGIN_URL)
             login_page.raise_for_status()
             
-            soup = BeautifulSoup(login_page.content, 'html.parser')
+            soup = _soup(login_page.content)
             
             # Find login form
             login_form = soup.find('form', {'id': 'login-form'}) or soup.find('form')
@@ -53,53 +115,25 @@ class ShareholderScraper:
             # Submit login form
             action = login_form.get('action', '/login/')
             if action.startswith('/'):
-                action = f"https://www.aksjeeierregisteret.no{action}"
+                action = f"{Config.REGISTRY_BASE_URL}{action}"
             
             logger.info("Submitting login credentials...")
+            requested_at = time.time()
             response = self.session.post(action, data=login_data)
             response.raise_for_status()
             
             # Check if we need 2FA
             if 'two factor' in response.text.lower() or 'tofaktor' in response.text.lower():
                 logger.info("2FA required. Waiting for code...")
-                
-                # Get 2FA code from environment or wait for manual input
-                twofa_code = Config.TWOFA_CODE
-                if not twofa_code:
-                    logger.warning("2FA code not provided. Please set TWOFA_CODE environment variable")
-                    logger.info("Waiting 30 seconds for manual 2FA completion...")
-                    time.sleep(30)  # Wait for manual intervention
-                    return self.verify_login()
-                
-                # Submit 2FA code if provided
-                soup = BeautifulSoup(response.content, 'html.parser')
-                twofa_form = soup.find('form')
-                
-                if twofa_form:
-                    twofa_data = {'code': twofa_code}
-                    
-                    # Add hidden fields
-                    for hidden in soup.find_all('input', type='hidden'):
-                        name = hidden.get('name')
-                        if name:
-                            twofa_data[name] = hidden.get('value', '')
-                    
-                    twofa_action = twofa_form.get('action', response.url)
-                    if twofa_action.startswith('/'):
-                        twofa_action = f"https://www.aksjeeierregisteret.no{twofa_action}"
-                    
-                    logger.info("Submitting 2FA code...")
-                    twofa_response = self.session.post(twofa_action, data=twofa_data)
-                    twofa_response.raise_for_status()
-                    
-                    if self.verify_login():
-                        logger.info("Login with 2FA successful")
-                        return True
+                if self.complete_twofa(response, requested_at):
+                    return self._login_succeeded()
+                logger.error("Login failed - 2FA was not completed")
+                return False
             
             # Check if already logged in
             if self.verify_login():
                 logger.info("Login successful")
-                return True
+                return self._login_succeeded()
             
             logger.error("Login failed - unable to verify session")
             return False
@@ -108,53 +142,229 @@ class ShareholderScraper:
             logger.error(f"Login error: {str(e)}")
             return False
     
+    @in_phase('login.2fa')
+    def complete_twofa(self, response: requests.Response, requested_at: float) -> bool:
+        """Get the e-mailed code and submit it; reports the time spent as the twofa_seconds metric
+
+        The code comes from TWOFA_CODE or, failing that, the TWOFA_PROVIDER
+        (mailbox or file), which is polled until TWOFA_TIMEOUT or the end of
+        the login budget. Without either,
+        the dashboard is polled until the login is completed elsewhere.
+        """
+        started = time.monotonic()
+        # Never wait past what is left of the login budget
+        timeout = min(Config.TWOFA_TIMEOUT, run_budget.remaining('login'))
+        try:
+            twofa_code = Config.TWOFA_CODE
+            if not twofa_code:
+                provider = provider_from_config()
+                if not provider:
+                    logger.warning("2FA code not provided. Set TWOFA_CODE or TWOFA_PROVIDER")
+                    logger.info(f"Waiting up to {timeout:.0f}s for manual 2FA completion...")
+                    deadline = time.monotonic() + timeout
+                    return bool(poll_until(self.verify_login, deadline, initial=2.0, maximum=10.0))
+                
+                logger.info(f"Waiting up to {timeout:.0f}s for the 2FA code ({provider.name})...")
+                twofa_code = provider.wait_for_code(requested_at, timeout)
+                if not twofa_code:
+                    logger.error("No 2FA code arrived before the deadline")
+                    return False
+            
+            soup = _soup(response.content)
+            twofa_form = soup.find('form')
+            if not twofa_form:
+                logger.error("Could not find 2FA form")
+                return self.verify_login()
+            
+            twofa_data = {'code': twofa_code}
+            
+            # Add hidden fields
+            for hidden in soup.find_all('input', type='hidden'):
+                name = hidden.get('name')
+                if name:
+                    twofa_data[name] = hidden.get('value', '')
+            
+            twofa_action = twofa_form.get('action', response.url)
+            if twofa_action.startswith('/'):
+                twofa_action = f"{Config.REGISTRY_BASE_URL}{twofa_action}"
+            
+            logger.info("Submitting 2FA code...")
+            twofa_response = self.session.post(twofa_action, data=twofa_data)
+            twofa_response.raise_for_status()
+            
+            if self.verify_login():
+                logger.info("Login with 2FA successful")
+                return True
+            return False
+        finally:
+            self.twofa_seconds = time.monotonic() - started
+            tracer.set_metric('twofa_seconds', round(self.twofa_seconds, 3))
+            logger.info(f"2FA step took {self.twofa_seconds:.1f}s")
+    
     def verify_login(self) -> bool:
         """Verify if we are logged in by checking for logout link or dashboard"""
         try:
-            dashboard = self.session.get("https://www.aksjeeierregisteret.no/")
+            dashboard = self.session.get(Config.DASHBOARD_URL)
             return 'logout' in dashboard.text.lower() or 'logg ut' in dashboard.text.lower()
         except:
             return False
     
-    def navigate_to_protector(self) -> bool:
-        """Navigate from dashboard to Protector company page"""
+    @in_phase('navigation')
+    def navigate_to_company(self, orgnr: str, search_term: str) -> bool:
+        """Navigate from dashboard to a company page via the company search"""
+        if Config.LEAN_NAVIGATION:
+            # Traces show the dashboard GET and search POST never change what is fetched
+            # next: the security page is always requested by org number directly
+            logger.info(f"Lean navigation: going straight to {Config.SECURITY_URL.format(orgnr=orgnr)}")
+            return True
+        
         try:
-            logger.info("Navigating to Protector company page...")
+            logger.info(f"Navigating to {search_term} company page...")
             
             # First, go to the dashboard/home page
-            dashboard_response = self.session.get("https://www.aksjeeierregisteret.no/")
+            dashboard_response = self.session.get(Config.DASHBOARD_URL)
             dashboard_response.raise_for_status()
             
-            # Search for Protector
-            search_url = "https://www.aksjeeierregisteret.no/"
+            # Submit search form
             search_data = {
-                'companies-search': 'Protector'
+                'companies-search': search_term
             }
+            search_response = self.session.post(Config.DASHBOARD_URL, data=search_data)
             
-            # Submit search form
-            search_response = self.session.post(search_url, data=search_data)
-            
-            # Look for the Protector link in search results
-            soup = BeautifulSoup(search_response.content, 'html.parser')
+            # Look for the company row in search results
+            soup = _soup(search_response.content)
+            company_row = soup.find('tr', {'data-orgnr': orgnr})
             
-            # Find the row with Protector (org number: 985279721)
-            protector_row = soup.find('tr', {'data-orgnr': '985279721'})
-            
-            if protector_row:
-                # Direct link to Protector page
-                protector_url = "https://www.aksjeeierregisteret.no/content/security/?orgnr=985279721"
-                logger.info(f"Found Protector, navigating to: {protector_url}")
-                return True
+            company_url = Config.SECURITY_URL.format(orgnr=orgnr)
+            if company_row:
+                logger.info(f"Found {search_term}, navigating to: {company_url}")
             else:
                 # Alternative: try direct navigation
-                logger.info("Using direct URL to Protector page")
-                return True
+                logger.info(f"Using direct URL to {search_term} page")
+            return True
                 
         except Exception as e:
             logger.error(f"Navigation error: {str(e)}")
             return False
     
-    def scrape_shareholders(self) -> List[Dict[str, str]]:
+    def navigate_to_protector(self) -> bool:
+        """Navigate from dashboard to Protector company page"""
+        return self.navigate_to_company(Config.TARGET_ORGNR, Config.TARGET_SEARCH)
+    
+    @in_phase('parse')
+    def parse_shareholders(self, content: bytes) -> List[ShareholderRecord]:
+        """Parse the top shareholders out of a company security page"""
+        shareholders = parse_shareholders(content, limit=Config.MAX_SHAREHOLDERS)
+        metrics.count('shareholders_parsed_total', len(shareholders))
+        
+        logger.info("Parsed %d investor rows", len(shareholders))
+        log_sampled(logger, "Extracted: %s", shareholders)
+        
+        return shareholders
+    
+    @in_phase('fetch')
+    def fetch_page(self, orgnr: str) -> Tuple[Optional[bytes], Optional[List[ShareholderRecord]]]:
+        """Fetch one company's security page; raises on HTTP errors
+
+        Returns ``(content, None)`` when the page needs parsing, or
+        ``(None, records)`` when the registry answered 304 or the page bytes match
+        the last synced page, in which case the last synced rows are reused.
+        Needs an authenticated session. Safe to call from several threads sharing
+        this scraper's session.
+        """
+        headers = self.fingerprints.conditional_headers(orgnr)
+        response = self.session.get(Config.SECURITY_URL.format(orgnr=orgnr), headers=headers)
+        
+        if response.status_code == 304:
+            cached = self.fingerprints.cached_records(orgnr)
+            if cached is not None:
+                logger.info(f"[{orgnr}] Registry page not modified since last sync")
+                self.page_validators[orgnr] = {key: self.fingerprints.get(orgnr).get(key)
+                                               for key in ('etag', 'last_modified', 'raw_sha256')}
+                return None, cached
+            # Nothing cached to fall back on, so ask again unconditionally
+            response = self.session.get(Config.SECURITY_URL.format(orgnr=orgnr))
+        response.raise_for_status()
+        
+        validators = page_validators(response)
+        self.page_validators[orgnr] = validators
+        entry = self.fingerprints.get(orgnr)
+        if entry and entry.get('raw_sha256') == validators['raw_sha256']:
+            cached = self.fingerprints.cached_records(orgnr)
+            if cached is not None:
+                logger.info(f"[{orgnr}] Registry page bytes unchanged since last sync, skipping parse")
+                return None, cached
+        return response.content, None
+    
+    def fetch_shareholders(self, orgnr: str) -> List[ShareholderRecord]:
+        """Fetch and parse one company's shareholder page; raises on HTTP errors"""
+        content, cached = self.fetch_page(orgnr)
+        if cached is not None:
+            return cached
+        return self.parse_shareholders(content)
+    
+    @in_phase('register')
+    def _fetch_register_pages(self, orgnr: str, pages: queue.Queue, stop: threading.Event):
+        """Producer: download register pages in order and hand them over parsed"""
+        def hand_over(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        url = Config.SECURITY_URL.format(orgnr=orgnr)
+        try:
+            while url:
+                response = self.session.get(url)
+                response.raise_for_status()
+                rows, next_href = parse_page(response.content)
+                url = urljoin(response.url, next_href) if next_href and rows else None
+                # Drop the page body before waiting on the consumer
+                del response
+                if not hand_over(rows):
+                    return
+        except Exception as e:
+            hand_over(e)
+            return
+        hand_over(None)
+    
+    def iter_register(self, orgnr: Optional[str] = None) -> Iterator[ShareholderRecord]:
+        """Stream every holder in the register, page by page, as parsed records
+
+        A background thread keeps at most ``REGISTER_PREFETCH_PAGES`` parsed pages
+        ahead of the consumer, so memory stays flat however long the register is
+        and the consumer works on rows while later pages download. Needs an
+        authenticated session; raises on HTTP errors.
+        """
+        orgnr = orgnr or Config.TARGET_ORGNR
+        pages: queue.Queue = queue.Queue(maxsize=Config.REGISTER_PREFETCH_PAGES)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._fetch_register_pages, args=(orgnr, pages, stop),
+                                    name=f'register-{orgnr}', daemon=True)
+        producer.start()
+        
+        rank = 1
+        page_count = 0
+        try:
+            while True:
+                rows = pages.get()
+                if rows is None:
+                    break
+                if isinstance(rows, Exception):
+                    raise rows
+                page_count += 1
+                yield from build_shareholders(rows, start_rank=rank)
+                rank += len(rows)
+            logger.info(f"Streamed {rank - 1} register rows from {page_count} pages for {orgnr}")
+        finally:
+            # Also reached when the consumer stops iterating early
+            stop.set()
+            producer.join(timeout=5)
+    
+    def scrape_shareholders(self) -> List[ShareholderRecord]:
         """Scrape top 20 shareholders data"""
         try:
             # Navigate to Protector page
@@ -163,48 +373,7 @@ class ShareholderScraper:
                 return []
             
             # Make request to Protector shareholders page
-            response = self.session.get(Config.TARGET_URL)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find the shareholders table
-            shareholders = []
-            
-            # Look for table rows with investor data
-            investor_rows = soup.find_all('tr', id=lambda x: x and x.startswith('investor-'))
-            
-            logger.info(f"Found {len(investor_rows)} investor rows")
-            
-            for i, row in enumerate(investor_rows[:Config.MAX_SHAREHOLDERS]):
-                try:
-                    cells = row.find_all('td')
-                    if len(cells) >= 4:  # Ensure we have enough columns
-                        
-                        # Extract data based on the HTML structure provided
-                        surname_company = cells[0].get_text(strip=True) if cells[0] else ''
-                        first_name = cells[1].get_text(strip=True) if cells[1] else ''
-                        holdings = cells[2].get_text(strip=True) if cells[2] else ''
-                        percent = cells[3].get_text(strip=True) if cells[3] else ''
-                        
-                        # Clean up the data
-                        holdings = holdings.replace('\xa0', ' ').replace(',', '').strip()
-                        percent = percent.replace('%', '').replace(',', '.').strip()
-                        
-                        shareholder_data = {
-                            'rank': i + 1,
-                            'surname_company': surname_company,
-                            'first_name': first_name,
-                            'holdings': holdings,
-                            'percent': percent
-                        }
-                        
-                        shareholders.append(shareholder_data)
-                        logger.info(f"Extracted: {shareholder_data}")
-                        
-                except Exception as e:
-                    logger.error(f"Error processing row {i}: {str(e)}")
-                    continue
+            shareholders = self.fetch_shareholders(Config.TARGET_ORGNR)
             
             logger.info(f"Successfully scraped {len(shareholders)} shareholders")
             return shareholders
@@ -213,12 +382,12 @@ class ShareholderScraper:
             logger.error(f"Scraping error: {str(e)}")
             return []
     
-    def run_scraper(self) -> List[Dict[str, str]]:
+    def run_scraper(self) -> List[ShareholderRecord]:
         """Main scraper workflow"""
         logger.info("Starting shareholder scraper")
         
-        # Authenticate
-        if not self.login():
+        # Authenticate, reusing an existing or cached session where possible
+        if not self.ensure_login():
             logger.error("Authentication failed")
             return []
         
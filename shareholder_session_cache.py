@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import time
+from typing import Optional
+from requests.cookies import RequestsCookieJar, create_cookie
+from shareholder_config import Config
+
+logger = logging.getLogger(__name__)
+
+class SessionCache:
+    """Encrypted on-disk cookie jar for the registry session
+
+    Cookies are Fernet-encrypted with ``SESSION_CACHE_KEY``. Without a key (or
+    without the ``cryptography`` package) the cache is disabled rather than
+    writing a live session to disk in plain text.
+    """
+
+    def __init__(self, path: Optional[str] = None, key: Optional[str] = None, ttl: Optional[int] = None):
+        self.path = path or Config.SESSION_CACHE_PATH
+        self.ttl = ttl if ttl is not None else Config.SESSION_CACHE_TTL
+        self.fernet = self._load_fernet(key or Config.SESSION_CACHE_KEY)
+
+    @staticmethod
+    def _load_fernet(key: Optional[str]):
+        if not key:
+            return None
+        try:
+            from cryptography.fernet import Fernet
+            return Fernet(key.encode() if isinstance(key, str) else key)
+        except ImportError:
+            logger.warning("cryptography is not installed; session cache disabled")
+        except ValueError as e:
+            logger.warning(f"Invalid SESSION_CACHE_KEY, session cache disabled: {str(e)}")
+        return None
+
+    @property
+    def enabled(self) -> bool:
+        return self.fernet is not None
+
+    def save(self, cookies: RequestsCookieJar) -> bool:
+        """Persist the cookie jar with its expiry time"""
+        if not self.enabled:
+            return False
+        try:
+            now = time.time()
+            expires_at = now + self.ttl
+            records = []
+            for cookie in cookies:
+                # A cookie that dies before our TTL caps the lifetime of the whole session
+                if cookie.expires:
+                    expires_at = min(expires_at, cookie.expires)
+                records.append({
+                    'name': cookie.name,
+                    'value': cookie.value,
+                    'domain': cookie.domain,
+                    'path': cookie.path,
+                    'expires': cookie.expires,
+                    'secure': cookie.secure,
+                    'rest': {'HttpOnly': cookie.get_nonstandard_attr('HttpOnly')} if cookie.has_nonstandard_attr('HttpOnly') else {},
+                })
+
+            payload = json.dumps({'saved_at': now, 'expires_at': expires_at, 'cookies': records})
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(self.fernet.encrypt(payload.encode('utf-8')))
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+
+            logger.info(f"Cached {len(records)} session cookies until {time.ctime(expires_at)}")
+            return True
+
+        except Exception as e:
+            logger.warning(f"Could not save session cache: {str(e)}")
+            return False
+
+    def load(self) -> Optional[RequestsCookieJar]:
+        """Return the cached cookie jar, or None if missing, unreadable or expired"""
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                payload = json.loads(self.fernet.decrypt(f.read()))
+
+            if payload['expires_at'] <= time.time():
+                logger.info("Cached session has expired")
+                self.clear()
+                return None
+
+            jar = RequestsCookieJar()
+            for record in payload['cookies']:
+                jar.set_cookie(create_cookie(**record))
+            return jar
+
+        except Exception as e:
+            logger.warning(f"Discarding unreadable session cache: {str(e)}")
+            self.clear()
+            return None
+
+    def clear(self):
+        """Remove the cached session"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
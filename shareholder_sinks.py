@@ -0,0 +1,297 @@
+"""
+Output sinks for scraped shareholder tables
+Every snapshot is handed to each configured sink (Webflow, CSV/JSONL files, a
+webhook) through its own bounded queue and worker thread, so sinks deliver in
+parallel and a slow one neither holds up the others nor keeps the run alive.
+"""
+
+import csv
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+import requests
+from shareholder_analytics import sync_basis
+from shareholder_config import Config
+from shareholder_fingerprint import FingerprintStore
+from shareholder_http import WebflowTransport
+from shareholder_metrics import metrics
+from shareholder_records import ShareholderRecord
+from shareholder_resilience import ResilientAdapter, run_budget
+from shareholder_tracing import attach as trace_session
+from shareholder_webflow_api import SitePublisher, WebflowAPI
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker for a sink's queue
+_DONE = object()
+
+
+class Snapshot(NamedTuple):
+    """One issuer's scraped table, as handed to every sink"""
+    orgnr: str
+    records: List[ShareholderRecord]
+    collection_id: Optional[str] = None
+    validators: Optional[Dict] = None
+    scraped_at: str = ''
+
+    @classmethod
+    def of(cls, orgnr: str, records: List[ShareholderRecord], collection_id: Optional[str] = None,
+           validators: Optional[Dict] = None) -> 'Snapshot':
+        return cls(orgnr, records, collection_id, validators,
+                   datetime.now(timezone.utc).isoformat(timespec='seconds'))
+
+    def as_dict(self) -> Dict:
+        return {
+            'orgnr': self.orgnr,
+            'scraped_at': self.scraped_at,
+            'shareholders': [record.as_dict() for record in self.records],
+        }
+
+
+class Sink:
+    """Somewhere a snapshot is delivered to
+
+    ``deliver`` runs on the sink's own worker thread, one snapshot at a time,
+    and returns False (or raises) on failure. ``close`` runs on the same
+    thread after the last snapshot and returns False if finishing up failed.
+    """
+
+    name = 'sink'
+
+    def deliver(self, snapshot: Snapshot) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> bool:
+        return True
+
+
+class WebflowSink(Sink):
+    """Syncs snapshots to their Webflow collection and publishes the site once at close
+
+    Snapshots without a collection are skipped, as are those whose table
+    (and, with WEBFLOW_ANALYTICS, change-field comparison date) matches the
+    last successful sync unless ``force`` is set. All collections
+    share one transport, so they share connections and the API rate limit.
+    """
+
+    name = 'webflow'
+
+    def __init__(self, fingerprints: Optional[FingerprintStore] = None, force: bool = False,
+                 transport: Optional[WebflowTransport] = None):
+        self.fingerprints = fingerprints or FingerprintStore()
+        self.force = force
+        self.transport = transport or WebflowTransport(Config.WEBFLOW_API_TOKEN)
+        self.publisher = SitePublisher(self.transport)
+        self.synced = 0
+        self.unchanged = 0
+
+    def deliver(self, snapshot: Snapshot) -> bool:
+        if not snapshot.collection_id:
+            return True
+        basis = sync_basis(snapshot.orgnr)
+        if not self.force and self.fingerprints.is_unchanged(snapshot.orgnr, snapshot.records, basis):
+            logger.info(f"[{snapshot.orgnr}] Unchanged since last sync - skipping Webflow")
+            self.unchanged += 1
+            return True
+
+        api = WebflowAPI(snapshot.collection_id, self.transport)
+        if not api.update_shareholders(snapshot.records, publisher=self.publisher, orgnr=snapshot.orgnr,
+                                       validators=snapshot.validators):
+            logger.error(f"[{snapshot.orgnr}] Webflow update failed")
+            return False
+        self.fingerprints.record_sync(snapshot.orgnr, snapshot.records, snapshot.validators, basis)
+        logger.info(f"[{snapshot.orgnr}] Webflow update completed successfully")
+        self.synced += 1
+        return True
+
+    def close(self) -> bool:
+        # Also publishes a change an earlier run could not
+        if not self.publisher.flush():
+            logger.error("Site publish failed; it will be retried on the next run")
+            return False
+        return True
+
+
+class FileSink(Sink):
+    """Appends every snapshot's rows to a CSV or JSON Lines file (by extension)
+
+    Rows carry the org number and scrape time, so one file can collect many
+    issuers and runs. The file is flushed after each snapshot, so consumers
+    tailing it see whole tables. ``{date}`` in the path is replaced with the
+    UTC date, for one file per day.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = 'jsonl' if path.endswith('.jsonl') else 'csv'
+
+    def deliver(self, snapshot: Snapshot) -> bool:
+        path = self.path.replace('{date}', snapshot.scraped_at[:10])
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            if self.name == 'jsonl':
+                for record in snapshot.records:
+                    row = dict(record.as_dict(), orgnr=snapshot.orgnr, scraped_at=snapshot.scraped_at)
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            else:
+                writer = csv.writer(f)
+                if f.tell() == 0:
+                    writer.writerow(('orgnr', 'scraped_at') + ShareholderRecord._fields)
+                for record in snapshot.records:
+                    writer.writerow((snapshot.orgnr, snapshot.scraped_at) + tuple(record))
+        logger.info(f"[{snapshot.orgnr}] Wrote {len(snapshot.records)} rows to {path}")
+        return True
+
+
+class WebhookSink(Sink):
+    """POSTs each snapshot as JSON to a URL; any non-error response counts as delivered
+
+    POSTs are not retried, since the receiver may have acted on a request
+    whose response was lost.
+    """
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: Optional[float] = None):
+        self.url = url
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json', 'User-Agent': Config.USER_AGENT})
+        trace_session(self.session, 'webhook')
+        adapter = ResilientAdapter((5, timeout or Config.WEBHOOK_TIMEOUT))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def deliver(self, snapshot: Snapshot) -> bool:
+        response = self.session.post(self.url, data=json.dumps(snapshot.as_dict(), ensure_ascii=False).encode('utf-8'))
+        if not response.ok:
+            logger.error(f"[{snapshot.orgnr}] Webhook {self.url} returned {response.status_code}")
+            return False
+        logger.info(f"[{snapshot.orgnr}] Delivered {len(snapshot.records)} rows to webhook {self.url}")
+        return True
+
+    def close(self) -> bool:
+        self.session.close()
+        return True
+
+
+def build_sinks(spec: Optional[str] = None, webflow: Optional[Sink] = None) -> List[Sink]:
+    """Sinks named in OUTPUT_SINKS, e.g. ``"webflow,jsonl:out/holders.jsonl,webhook:https://..."``
+
+    Entries are ``webflow``, ``csv:PATH``, ``jsonl:PATH`` or ``webhook:URL``.
+    The Webflow sink needs the run's fingerprints, so the caller builds it
+    and passes it in; without one a ``webflow`` entry is left out.
+    """
+    spec = Config.OUTPUT_SINKS if spec is None else spec
+    sinks = []
+    for entry in filter(None, (chunk.strip() for chunk in spec.split(','))):
+        kind, _, target = entry.partition(':')
+        kind = kind.lower()
+        if kind == 'webflow':
+            if webflow is not None:
+                sinks.append(webflow)
+        elif kind in ('csv', 'jsonl') and target:
+            sinks.append(FileSink(target if target.endswith(f'.{kind}') else f"{target}.{kind}"))
+        elif kind == 'webhook' and target:
+            sinks.append(WebhookSink(target))
+        else:
+            raise ValueError(f"Invalid OUTPUT_SINKS entry '{entry}' "
+                             f"(expected webflow, csv:PATH, jsonl:PATH or webhook:URL)")
+    return sinks
+
+
+class SinkWorker:
+    """A sink with its own bounded queue, drained by a daemon thread"""
+
+    def __init__(self, sink: Sink, queue_size: int):
+        self.sink = sink
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.closed_ok = False
+        self.thread = threading.Thread(target=self._run, name=f"sink-{sink.name}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            snapshot = self.queue.get()
+            if snapshot is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                ok = self.sink.deliver(snapshot)
+            except Exception as e:
+                logger.error(f"[{snapshot.orgnr}] {self.sink.name} sink failed: {str(e)}")
+                ok = False
+            metrics.observe('sink_delivery_seconds', time.perf_counter() - started, sink=self.sink.name)
+            metrics.count('sink_snapshots_total', sink=self.sink.name, outcome='delivered' if ok else 'failed')
+            if ok:
+                self.delivered += 1
+            else:
+                self.failed += 1
+        try:
+            self.closed_ok = self.sink.close()
+        except Exception as e:
+            logger.error(f"Closing the {self.sink.name} sink failed: {str(e)}")
+
+    def offer(self, snapshot: Snapshot, timeout: float) -> bool:
+        """Queue a snapshot, waiting up to ``timeout`` for room; False if the sink is too far behind"""
+        try:
+            self.queue.put(snapshot, timeout=timeout)
+            return True
+        except queue.Full:
+            logger.error(f"[{snapshot.orgnr}] {self.sink.name} sink is {self.queue.maxsize} snapshots behind; "
+                         f"dropping this one")
+            metrics.count('sink_snapshots_total', sink=self.sink.name, outcome='dropped')
+            self.dropped += 1
+            return False
+
+
+class SinkFanOut:
+    """Delivers every submitted snapshot to all sinks concurrently
+
+    Each sink has a worker thread and a queue of at most ``queue_size``
+    snapshots. ``submit`` waits up to SINK_QUEUE_TIMEOUT for room in a full
+    queue, which slows the producer to the pace of its sinks, and then drops
+    the snapshot for that sink only. ``close`` waits for the sinks to finish
+    until the run deadline; a sink still busy after that is abandoned (its
+    thread is a daemon) and counted as failed.
+    """
+
+    def __init__(self, sinks: List[Sink], queue_size: Optional[int] = None):
+        size = queue_size or Config.SINK_QUEUE_SIZE
+        self.workers = [SinkWorker(sink, size) for sink in sinks]
+
+    def __bool__(self) -> bool:
+        return bool(self.workers)
+
+    def submit(self, snapshot: Snapshot, timeout: Optional[float] = None) -> bool:
+        timeout = Config.SINK_QUEUE_TIMEOUT if timeout is None else timeout
+        # Every sink gets the same wait, not whatever the sinks before it left over
+        return all([worker.offer(snapshot, timeout) for worker in self.workers])
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the sinks to drain; True if every snapshot reached every sink"""
+        deadline = time.monotonic() + (run_budget.remaining() if timeout is None else timeout)
+        for worker in self.workers:
+            try:
+                worker.queue.put(_DONE, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        ok = True
+        for worker in self.workers:
+            worker.thread.join(max(0.0, deadline - time.monotonic()))
+            name = worker.sink.name
+            if worker.thread.is_alive():
+                logger.error(f"{name} sink did not finish before the deadline; abandoning it")
+                metrics.count('sink_snapshots_total', sink=name, outcome='abandoned')
+                ok = False
+                continue
+            logger.info(f"{name} sink: {worker.delivered} delivered, {worker.failed} failed, {worker.dropped} dropped")
+            ok = ok and worker.closed_ok and not (worker.failed or worker.dropped)
+        return ok
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import List, Dict, Optional, Tuple
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord, format_holdings
+
+logger = logging.getLogger(__name__)
+
+# Webflow fields owned by the scraper; anything else on an item is left alone
+# Change since the previous snapshot (shareholder_analytics); the collection needs these fields
+ANALYTICS_FIELDS = ('rank-change', 'holdings-change', 'percentage-change')
+MANAGED_FIELDS = (('name', 'surname-company', 'first-name', 'holdings', 'percentage', 'rank', 'slug')
+                  + (ANALYTICS_FIELDS if Config.WEBFLOW_ANALYTICS else ()))
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Collapse whitespace and case so cosmetic registry changes keep the same identity"""
+    return ' '.join((value or '').split()).casefold()
+
+
+def assign_identities(names: List[Tuple[str, str]]) -> List[str]:
+    """Build a stable identity for each (surname_company, first_name) pair, in rank order
+
+    Nominee accounts often appear several times under the same name, so repeated
+    names get an occurrence counter (``name#2``) instead of colliding.
+    """
+    seen: Dict[str, int] = {}
+    identities = []
+    for surname_company, first_name in names:
+        base = f"{normalize_name(surname_company)}|{normalize_name(first_name)}"
+        seen[base] = seen.get(base, 0) + 1
+        identities.append(base if seen[base] == 1 else f"{base}#{seen[base]}")
+    return identities
+
+
+def identity_slug(identity: str) -> str:
+    """Derive a URL-safe Webflow slug from a shareholder identity"""
+    return f"shareholder-{hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]}"
+
+
+def build_item_fields(shareholder: ShareholderRecord, identity: str, derived: Optional[Dict] = None) -> Dict:
+    """Map scraper data to Webflow fields, plus any ``derived`` analytics fields"""
+    # Note: You'll need to adjust these field names to match your Webflow collection schema
+    fields = {
+        'name': shareholder.name,
+        'surname-company': shareholder.surname_company,
+        'first-name': shareholder.first_name,
+        'holdings': format_holdings(shareholder.holdings),
+        'percentage': str(shareholder.percent),
+        'rank': shareholder.rank,
+        'slug': identity_slug(identity),
+    }
+    if Config.WEBFLOW_ANALYTICS:
+        # Cleared when there is nothing to compare against, rather than left showing an old change
+        fields.update(dict.fromkeys(ANALYTICS_FIELDS), **(derived or {}))
+    return fields
+
+
+def _decimal_text(value) -> str:
+    """A decimal as canonical text, so '0.1000', '0.1' and 0.1 compare equal"""
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        return str(value)
+    return '0' if number.is_zero() else format(number.normalize(), 'f')
+
+
+def _managed(fields: Dict) -> Dict:
+    managed = {key: fields.get(key) for key in MANAGED_FIELDS}
+    # Webflow may hand numbers back as strings or floats, and trim or pad decimals
+    for key in ('rank', 'rank-change', 'holdings-change'):
+        try:
+            managed[key] = int(managed[key])
+        except (KeyError, TypeError, ValueError):
+            pass
+    if managed.get('holdings') is not None:
+        managed['holdings'] = str(managed['holdings'])
+    for key in ('percentage', 'percentage-change'):
+        if managed.get(key) is not None:
+            managed[key] = _decimal_text(managed[key])
+    return managed
+
+
+def fields_hash(fields: Dict) -> str:
+    """Hash of an item's managed fields; equal hashes mean the sync sees no difference"""
+    managed = json.dumps(_managed(fields), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(managed.encode('utf-8')).hexdigest()
+
+
+class SyncPlan:
+    """Webflow operations needed to turn the current collection into the scraped table"""
+
+    def __init__(self):
+        self.creates: List[Dict] = []
+        self.updates: List[Tuple[str, Dict]] = []
+        self.deletes: List[str] = []
+        self.unchanged = 0
+
+    def is_empty(self) -> bool:
+        return not (self.creates or self.updates or self.deletes)
+
+    def __repr__(self):
+        return (f"SyncPlan(create={len(self.creates)}, update={len(self.updates)}, "
+                f"delete={len(self.deletes)}, unchanged={self.unchanged})")
+
+
+class SyncResult:
+    """Outcome counts of a Webflow sync"""
+
+    def __init__(self):
+        self.unchanged = 0
+        self.updated = 0
+        self.created = 0
+        self.deleted = 0
+        self.failed = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.updated or self.created or self.deleted)
+
+    @property
+    def ok(self) -> bool:
+        return self.failed == 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'unchanged': self.unchanged,
+            'updated': self.updated,
+            'created': self.created,
+            'deleted': self.deleted,
+            'failed': self.failed,
+        }
+
+    def __str__(self):
+        return ', '.join(f"{key}={value}" for key, value in self.as_dict().items())
+
+
+def existing_identities(items: List[Dict]) -> Dict[str, Dict]:
+    """Index Webflow items by shareholder identity
+
+    Identity comes from the name fields rather than the slug, so items created
+    with the old ``shareholder-{rank}`` slugs are matched and migrated in place.
+    """
+    def rank_of(item):
+        try:
+            return int(item.get('rank') or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    ordered = sorted(items, key=rank_of)
+    identities = assign_identities([(item.get('surname-company'), item.get('first-name')) for item in ordered])
+    return dict(zip(identities, ordered))
+
+
+def plan_sync(existing_items: Optional[List[Dict]], shareholders_data: List[ShareholderRecord],
+              existing: Optional[Dict[str, Dict]] = None, derived: Optional[List[Dict]] = None) -> SyncPlan:
+    """Diff the current Webflow items against freshly scraped shareholders
+
+    ``existing`` may be an identity index that is already built, such as the
+    collection mirror's, instead of a listing in ``existing_items``.
+    ``derived`` holds extra fields for each shareholder, in the same order.
+    """
+    plan = SyncPlan()
+    existing = dict(existing) if existing is not None else existing_identities(existing_items)
+    identities = assign_identities([(s.surname_company, s.first_name) for s in shareholders_data])
+
+    for index, (shareholder, identity) in enumerate(zip(shareholders_data, identities)):
+        fields = build_item_fields(shareholder, identity, derived[index] if derived else None)
+        item = existing.pop(identity, None)
+        if item is None:
+            plan.creates.append(fields)
+        elif _managed(item) != _managed(fields):
+            plan.updates.append((item['_id'], fields))
+        else:
+            plan.unchanged += 1
+
+    # Whatever is left dropped out of the scraped table
+    plan.deletes.extend(item['_id'] for item in existing.values())
+    return plan
@@ -0,0 +1,166 @@
+import functools
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+from shareholder_config import Config
+from shareholder_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{12,})$', re.IGNORECASE)
+_state = threading.local()
+
+
+def url_template(url: str) -> str:
+    """Collapse IDs and query values so requests to the same endpoint group together"""
+    parts = urlsplit(url)
+    path = '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split('/'))
+    query = '&'.join(f"{key}={{{key}}}" for key, _ in parse_qsl(parts.query, keep_blank_values=True))
+    return f"{parts.netloc}{path}" + (f"?{query}" if query else '')
+
+
+def current_phase() -> str:
+    return getattr(_state, 'phase', None) or 'other'
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute requests made by this thread inside the block to ``name`` and time it
+
+    Re-entering the phase the thread is already in is not timed again.
+    """
+    previous = getattr(_state, 'phase', None)
+    _state.phase = name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _state.phase = previous
+        if name != previous:
+            metrics.observe('phase_seconds', time.perf_counter() - started, phase=name)
+
+
+def in_phase(name: str):
+    """Decorator form of ``phase`` for methods that make up one phase"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestTracer:
+    """Records every HTTP exchange of the sessions it is attached to
+
+    Each record has the method, URL template, status, latency, response bytes,
+    the client (registry or webflow) and the phase that issued it. Redirect hops
+    are recorded separately, so hidden round trips show up too.
+    """
+
+    def __init__(self):
+        self.records: List[Dict] = []
+        self.metrics: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def attach(self, session, client: str):
+        """Hook a requests.Session so its responses are traced"""
+        def on_response(response, *args, **kwargs):
+            self._record(client, response, streamed=kwargs.get('stream', False))
+            return response
+        session.hooks.setdefault('response', []).append(on_response)
+
+    def _record(self, client: str, response, streamed: bool = False):
+        length = response.headers.get('Content-Length')
+        if length is not None:
+            size = int(length)
+        elif streamed:
+            size = None  # unknown without reading the stream
+        else:
+            # requests reads non-streamed bodies right after this hook anyway
+            size = len(response.content or b'')
+        record = {
+            'time': round(time.time() - self.started, 4),
+            'client': client,
+            'phase': current_phase(),
+            'method': response.request.method,
+            'template': url_template(response.url),
+            'status': response.status_code,
+            'latency_ms': round(response.elapsed.total_seconds() * 1000, 1),
+            'bytes': size,
+        }
+        with self.lock:
+            self.records.append(record)
+        metrics.count('http_requests_total', client=client, phase=record['phase'],
+                      status=f"{response.status_code // 100}xx")
+        metrics.count('http_response_bytes_total', size or 0, client=client)
+
+    def reset(self):
+        """Drop recorded requests, e.g. between daemon cycles"""
+        with self.lock:
+            self.records = []
+            self.metrics = {}
+        self.started = time.time()
+
+    def set_metric(self, name: str, value: float):
+        """Record a run-level measurement (e.g. twofa_seconds) for the report"""
+        with self.lock:
+            self.metrics[name] = value
+        metrics.set(name, value)
+
+    def summary(self) -> List[Dict]:
+        """Requests grouped by (client, phase, method, template)"""
+        groups: Dict[tuple, Dict] = {}
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            key = (record['client'], record['phase'], record['method'], record['template'])
+            group = groups.setdefault(key, {'client': key[0], 'phase': key[1], 'method': key[2], 'template': key[3],
+                                            'count': 0, 'latency_ms': 0.0, 'bytes': 0, 'errors': 0})
+            group['count'] += 1
+            group['latency_ms'] = round(group['latency_ms'] + record['latency_ms'], 1)
+            group['bytes'] += record['bytes'] or 0
+            group['errors'] += record['status'] >= 400
+        return list(groups.values())
+
+    def summary_line(self) -> str:
+        with self.lock:
+            records = list(self.records)
+        by_client: Dict[str, List[Dict]] = {}
+        for record in records:
+            by_client.setdefault(record['client'], []).append(record)
+        parts = []
+        for client, items in sorted(by_client.items()):
+            kb = sum(item['bytes'] or 0 for item in items) / 1024
+            ms = sum(item['latency_ms'] for item in items)
+            parts.append(f"{client}: {len(items)} requests, {kb:.1f} KB, {ms:.0f} ms")
+        return '; '.join(parts) or 'no requests'
+
+    def write_report(self, path: Optional[str] = None) -> Optional[str]:
+        """Write the per-run trace as JSON; returns the path written"""
+        path = path or Config.TRACE_REPORT_PATH
+        if not path:
+            return None
+        with self.lock:
+            records = list(self.records)
+            metrics = dict(self.metrics)
+        report = {'started': self.started, 'metrics': metrics, 'summary': self.summary(), 'requests': records}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+# Process-wide tracer shared by the scraper and the Webflow client
+tracer = RequestTracer()
+
+
+def attach(session, client: str):
+    if Config.TRACE_REQUESTS:
+        tracer.attach(session, client)
@@ -0,0 +1,220 @@
+import email
+import imaplib
+import logging
+import os
+import re
+import stat
+import time
+from email.message import Message
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from shareholder_config import Config
+
+logger = logging.getLogger(__name__)
+
+CODE_PATTERN = re.compile(r'(?<!\d)(\d{6})(?!\d)')
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+# Accept mails dated slightly before the login request, in case the mail server's clock is behind
+CLOCK_SKEW = 120
+
+
+def extract_code(text: str) -> Optional[str]:
+    """First standalone 6-digit number in ``text``"""
+    match = CODE_PATTERN.search(text or '')
+    return match.group(1) if match else None
+
+
+def poll_until(check: Callable[[], Optional[object]], deadline: float, initial: float = 0.25,
+               factor: float = 1.5, maximum: float = 1.0) -> Optional[object]:
+    """Call ``check`` with growing pauses until it returns something truthy or ``deadline`` (monotonic) passes"""
+    delay = initial
+    while True:
+        value = check()
+        if value:
+            return value
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * factor, maximum)
+
+
+class CodeProvider:
+    """Source of the e-mailed 2FA code
+
+    Subclasses implement ``poll(since)``, which returns a code that arrived
+    after ``since`` (a ``time.time()`` timestamp) or None without blocking.
+    """
+
+    name = 'provider'
+
+    def poll(self, since: float) -> Optional[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def wait_for_code(self, since: float, timeout: Optional[float] = None) -> Optional[str]:
+        """Poll with short backoff until a code shows up or the timeout passes"""
+        deadline = time.monotonic() + (timeout or Config.TWOFA_TIMEOUT)
+
+        def check() -> Optional[str]:
+            try:
+                return self.poll(since)
+            except Exception as e:
+                logger.warning(f"2FA {self.name} poll failed: {str(e)}")
+                self.close()
+                return None
+
+        try:
+            return poll_until(check, deadline)
+        finally:
+            self.close()
+
+
+class FileCodeProvider(CodeProvider):
+    """Reads the code from a file or named pipe that another process writes to
+
+    A regular file only counts once it has been modified after the login
+    started, and it is emptied after reading so a code is never used twice. A
+    FIFO is opened without blocking and kept open while polling, so writers
+    such as ``echo 123456 > twofa-code`` do not hang.
+    """
+
+    name = 'file'
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.TWOFA_FILE
+        self.fd: Optional[int] = None
+
+    def poll(self, since: float) -> Optional[str]:
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        if stat.S_ISFIFO(info.st_mode):
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return None
+            return extract_code(data.decode('utf-8', 'replace'))
+
+        if info.st_mtime < since:
+            return None
+        with open(self.path) as f:
+            code = extract_code(f.read())
+        if code:
+            open(self.path, 'w').close()
+        return code
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _message_text(message: Message) -> str:
+    parts = []
+    for part in message.walk():
+        if part.get_content_maintype() == 'text':
+            payload = part.get_payload(decode=True) or b''
+            text = payload.decode(part.get_content_charset() or 'utf-8', 'replace')
+            parts.append(re.sub(r'<[^>]+>', ' ', text) if part.get_content_subtype() == 'html' else text)
+    return '\n'.join(parts)
+
+
+def _sent_before(message: Message, cutoff: float) -> bool:
+    """Whether the Date header is older than ``cutoff``; a missing or malformed date is accepted"""
+    sent = message.get('Date')
+    if not sent:
+        return False
+    try:
+        return parsedate_to_datetime(sent).timestamp() < cutoff
+    except (TypeError, ValueError):
+        logger.debug(f"Unparseable Date header on 2FA mail: {sent!r}")
+        return False
+
+
+class ImapCodeProvider(CodeProvider):
+    """Polls a mailbox for the registry's unread code e-mail
+
+    One IMAP connection is kept open while waiting; each poll sends NOOP so
+    the server reports new mail, then searches unread messages from
+    ``TWOFA_SENDER``. Messages dated before the login started are ignored.
+    """
+
+    name = 'imap'
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, username: Optional[str] = None,
+                 password: Optional[str] = None, use_ssl: Optional[bool] = None, folder: Optional[str] = None,
+                 sender: Optional[str] = None):
+        self.host = host or Config.TWOFA_IMAP_HOST
+        self.port = port or Config.TWOFA_IMAP_PORT
+        self.username = username or Config.TWOFA_IMAP_USERNAME
+        self.password = password or Config.TWOFA_IMAP_PASSWORD
+        self.use_ssl = Config.TWOFA_IMAP_SSL if use_ssl is None else use_ssl
+        self.folder = folder or Config.TWOFA_IMAP_FOLDER
+        self.sender = Config.TWOFA_SENDER if sender is None else sender
+        self.conn: Optional[imaplib.IMAP4] = None
+
+    def _connect(self) -> imaplib.IMAP4:
+        conn = (imaplib.IMAP4_SSL if self.use_ssl else imaplib.IMAP4)(self.host, self.port)
+        conn.login(self.username, self.password)
+        conn.select(self.folder)
+        return conn
+
+    def poll(self, since: float) -> Optional[str]:
+        if self.conn is None:
+            self.conn = self._connect()
+        else:
+            self.conn.noop()
+
+        day = time.gmtime(since - CLOCK_SKEW)
+        criteria = ['UNSEEN', 'SINCE', f"{day.tm_mday:02d}-{MONTHS[day.tm_mon - 1]}-{day.tm_year}"]
+        if self.sender:
+            criteria += ['FROM', f'"{self.sender}"']
+        status, data = self.conn.search(None, *criteria)
+        if status != 'OK':
+            return None
+
+        for message_id in reversed(data[0].split()):  # newest first
+            # PEEK leaves \Seen alone, so mail that is not the code stays unread for its owner
+            status, parts = self.conn.fetch(message_id, '(BODY.PEEK[])')
+            if status != 'OK' or not parts or not isinstance(parts[0], tuple):
+                continue
+            message = email.message_from_bytes(parts[0][1])
+            if _sent_before(message, since - CLOCK_SKEW):
+                continue
+            code = extract_code(_message_text(message))
+            if code:
+                self.conn.store(message_id, '+FLAGS', '\\Seen')  # a used code is not picked up again
+                return code
+        return None
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.logout()
+            except Exception:
+                pass
+            self.conn = None
+
+
+PROVIDERS = {
+    'file': FileCodeProvider,
+    'imap': ImapCodeProvider,
+}
+
+
+def provider_from_config() -> Optional[CodeProvider]:
+    """The provider named by TWOFA_PROVIDER, or None when unset or unknown"""
+    if not Config.TWOFA_PROVIDER:
+        return None
+    provider = PROVIDERS.get(Config.TWOFA_PROVIDER)
+    if provider is None:
+        logger.error(f"Unknown TWOFA_PROVIDER '{Config.TWOFA_PROVIDER}' (expected one of {', '.join(PROVIDERS)})")
+        return None
+    return provider()
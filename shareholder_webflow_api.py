@@ -1,124 +1,391 @@
-import requests
 import logging
-from typing import List, Dict, Optional
+import os
+from contextlib import nullcontext
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from shareholder_analytics import item_analytics
 from shareholder_config import Config
+from shareholder_http import WebflowTransport
+from shareholder_journal import SyncJournal
+from shareholder_metrics import metrics
+from shareholder_mirror import collection_mirror
+from shareholder_records import ShareholderRecord
+from shareholder_tracing import in_phase
+from shareholder_sync import SyncPlan, SyncResult, build_item_fields, fields_hash, plan_sync
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Webflow caps list pages and bulk deletes at 100 items
+PAGE_SIZE = 100
+
 class WebflowAPI:
-    def __init__(self):
-        self.base_url = "https://api.webflow.com"
-        self.headers = {
-            'Authorization': f'Bearer {Config.WEBFLOW_API_TOKEN}',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        }
+    def __init__(self, collection_id: Optional[str] = None, transport: Optional[WebflowTransport] = None):
+        self.base_url = Config.WEBFLOW_BASE_URL
+        self.collection_id = collection_id or Config.WEBFLOW_COLLECTION_ID
+        # Share one transport between collections to share its connections and rate limit
+        self.transport = transport or WebflowTransport(Config.WEBFLOW_API_TOKEN, self.base_url)
+        self.last_sync_result: Optional[SyncResult] = None
+    
+    @in_phase('webflow.list')
+    def list_items(self) -> List[Dict]:
+        """Fetch every item in the shareholder collection
+
+        The first page gives the total; the remaining pages are then fetched in
+        parallel on the transport's worker pool.
+        """
+        first = self.list_page(0)
+        items = first.get('items', [])
+        total = first.get('total', 0)
+        if not items or len(items) >= total:
+            return items
+        
+        for page in self.transport.map(self.list_page, range(len(items), total, PAGE_SIZE)):
+            items.extend(page.get('items', []))
+        return items
+    
+    @in_phase('webflow.list')
+    def list_page(self, offset: int) -> Dict:
+        """One page of collection items, starting at ``offset``"""
+        response = self.transport.get(f"/collections/{self.collection_id}/items",
+                                      params={'offset': offset, 'limit': PAGE_SIZE})
+        response.raise_for_status()
+        return response.json()
+    
+    @in_phase('webflow.list')
+    def collection_info(self, etag: Optional[str] = None) -> Optional[Dict]:
+        """Collection metadata (with ``lastUpdated``), or None if it still matches ``etag``"""
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.transport.get(f"/collections/{self.collection_id}", headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        info = response.json()
+        info['etag'] = response.headers.get('ETag')
+        return info
+    
+    @in_phase('webflow.delete')
+    def delete_item(self, item_id: str) -> bool:
+        """Delete a single collection item"""
+        response = self.transport.delete(f"/collections/{self.collection_id}/items/{item_id}")
+        if response.status_code == 200:
+            return True
+        logger.warning(f"Failed to delete item {item_id}: {response.status_code}")
+        return False
+    
+    @in_phase('webflow.delete')
+    def delete_items(self, item_ids: List[str]) -> int:
+        """Delete items in bulk, falling back to one request per item; returns the number deleted"""
+        path = f"/collections/{self.collection_id}/items"
+        deleted = 0
+        for start in range(0, len(item_ids), PAGE_SIZE):
+            chunk = item_ids[start:start + PAGE_SIZE]
+            response = self.transport.delete(path, json={'itemIds': chunk})
+            if response.status_code == 200:
+                deleted += len(chunk)
+                logger.info(f"Deleted {len(chunk)} items in bulk")
+                continue
+            
+            logger.warning(f"Bulk delete failed ({response.status_code}), deleting items one by one")
+            deleted += sum(self.transport.map(self.delete_item, chunk))
+        return deleted
     
     def clear_existing_items(self) -> bool:
         """Clear existing shareholder items from Webflow collection"""
         try:
-            # Get existing items
-            url = f"{self.base_url}/collections/{Config.WEBFLOW_COLLECTION_ID}/items"
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            existing_items = response.json().get('items', [])
+            existing_items = self.list_items()
             logger.info(f"Found {len(existing_items)} existing items to clear")
             
-            # Delete each existing item
-            for item in existing_items:
-                delete_url = f"{self.base_url}/collections/{Config.WEBFLOW_COLLECTION_ID}/items/{item['_id']}"
-                delete_response = requests.delete(delete_url, headers=self.headers)
-                if delete_response.status_code == 200:
-                    logger.info(f"Deleted item: {item.get('name', item['_id'])}")
-                else:
-                    logger.warning(f"Failed to delete item {item['_id']}: {delete_response.status_code}")
-            
-            return True
+            item_ids = [item['_id'] for item in existing_items]
+            deleted = self.delete_items(item_ids)
+            if Config.WEBFLOW_MIRROR:
+                collection_mirror(self.collection_id).invalidate()
+            return deleted == len(item_ids)
             
         except Exception as e:
             logger.error(f"Error clearing existing items: {str(e)}")
             return False
     
-    def create_shareholder_item(self, shareholder_data: Dict[str, str]) -> Optional[str]:
-        """Create a single shareholder item in Webflow"""
+    @in_phase('webflow.create')
+    def create_item(self, fields: Dict) -> Optional[str]:
+        """Create a collection item from prepared Webflow fields"""
         try:
-            url = f"{self.base_url}/collections/{Config.WEBFLOW_COLLECTION_ID}/items"
-            
-            # Map scraper data to Webflow fields
-            # Note: You'll need to adjust these field names to match your Webflow collection schema
-            webflow_data = {
-                'fields': {
-                    'name': f"{shareholder_data.get('surname_company', '')} {shareholder_data.get('first_name', '')}".strip(),
-                    'surname-company': shareholder_data.get('surname_company', ''),
-                    'first-name': shareholder_data.get('first_name', ''),
-                    'holdings': shareholder_data.get('holdings', ''),
-                    'percentage': shareholder_data.get('percent', ''),
-                    'rank': int(shareholder_data.get('rank', 0)),
-                    'slug': f"shareholder-{shareholder_data.get('rank', 0)}"  # Auto-generate slug
-                }
-            }
-            
-            response = requests.post(url, json=webflow_data, headers=self.headers)
+            response = self.transport.post(f"/collections/{self.collection_id}/items", json={'fields': fields})
             response.raise_for_status()
             
-            result = response.json()
-            item_id = result.get('_id')
-            
-            logger.info(f"Created Webflow item for {webflow_data['fields']['name']}: {item_id}")
+            item_id = response.json().get('_id')
+            logger.debug("Created Webflow item for %s: %s", fields['name'], item_id)
             return item_id
             
         except Exception as e:
-            logger.error(f"Error creating Webflow item for {shareholder_data}: {str(e)}")
+            logger.error(f"Error creating Webflow item for {fields.get('name')}: {str(e)}")
             return None
     
+    @in_phase('webflow.update')
+    def update_item(self, item_id: str, fields: Dict) -> bool:
+        """Patch the scraper-managed fields of an existing item"""
+        try:
+            response = self.transport.patch(f"/collections/{self.collection_id}/items/{item_id}", json={'fields': fields})
+            response.raise_for_status()
+            
+            logger.debug("Updated Webflow item for %s: %s", fields['name'], item_id)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating Webflow item {item_id}: {str(e)}")
+            return False
+    
+    def create_shareholder_item(self, shareholder_data: ShareholderRecord, identity: str,
+                                derived: Optional[Dict] = None) -> Optional[str]:
+        """Create a single shareholder item in Webflow
+
+        ``identity`` must come from ``assign_identities`` over the whole table, as
+        ``plan_sync`` does: a repeated name only gets its ``#n`` counter there.
+        """
+        return self.create_item(build_item_fields(shareholder_data, identity, derived))
+    
+    def site_domains(self, site_id: str) -> List[str]:
+        """Custom domains of the site, used when WEBFLOW_DOMAINS is not set"""
+        response = self.transport.get(f"/sites/{site_id}/domains")
+        response.raise_for_status()
+        return [domain['name'] for domain in response.json()]
+    
+    @in_phase('webflow.publish')
     def publish_site(self) -> bool:
         """Publish the Webflow site to make changes live"""
         try:
-            # Note: You'll need to get your site ID from Webflow
-            # This is just a placeholder - you'll need to provide the actual site ID
-            site_id = "YOUR_SITE_ID"  # Replace with actual site ID
+            site_id = Config.WEBFLOW_SITE_ID
+            if not site_id:
+                logger.warning("WEBFLOW_SITE_ID is not set - skipping site publish")
+                return False
+            
+            domains = Config.WEBFLOW_DOMAINS or self.site_domains(site_id)
+            if not domains:
+                logger.error("No domains to publish to - set WEBFLOW_DOMAINS")
+                return False
             
-            url = f"{self.base_url}/sites/{site_id}/publish"
             publish_data = {
-                'domains': ['your-domain.com']  # Replace with your actual domain
+                'domains': domains
             }
             
-            response = requests.post(url, json=publish_data, headers=self.headers)
+            response = self.transport.post(f"/sites/{site_id}/publish", json=publish_data)
             response.raise_for_status()
             
-            logger.info("Site published successfully")
+            logger.info(f"Site published successfully to {', '.join(domains)}")
             return True
             
         except Exception as e:
             logger.error(f"Error publishing site: {str(e)}")
             return False
     
-    def update_shareholders(self, shareholders_data: List[Dict[str, str]]) -> bool:
-        """Update all shareholder data in Webflow"""
+    def write_plan(self, plan: SyncPlan, journal: Optional[SyncJournal] = None) -> Tuple[SyncResult, List]:
+        """Carry out a sync plan, acknowledging each finished operation in ``journal``
+
+        Returns the result and the new item IDs (None where a create failed).
+        """
+        result = SyncResult()
+        result.unchanged = plan.unchanged
+        
+        def update(update: Tuple[str, Dict]) -> bool:
+            ok = self.update_item(*update)
+            if ok and journal:
+                journal.ack('update', [update[0]])
+            return ok
+        
+        def create(fields: Dict) -> Optional[str]:
+            item_id = self.create_item(fields)
+            if item_id and journal:
+                journal.ack('create', [fields['slug']], {fields['slug']: item_id})
+            return item_id
+        
+        # Write new and changed rows before deleting, so the collection is never empty.
+        # Item writes are independent, so they run on the transport's worker pool.
+        result.updated = sum(self.transport.map(update, plan.updates))
+        created = self.transport.map(create, plan.creates)
+        result.created = sum(1 for item_id in created if item_id)
+        result.failed = (len(plan.updates) - result.updated) + (len(plan.creates) - result.created)
+        
+        if plan.deletes:
+            result.deleted = self.delete_items(plan.deletes)
+            result.failed += len(plan.deletes) - result.deleted
+            if journal and result.deleted == len(plan.deletes):
+                journal.ack('delete', plan.deletes)
+        return result, created
+    
+    def sync_shareholders(self, shareholders_data: List[ShareholderRecord],
+                          existing_items: Optional[List[Dict]] = None, orgnr: Optional[str] = None,
+                          validators: Optional[Dict] = None) -> SyncResult:
+        """Bring the collection in line with the scraped table using only the needed operations
+
+        ``existing_items`` may hold a listing fetched ahead of time. Otherwise the
+        collection mirror is refreshed (or, with WEBFLOW_MIRROR off, the
+        collection is listed) first. With WEBFLOW_ANALYTICS on, each item also
+        gets its change since the issuer's previous snapshot in the history
+        (needs ``orgnr``). With SYNC_JOURNAL on, the plan is journaled
+        before the first write; ``orgnr`` and the page ``validators`` go with it so
+        ``--resume`` can record the sync once it finishes.
+        """
+        mirror = collection_mirror(self.collection_id) if Config.WEBFLOW_MIRROR else None
+        derived = item_analytics(orgnr, shareholders_data) if Config.WEBFLOW_ANALYTICS and orgnr else None
+        if existing_items is not None:
+            plan = plan_sync(existing_items, shareholders_data, derived=derived)
+        elif mirror is not None:
+            mirror.refresh(self)
+            plan = plan_sync(None, shareholders_data, mirror.identity_index(), derived)
+        else:
+            plan = plan_sync(self.list_items(), shareholders_data, derived=derived)
+        logger.info(f"Sync plan: {plan}")
+        journal = None
+        if Config.SYNC_JOURNAL and not plan.is_empty():
+            journal = SyncJournal.begin(self.collection_id, shareholders_data, plan, orgnr, validators)
+        
+        with journal or nullcontext():
+            result, created = self.write_plan(plan, journal)
+            if journal:
+                if result.ok:
+                    journal.complete()
+                else:
+                    logger.error(f"{result.failed} Webflow operation(s) failed; "
+                                 f"run 'shareholder_main.py --resume' to finish this sync without re-scraping")
+        
+        for outcome, count in result.as_dict().items():
+            metrics.count('webflow_items_total', count, outcome=outcome)
+        if mirror is not None and result.changed:
+            if result.ok and existing_items is None:
+                mirror.record_writes(self, plan.updates, list(zip(created, plan.creates)), plan.deletes)
+            else:
+                # Not sure what the collection looks like now; list it again next time
+                mirror.invalidate()
+        return result
+    
+    def update_shareholders(self, shareholders_data: List[ShareholderRecord],
+                            existing_items: Optional[List[Dict]] = None,
+                            publisher: Optional['SitePublisher'] = None, orgnr: Optional[str] = None,
+                            validators: Optional[Dict] = None) -> bool:
+        """Update all shareholder data in Webflow
+
+        If items changed, the site is published right away, or, when a shared
+        ``publisher`` is given, once when the caller flushes it. The return value
+        reflects the sync only; a failed publish stays owed until a later flush.
+        """
         try:
             logger.info("Starting Webflow update process")
             
-            # Clear existing items
-            if not self.clear_existing_items():
-                logger.error("Failed to clear existing items")
-                return False
+            result = self.sync_shareholders(shareholders_data, existing_items, orgnr, validators)
+            self.last_sync_result = result
+            logger.info(f"Webflow sync finished: {result}")
+            
+            if result.changed:
+                if publisher is None:
+                    SitePublisher(self.transport).mark_changed(self.collection_id, flush=True)
+                else:
+                    publisher.mark_changed(self.collection_id)
+            
+            return result.ok
             
-            # Create new items
-            created_count = 0
-            for shareholder in shareholders_data:
-                item_id = self.create_shareholder_item(shareholder)
-                if item_id:
-                    created_count += 1
+        except Exception as e:
+            logger.error(f"Error updating shareholders in Webflow: {str(e)}")
+            return False
+    
+    def resume_sync(self, journal: SyncJournal, publisher: Optional['SitePublisher'] = None) -> bool:
+        """Finish an interrupted sync from its journal, without scraping again
+
+        Outstanding operations are checked against the collection as it is now,
+        so an operation that went through without being acknowledged (the
+        process died in between) is not repeated: a create whose slug already
+        exists becomes an update, or nothing if the item already matches.
+        """
+        outstanding = journal.outstanding()
+        logger.info(f"Resuming sync of {self.collection_id} started at "
+                    f"{datetime.fromtimestamp(journal.started):%Y-%m-%d %H:%M:%S}: "
+                    f"{len(outstanding)} of {len(journal.operations)} operations outstanding")
+        try:
+            if Config.WEBFLOW_MIRROR:
+                mirror = collection_mirror(self.collection_id)
+                mirror.refresh(self, force=True)
+                by_id, by_slug = mirror.get, mirror.find_slug
+            else:
+                items = self.list_items()
+                by_id = {item['_id']: item for item in items}.get
+                by_slug = {item.get('slug'): item for item in items}.get
             
-            logger.info(f"Created {created_count} out of {len(shareholders_data)} shareholder items")
+            plan = SyncPlan()
+            for op in outstanding:
+                fields = op.get('fields')
+                item = by_slug(fields['slug']) if op['op'] == 'create' else by_id(op['item_id'])
+                if op['op'] == 'delete':
+                    if item is not None:
+                        plan.deletes.append(op['item_id'])
+                elif item is None:
+                    plan.creates.append(fields)
+                elif fields_hash(item) != fields_hash(fields):
+                    plan.updates.append((item['_id'], fields))
+                else:
+                    plan.unchanged += 1
+            logger.info(f"Resume plan: {plan}")
             
-            # Publish site (optional - you may want to do this manually)
-            # self.publish_site()
+            result, _ = self.write_plan(plan, journal)
+            self.last_sync_result = result
+            logger.info(f"Resumed sync finished: {result}")
+            if Config.WEBFLOW_MIRROR and result.changed:
+                collection_mirror(self.collection_id).invalidate()
+            if not result.ok:
+                journal.close()
+                return False
             
-            return created_count == len(shareholders_data)
+            # The interrupted run changed the collection but never got to publish it
+            (publisher or SitePublisher(self.transport)).mark_changed(self.collection_id, flush=publisher is None)
+            journal.complete()
+            return True
             
         except Exception as e:
-            logger.error(f"Error updating shareholders in Webflow: {str(e)}")
-            return False
\ No newline at end of file
+            logger.error(f"Error resuming sync of {self.collection_id}: {str(e)}")
+            journal.close()
+            return False
+
+
+class SitePublisher:
+    """Coalesces site publishes: any number of changed collections, one publish per flush
+
+    Publishing is enabled by WEBFLOW_SITE_ID. A marker file in the state
+    directory records that a publish is owed, so a publish that fails (or a
+    run that dies before flushing) is retried by the next run even when that
+    run finds nothing new to sync.
+    """
+
+    def __init__(self, transport: Optional[WebflowTransport] = None, path: Optional[str] = None):
+        self.transport = transport
+        self.path = path or Config.PUBLISH_PENDING_PATH
+        self.enabled = bool(Config.WEBFLOW_SITE_ID)
+        self.changed: List[str] = []
+
+    @property
+    def pending(self) -> bool:
+        return self.enabled and (bool(self.changed) or os.path.exists(self.path))
+
+    def mark_changed(self, collection_id: str, flush: bool = False):
+        if not self.enabled:
+            return
+        self.changed.append(collection_id)
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w') as f:
+                f.write('\n'.join(self.changed))
+        except OSError as e:
+            logger.warning(f"Could not record pending publish: {str(e)}")
+        if flush:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Publish once if anything changed since the last successful publish; True if nothing is owed"""
+        if not self.pending:
+            return True
+        reason = f"{len(self.changed)} changed collection(s)" if self.changed else "a publish left over from an earlier run"
+        logger.info(f"Publishing site for {reason}")
+        if not WebflowAPI(transport=self.transport).publish_site():
+            return False
+        self.changed = []
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        return True
@@ -0,0 +1,54 @@
+import json
+import pytest
+from registry_pages import make_rows
+from conftest import ORGNR
+from shareholder_batch import BatchScraper, load_manifest
+from shareholder_config import Config
+from shareholder_main import EXIT_FAILURE, main
+
+LOGIN = 'POST /login/'
+OTHERS = ['912345670', '923456781']
+UNKNOWN = '999999999'  # not in the registry, so its page is a 404
+
+
+@pytest.fixture
+def issuers(registry):
+    for orgnr in OTHERS:
+        registry.registers[orgnr] = make_rows(30, seed=int(orgnr) % 1000)
+    registry.latency = 0.05
+    return registry
+
+
+def test_batch_logs_in_once_and_keeps_going_past_a_failure(issuers):
+    companies = dict.fromkeys([OTHERS[0], UNKNOWN, ORGNR, OTHERS[1]])
+    results = BatchScraper(max_workers=3).scrape(companies)
+
+    assert issuers.stats.by_route[LOGIN] == 1
+    assert [result.orgnr for result in results] == list(companies)
+    failed, = [result for result in results if not result.ok]
+    assert failed.orgnr == UNKNOWN and '404' in failed.error
+    assert [len(result.shareholders) for result in results if result.ok] == [Config.MAX_SHAREHOLDERS] * 3
+    assert all(result.elapsed >= 0.05 for result in results)
+
+
+def test_manifest_run_syncs_the_others_and_writes_timings(issuers, webflow, tmp_path):
+    manifest = {OTHERS[1]: 'collection-b', UNKNOWN: 'collection-x', ORGNR: {'collection_id': 'collection-a'},
+                OTHERS[0]: None}
+    (tmp_path / 'manifest.json').write_text(json.dumps(manifest))
+    assert main(['--manifest', 'manifest.json', '--output', 'results.json']) == EXIT_FAILURE
+
+    assert issuers.stats.by_route[LOGIN] == 1
+    results = json.loads((tmp_path / 'results.json').read_text())
+    assert [result['orgnr'] for result in results] == list(manifest)
+    by_orgnr = {result['orgnr']: result for result in results}
+    assert '404' in by_orgnr[UNKNOWN]['error'] and by_orgnr[UNKNOWN]['shareholders'] == []
+    assert all(result['elapsed'] > 0 for result in results)
+    assert by_orgnr[OTHERS[0]]['error'] is None and by_orgnr[OTHERS[0]]['collection_id'] is None
+    # The failure did not stop the other issuers reaching their collections
+    assert sorted(webflow.collections) == ['collection-a', 'collection-b']
+
+
+def test_load_manifest_accepts_both_forms(tmp_path):
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps({985279721: 'plain', '912345670': {'collection_id': 'nested'}, '923456781': None}))
+    assert load_manifest(str(path)) == {ORGNR: 'plain', '912345670': 'nested', '923456781': None}
@@ -0,0 +1,66 @@
+import gzip
+import os
+import shutil
+import pytest
+import requests
+import shareholder_cassette
+import shareholder_mirror
+from conftest import COLLECTION_ID
+from shareholder_cassette import CassetteMiss, install
+from shareholder_config import Config
+from shareholder_main import EXIT_SUCCESS, main
+
+
+@pytest.fixture
+def cassette(registry, webflow, state, monkeypatch):
+    """Cassette path in the state directory, with credentials long enough to be scrubbed"""
+    monkeypatch.setattr(shareholder_cassette, '_cassette', None)
+    monkeypatch.setattr(Config, 'CASSETTE_PATH', str(state / 'cassettes' / 'run.json.gz'))
+    registry.username, registry.password = 'registry-user', 'correct-horse-battery'
+    monkeypatch.setattr(Config, 'REGISTRY_USERNAME', registry.username)
+    monkeypatch.setattr(Config, 'REGISTRY_PASSWORD', registry.password)
+    monkeypatch.setattr(Config, 'WEBFLOW_API_TOKEN', 'webflow-secret-token')
+    return Config.CASSETTE_PATH
+
+
+def switch_to_replay(state, monkeypatch):
+    """Save the recording and start over as a new process would, keeping only the cassette"""
+    shareholder_cassette._cassette.save()
+    for entry in os.listdir(state):
+        if entry != 'cassettes':
+            path = os.path.join(state, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    monkeypatch.setattr(shareholder_cassette, '_cassette', None)
+    monkeypatch.setattr(shareholder_mirror, '_mirrors', {})
+    monkeypatch.setattr(Config, 'CASSETTE_MODE', 'replay')
+
+
+def test_recorded_run_replays_without_the_network(cassette, registry, webflow, state, monkeypatch):
+    monkeypatch.setattr(Config, 'CASSETTE_MODE', 'record')
+    assert main([]) == EXIT_SUCCESS
+    recorded = dict(webflow.collections[COLLECTION_ID])
+
+    switch_to_replay(state, monkeypatch)
+    with gzip.open(cassette, 'rt', encoding='utf-8') as f:
+        text = f.read()
+    for secret in [registry.username, registry.password, Config.WEBFLOW_API_TOKEN, *registry.sessions]:
+        assert secret not in text
+    assert '[scrubbed]' in text  # the session cookie, kept by name only
+
+    registry.stats.reset()
+    webflow.stats.reset()
+    assert main([]) == EXIT_SUCCESS
+    assert registry.stats.requests == 0 and webflow.stats.requests == 0
+    assert webflow.collections[COLLECTION_ID] == recorded
+
+
+def test_unrecorded_request_is_a_miss(cassette, monkeypatch):
+    monkeypatch.setattr(Config, 'CASSETTE_MODE', 'replay')
+    shareholder_cassette.Cassette(cassette).save()  # an empty recording
+    session = requests.Session()
+    assert install(session, 'webflow') == 'replay'
+    with pytest.raises(CassetteMiss):
+        session.get(f'{Config.WEBFLOW_BASE_URL}/collections/{COLLECTION_ID}')
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+import pytest
+from conftest import COLLECTION_ID, ORGNR
+from shareholder_daemon import AdaptiveSchedule, Daemon, parse_windows
+
+LOGIN = 'POST /login/'
+
+
+def at(hour, minute=0):
+    return datetime(2024, 3, 4, hour, minute, tzinfo=timezone.utc)
+
+
+def schedule(hot_windows='', min_interval=60, max_interval=300):
+    return AdaptiveSchedule(min_interval, max_interval, backoff=2, hot_windows=hot_windows, jitter=0)
+
+
+def test_parse_windows():
+    assert parse_windows('05:00-09:00, 15:30-16:30') == [(300, 540), (930, 990)]
+    assert parse_windows('') == []
+
+
+def test_quiet_cycles_back_off_up_to_the_cap():
+    quiet = schedule()
+    assert [quiet.next_delay(False, at(12)) for _ in range(4)] == [120, 240, 300, 300]
+
+
+def test_change_resets_the_interval():
+    quiet = schedule()
+    quiet.next_delay(False, at(12))
+    quiet.next_delay(False, at(12))
+    assert quiet.next_delay(True, at(12)) == 60
+    assert quiet.next_delay(False, at(12)) == 120
+
+
+def test_hot_window_keeps_the_minimum_interval():
+    hot = schedule('06:00-08:00')
+    assert hot.next_delay(False, at(5)) == 120
+    assert [hot.next_delay(False, at(7)) for _ in range(3)] == [60, 60, 60]
+    assert hot.next_delay(False, at(8)) == 120  # the window's end is exclusive
+
+
+@pytest.mark.parametrize('hour,minute,inside', [
+    (22, 59, False), (23, 0, True), (23, 30, True), (0, 30, True), (0, 59, True), (1, 0, False), (12, 0, False),
+])
+def test_window_wrapping_midnight(hour, minute, inside):
+    assert schedule('23:00-01:00').in_hot_window(at(hour, minute)) is inside
+
+
+def test_seconds_to_next_window():
+    windows = schedule('23:00-01:00, 06:00-08:00')
+    assert windows.seconds_to_next_window(at(22)) == 3600
+    assert windows.seconds_to_next_window(at(23, 30)) == 6.5 * 3600  # tomorrow's 06:00
+    assert windows.seconds_to_next_window(at(5, 59)) == 60
+    assert schedule().seconds_to_next_window(at(12)) is None
+
+
+def test_long_sleep_ends_when_a_window_opens():
+    quiet = schedule('23:00-01:00', max_interval=7200)
+    for _ in range(5):
+        quiet.next_delay(False, at(12))
+    assert quiet.interval == 1920
+    assert quiet.next_delay(False, at(22, 50)) == 600
+    assert quiet.next_delay(False, at(22, 59)) == 60
+    assert quiet.interval == 7200  # the interval keeps growing; only this sleep is cut short
+
+
+def test_cycle_with_nothing_scraped_logs_in_again(registry, webflow, caplog):
+    daemon = Daemon({ORGNR: COLLECTION_ID}, schedule=schedule())
+    assert daemon.run_cycle()
+    assert registry.stats.by_route[LOGIN] == 1
+
+    registry.sessions.clear()  # the registry session expired while the daemon slept
+    assert not daemon.run_cycle()  # scraped again, but nothing changed
+    assert 'No issuer could be scraped' in caplog.text
+    assert registry.stats.by_route[LOGIN] == 2
+    assert daemon.scraper.authenticated
+    daemon.transport.close()
@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from conftest import COLLECTION_ID, ORGNR
+from shareholder_config import Config
+from shareholder_fingerprint import FingerprintStore
+from shareholder_history import HistoryStore
+from shareholder_records import ShareholderRecord
+from shareholder_sinks import Snapshot, WebflowSink
+
+
+def make_records(count=20):
+    return [ShareholderRecord(rank, f'HOLDER {rank} AS', '', 1000 * (count + 1 - rank), Decimal('1.25'))
+            for rank in range(1, count + 1)]
+
+
+def days_ago(days):
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def test_unchanged_register_is_synced_again_when_the_comparison_snapshot_moves(webflow, monkeypatch):
+    monkeypatch.setattr(Config, 'WEBFLOW_ANALYTICS', True)
+    records = make_records()
+    store = HistoryStore()
+    store.record_snapshot(ORGNR, records, days_ago(3))
+    sink = WebflowSink(FingerprintStore())
+    snapshot = Snapshot.of(ORGNR, records, COLLECTION_ID)
+
+    assert sink.deliver(snapshot)
+    assert sink.deliver(snapshot)
+    assert (sink.synced, sink.unchanged) == (1, 1)
+
+    # A day later the change fields compare against a newer snapshot, so they must be rewritten
+    store.record_snapshot(ORGNR, records, days_ago(1))
+    store.close()
+    assert sink.deliver(snapshot)
+    assert (sink.synced, sink.unchanged) == (2, 1)
+    assert FingerprintStore().get(ORGNR)['basis'] == days_ago(1)
+
+
+def test_comparison_snapshot_is_ignored_without_analytics(webflow):
+    records = make_records()
+    store = HistoryStore()
+    store.record_snapshot(ORGNR, records, days_ago(3))
+    sink = WebflowSink(FingerprintStore())
+    snapshot = Snapshot.of(ORGNR, records, COLLECTION_ID)
+    assert sink.deliver(snapshot)
+    store.record_snapshot(ORGNR, records, days_ago(1))
+    store.close()
+    assert sink.deliver(snapshot)
+    assert (sink.synced, sink.unchanged) == (1, 1)
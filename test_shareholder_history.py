@@ -0,0 +1,78 @@
+import json
+from decimal import Decimal
+import pytest
+from conftest import ORGNR
+from shareholder_config import Config
+from shareholder_history import HistoryStore, main, record_history
+from shareholder_records import ShareholderRecord
+
+
+def record(rank, name, holdings, percent='1.0000', first=''):
+    return ShareholderRecord(rank, name, first, holdings, Decimal(percent))
+
+
+JANUARY = [record(1, 'ALPHA AS', 5000, '50.1234'), record(2, 'NOMINEE BANK', 3000, '30.0000'),
+           record(3, 'NOMINEE BANK', 1000, '10.0000'), record(4, 'HANSEN', 900, '9.0000', first='KARI')]
+FEBRUARY = [record(1, 'ALPHA AS', 5200, '52.0000'), record(2, 'NOMINEE BANK', 3000, '30.0000'),
+            record(3, 'BETA ASA', 1800, '18.0000')]
+
+
+@pytest.fixture
+def store(state):
+    store = HistoryStore()
+    store.record_snapshot(ORGNR, JANUARY, '2024-01-31')
+    store.record_snapshot(ORGNR, FEBRUARY, '2024-02-29')
+    yield store
+    store.close()
+
+
+def test_snapshot_round_trips_with_full_precision(store):
+    assert store.snapshot(ORGNR, '2024-01-31') == ('2024-01-31', JANUARY)
+    assert store.latest_snapshot(ORGNR) == ('2024-02-29', FEBRUARY)
+    assert store.snapshot('000000000') == (None, [])
+
+
+def test_snapshot_on_or_before_a_date(store):
+    assert store.snapshot(ORGNR, '2024-02-15')[0] == '2024-01-31'
+    assert store.snapshot_date(ORGNR, '2024-01-01') is None
+    assert store.snapshot_dates(ORGNR) == ['2024-01-31', '2024-02-29']
+
+
+def test_a_second_scrape_the_same_day_replaces_the_first(store):
+    store.record_snapshot(ORGNR, FEBRUARY[:1], '2024-02-29')
+    assert store.snapshot_dates(ORGNR) == ['2024-01-31', '2024-02-29']
+    assert store.latest_snapshot(ORGNR)[1] == FEBRUARY[:1]
+
+
+def test_changes_between_snapshots(store):
+    changes = {(c.surname_company, c.old_rank, c.new_rank): (c.status, c.delta)
+               for c in store.changes(ORGNR, '2024-01-31', '2024-02-29')}
+    assert changes == {
+        ('BETA ASA', None, 3): ('new', 1800),
+        # The second nominee account (by occurrence) closed; the first is unchanged
+        ('NOMINEE BANK', 3, None): ('exited', -1000),
+        ('HANSEN', 4, None): ('exited', -900),
+        ('ALPHA AS', 1, 1): ('changed', 200),
+    }
+    deltas = [abs(c.delta) for c in store.changes(ORGNR, '2024-01-31', '2024-02-29')]
+    assert deltas == sorted(deltas, reverse=True)
+
+
+def test_holder_history(store):
+    history = store.holder_history(ORGNR, 'ALPHA AS')
+    assert [(e.snapshot_date, e.holdings, e.percent) for e in history] == [
+        ('2024-01-31', 5000, Decimal('50.1234')), ('2024-02-29', 5200, Decimal('52.0000'))]
+    assert [e.rank for e in store.holder_history(ORGNR, 'HANSEN', 'KARI')] == [4]
+
+
+def test_record_history_never_fails_the_run(state, monkeypatch, caplog):
+    (state / 'blocked').write_text('a file, not a directory')
+    monkeypatch.setattr(Config, 'HISTORY_DB_PATH', str(state / 'blocked' / 'history.sqlite3'))
+    record_history(ORGNR, JANUARY)
+    assert 'Could not record history snapshot' in caplog.text
+
+
+def test_cli_changes_as_json(store, capsys):
+    assert main(['--orgnr', ORGNR, '--json', 'changes', '2024-01-31', '2024-02-29']) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result[0]['surname_company'] == 'BETA ASA' and result[0]['status'] == 'new'
@@ -0,0 +1,147 @@
+import time
+from email.utils import formatdate
+import pytest
+import shareholder_http
+from standins import StandInServer
+from shareholder_http import TokenBucket, WebflowTransport, retry_after_seconds
+
+
+class Clock:
+    """Stands in for the time module: sleeping only moves the clock forward
+
+    Like a real sleep, every call takes some time, so float rounding in the
+    wait cannot leave the clock where it was.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class ThrottlingServer(StandInServer):
+    """Answers ``status`` with ``retry_after`` for the first ``throttle`` requests, then 200"""
+
+    def __init__(self, throttle, retry_after='0.2', remaining='10', status=429):
+        super().__init__()
+        self.throttle = throttle
+        self.status = status
+        self.retry_after = retry_after
+        self.remaining = remaining
+        self.arrivals = []
+
+    def handle(self, request, body):
+        self.arrivals.append(time.monotonic())
+        if len(self.arrivals) <= self.throttle:
+            return str(self.status), self.status, [('Retry-After', self.retry_after)], b'{}'
+        return '200', 200, [('X-RateLimit-Remaining', self.remaining)], b'{}'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(shareholder_http, 'time', clock)
+    return clock
+
+
+@pytest.mark.parametrize('per_minute,burst', [(60, 10), (60, 1), (10, 50), (600, 100)])
+def test_bucket_never_admits_more_than_the_quota_in_a_minute(clock, per_minute, burst):
+    bucket = TokenBucket(per_minute, burst)
+    admitted = []
+    while clock.now < 1000 + 180:
+        bucket.acquire()
+        admitted.append(clock.now)
+    for start in admitted:
+        in_window = [t for t in admitted if start <= t < start + 60]
+        assert len(in_window) <= per_minute
+    # Nor much below it: the first burst, then the refill rate for three minutes
+    assert len(admitted) >= bucket.capacity + 180 * bucket.rate - 1
+
+
+def test_drain_holds_the_bucket_for_the_given_time(clock):
+    bucket = TokenBucket(60, 10)
+    bucket.drain(5)
+    started = clock.now
+    bucket.acquire()
+    assert clock.now - started >= 6  # five seconds of hold, then one token at one per second
+
+
+@pytest.mark.parametrize('headers,expected', [
+    ({'Retry-After': '7'}, 7.0),
+    ({'Retry-After': '1.5'}, 1.5),
+    ({'Retry-After': '-3'}, 0.0),
+    ({'Retry-After': 'soon'}, 2.0),
+    ({}, 2.0),
+])
+def test_retry_after_seconds(headers, expected):
+    assert retry_after_seconds(Response(headers), default=2.0) == expected
+
+
+def test_retry_after_http_date():
+    date = formatdate(time.time() + 30, usegmt=True)
+    assert retry_after_seconds(Response({'Retry-After': date}), default=2.0) == pytest.approx(30, abs=1.5)
+
+
+def test_transport_waits_for_retry_after_before_retrying(state):
+    server = ThrottlingServer(throttle=1).start()
+    try:
+        transport = WebflowTransport('token', server.url, requests_per_minute=6000, max_workers=1)
+        assert transport.get('/items').status_code == 200
+        first, second = server.arrivals
+        assert second - first >= 0.2
+        transport.close()
+    finally:
+        server.stop()
+
+
+def test_transport_gives_up_after_max_retries(state):
+    server = ThrottlingServer(throttle=10, retry_after='0').start()
+    try:
+        transport = WebflowTransport('token', server.url, requests_per_minute=6000, max_retries=2)
+        assert transport.get('/items').status_code == 429
+        assert len(server.arrivals) == 3
+        transport.close()
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize('status,method,sent', [
+    (429, 'POST', 2),
+    (503, 'GET', 2),
+    (503, 'PATCH', 1),
+    (503, 'POST', 1),
+])
+def test_unavailable_is_only_retried_for_idempotent_methods(state, status, method, sent):
+    # A 503 may come after the item was created, so replaying a POST could duplicate it
+    server = ThrottlingServer(throttle=1, retry_after='0', status=status).start()
+    try:
+        transport = WebflowTransport('token', server.url, requests_per_minute=6000)
+        response = transport.request(method, '/items', json={'name': 'x'})
+        assert len(server.arrivals) == sent
+        assert response.status_code == (200 if sent == 2 else status)
+        transport.close()
+    finally:
+        server.stop()
+
+
+def test_exhausted_quota_header_drains_the_bucket(state):
+    server = ThrottlingServer(throttle=0, remaining='0').start()
+    try:
+        transport = WebflowTransport('token', server.url, requests_per_minute=600)
+        transport.get('/items')
+        assert transport.bucket.tokens < 1
+        transport.close()
+    finally:
+        server.stop()
@@ -0,0 +1,106 @@
+import json
+import os
+from decimal import Decimal
+import pytest
+from conftest import COLLECTION_ID, ORGNR
+from shareholder_fingerprint import FingerprintStore
+from shareholder_journal import SyncJournal
+from shareholder_main import EXIT_SUCCESS, EXIT_UNCHANGED, main
+from shareholder_records import ShareholderRecord
+from shareholder_webflow_api import WebflowAPI
+
+
+def make_records(count=5):
+    return [ShareholderRecord(rank, f'HOLDER {rank} AS', '', 1000 * (count + 1 - rank), Decimal('2.0000'))
+            for rank in range(1, count + 1)]
+
+
+@pytest.fixture
+def journals(monkeypatch):
+    """Every journal a sync begins"""
+    begun = []
+    begin = SyncJournal.begin.__func__
+
+    def recording_begin(cls, *args, **kwargs):
+        begun.append(begin(cls, *args, **kwargs))
+        return begun[-1]
+    monkeypatch.setattr(SyncJournal, 'begin', classmethod(recording_begin))
+    return begun
+
+
+def names(server):
+    return sorted(item['name'] for item in server.collections[COLLECTION_ID].values())
+
+
+def test_failed_writes_are_finished_by_resume(registry, webflow, journals, monkeypatch):
+    create_item = WebflowAPI.create_item
+
+    def flaky_create(api, fields):
+        return None if fields['rank'] == 3 else create_item(api, fields)
+    monkeypatch.setattr(WebflowAPI, 'create_item', flaky_create)
+    records = make_records()
+    result = WebflowAPI().sync_shareholders(records, orgnr=ORGNR)
+    assert (result.created, result.failed) == (4, 1)
+    journal, = journals
+    assert journal.file is None and os.path.exists(journal.path)
+    with SyncJournal.load(journal.path) as saved:
+        assert [op['fields']['rank'] for op in saved.outstanding()] == [3]
+
+    monkeypatch.setattr(WebflowAPI, 'create_item', create_item)
+    webflow.stats.reset()
+    assert main(['--resume']) == EXIT_SUCCESS
+    assert webflow.stats.by_route.get('POST /collections/{id}/items') == 1
+    assert names(webflow) == sorted(record.name for record in records)
+    assert not os.path.exists(journal.path)
+    # The finished sync counts as synced, so the next scrape of the same table is skipped
+    assert FingerprintStore().is_unchanged(ORGNR, records)
+
+
+def test_journal_is_closed_when_the_sync_raises(registry, webflow, journals, monkeypatch):
+    WebflowAPI().sync_shareholders(make_records())
+    delete_items = WebflowAPI.delete_items
+
+    def broken_delete(api, item_ids):
+        raise RuntimeError('connection reset')
+    monkeypatch.setattr(WebflowAPI, 'delete_items', broken_delete)
+    with pytest.raises(RuntimeError):
+        WebflowAPI().sync_shareholders(make_records(3))
+    journal = journals[-1]
+    assert journal.file is None
+    with SyncJournal.load(journal.path) as saved:
+        assert [op['op'] for op in saved.outstanding()] == ['delete', 'delete']
+
+    monkeypatch.setattr(WebflowAPI, 'delete_items', delete_items)
+    assert main(['--resume']) == EXIT_SUCCESS
+    assert names(webflow) == ['HOLDER 1 AS', 'HOLDER 2 AS', 'HOLDER 3 AS']
+
+
+def test_unacknowledged_create_is_not_repeated(registry, webflow, journals):
+    # The process died after Webflow created the items but before the journal said so
+    WebflowAPI().sync_shareholders(make_records())
+    journal = SyncJournal.begin(COLLECTION_ID, make_records(), type('Plan', (), {
+        'updates': [], 'deletes': [],
+        'creates': [dict(item) for item in webflow.collections[COLLECTION_ID].values()]})())
+    journal.close()
+    webflow.stats.reset()
+    assert main(['--resume']) == EXIT_SUCCESS
+    assert 'POST /collections/{id}/items' not in webflow.stats.by_route
+    assert len(webflow.collections[COLLECTION_ID]) == 5
+
+
+def test_torn_last_line_is_ignored(state):
+    journal = SyncJournal(SyncJournal.path_for(COLLECTION_ID), COLLECTION_ID, make_records(1),
+                          [{'op': 'delete', 'item_id': 'a'}, {'op': 'delete', 'item_id': 'b'}])
+    os.makedirs(os.path.dirname(journal.path))
+    with open(journal.path, 'w') as f:
+        f.write(json.dumps({'collection_id': COLLECTION_ID, 'records': [r.as_dict() for r in journal.records],
+                            'operations': journal.operations, 'started': 1.0}) + '\n')
+        f.write(json.dumps({'done': [['delete', 'a']]}) + '\n')
+        f.write('{"done": [["delete", "b"')
+    with SyncJournal.load(journal.path) as loaded:
+        assert [op['item_id'] for op in loaded.outstanding()] == ['b']
+    assert loaded.file is None
+
+
+def test_resume_without_journals_is_unchanged(registry, webflow):
+    assert main(['--resume']) == EXIT_UNCHANGED
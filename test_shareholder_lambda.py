@@ -0,0 +1,49 @@
+import pytest
+from shareholder_config import Config
+from shareholder_lambda import _event_options, build_argv, fit_budget
+from shareholder_resilience import run_budget
+
+
+@pytest.mark.parametrize('value', [False, 'false', 'False', '0', 'no', '', None, 0])
+def test_false_flags_add_nothing(value):
+    assert build_argv({'action': 'run', 'force': value, 'pipeline': value}) == []
+
+
+@pytest.mark.parametrize('value', [True, 'true', 'TRUE', '1', 'yes', 1])
+def test_true_flags(value):
+    assert build_argv({'action': 'run', 'force': value, 'pipeline': value}) == ['--force', '--pipeline']
+
+
+def test_orgnr_list_or_comma_separated():
+    assert build_argv({'orgnr': ['985279721', 123]}) == ['--orgnr', '985279721', '123']
+    assert build_argv({'orgnr': '985279721, 123'}) == ['--orgnr', '985279721', '123']
+    assert build_argv({'manifest': 'companies.json'}) == ['--manifest', 'companies.json']
+
+
+def test_resume_ignores_run_options():
+    assert build_argv({'action': 'resume', 'force': 'true'}) == ['--resume']
+
+
+def test_query_string_options():
+    event = {'httpMethod': 'POST', 'path': '/run', 'body': '{"orgnr": ["985279721"]}',
+             'queryStringParameters': {'force': 'false', 'pipeline': 'true'}}
+    assert build_argv(_event_options(event)) == ['--orgnr', '985279721', '--pipeline']
+    assert _event_options({'httpMethod': 'GET', 'path': '/nope'}) is None
+    assert _event_options({'source': 'aws.events'}) == {'action': 'run'}
+
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_budget_ends_before_the_lambda_timeout(monkeypatch):
+    monkeypatch.setattr(run_budget, 'total', run_budget.total)
+    # A 15-minute function gets less than the 20-minute default deadline
+    assert fit_budget(Context(900_000)) == 900 - Config.LAMBDA_TIMEOUT_MARGIN
+    assert run_budget.total == 900 - Config.LAMBDA_TIMEOUT_MARGIN
+    assert fit_budget(Context(10 ** 9)) == Config.RUN_DEADLINE
+    assert fit_budget(None) == Config.RUN_DEADLINE
@@ -0,0 +1,36 @@
+import atexit
+import logging
+import pytest
+import shareholder_logging
+from shareholder_logging import DeferredQueueHandler, setup_logging
+
+
+@pytest.fixture
+def fresh_logging(monkeypatch):
+    """Unconfigured module state; the root logger's handlers are restored afterwards"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    monkeypatch.setattr(shareholder_logging, '_configured', False)
+    monkeypatch.setattr(shareholder_logging, '_listener', None)
+    yield root
+    listener = shareholder_logging._listener
+    if listener is not None:
+        atexit.unregister(listener.stop)
+        listener.stop()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_synchronous_setup_survives_a_second_call(fresh_logging):
+    assert setup_logging(log_file='', background=False) is None
+    assert setup_logging(log_file='') is None
+    assert fresh_logging.handlers
+    assert not any(isinstance(handler, DeferredQueueHandler) for handler in fresh_logging.handlers)
+    assert all(type(handler) is logging.StreamHandler for handler in fresh_logging.handlers)
+
+
+def test_background_setup_is_kept_by_a_second_call(fresh_logging):
+    listener = setup_logging(log_file='')
+    assert listener is not None
+    assert setup_logging(log_file='', background=False) is listener
+    assert [type(handler) for handler in fresh_logging.handlers] == [DeferredQueueHandler]
@@ -0,0 +1,35 @@
+from conftest import COLLECTION_ID, ORGNR
+from shareholder_config import Config
+from shareholder_main import EXIT_SUCCESS, EXIT_UNCHANGED, main
+
+
+def writes(server):
+    return {route: count for route, count in server.stats.by_route.items() if not route.startswith('GET')}
+
+
+def test_unchanged_register_skips_webflow_and_exits_3(registry, webflow):
+    assert main([]) == EXIT_SUCCESS
+    assert len(webflow.collections[COLLECTION_ID]) == Config.MAX_SHAREHOLDERS
+
+    webflow.stats.reset()
+    assert main([]) == EXIT_UNCHANGED
+    # The fingerprint matched, so Webflow was not even listed
+    assert webflow.stats.requests == 0
+
+
+def test_force_syncs_an_unchanged_register(registry, webflow):
+    assert main([]) == EXIT_SUCCESS
+    webflow.stats.reset()
+    assert main(['--force']) == EXIT_SUCCESS
+    # Planned against the fresh collection mirror, which already matches
+    assert writes(webflow) == {}
+
+
+def test_changed_register_is_synced(registry, webflow):
+    assert main([]) == EXIT_SUCCESS
+    name, first, holdings = registry.registers[ORGNR][0]
+    registry.registers[ORGNR][0] = (name, first, holdings + 1)
+
+    webflow.stats.reset()
+    assert main([]) == EXIT_SUCCESS
+    assert writes(webflow) == {'PATCH /collections/{id}/items/{item}': 1}
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import pstats
+import pytest
+import shareholder_metrics
+from shareholder_metrics import Metrics, profile_call
+
+
+def test_prometheus_text_format():
+    m = Metrics()
+    m.count('http_requests_total', client='registry', status='2xx')
+    m.count('http_requests_total', 2, client='webflow', status='2xx')
+    m.set('run_exit_code', 0)
+    m.observe('phase_seconds', 0.25, phase='login')
+    m.observe('phase_seconds', 0.5, phase='login')
+    assert m.prometheus() == (
+        '# HELP shareholder_http_requests_total HTTP requests by client, phase and status class\n'
+        '# TYPE shareholder_http_requests_total counter\n'
+        'shareholder_http_requests_total{client="registry",status="2xx"} 1\n'
+        'shareholder_http_requests_total{client="webflow",status="2xx"} 2\n'
+        '# HELP shareholder_run_exit_code Exit code of the last run (0 ok, 1 failed, 3 unchanged)\n'
+        '# TYPE shareholder_run_exit_code gauge\n'
+        'shareholder_run_exit_code 0\n'
+        '# HELP shareholder_phase_seconds Time spent in each scraper and Webflow phase\n'
+        '# TYPE shareholder_phase_seconds summary\n'
+        'shareholder_phase_seconds_sum{phase="login"} 0.750000\n'
+        'shareholder_phase_seconds_count{phase="login"} 2\n'
+    )
+
+
+def test_metric_without_help_still_gets_a_type():
+    m = Metrics()
+    m.count('custom_total')
+    assert m.prometheus() == '# TYPE shareholder_custom_total counter\nshareholder_custom_total 1\n'
+
+
+def test_label_values_are_escaped():
+    m = Metrics()
+    m.set('scheduler_limit', 4, host='a\\b "quoted"\nnext')
+    assert 'shareholder_scheduler_limit{host="a\\\\b \\"quoted\\"\\nnext"} 4' in m.prometheus().splitlines()
+
+
+def test_write_replaces_both_files_whole(state, monkeypatch):
+    prom, js = state / 'metrics.prom', state / 'metrics.json'
+    prom.write_text('old\n')
+    js.write_text('{}')
+    m = Metrics()
+    m.count('daemon_cycles_total')
+    replace = os.replace
+    seen = []
+
+    def checked_replace(source, target):
+        # Until the rename, a collector still reads the previous complete file
+        seen.append(open(target).read())
+        replace(source, target)
+    monkeypatch.setattr(shareholder_metrics.os, 'replace', checked_replace)
+
+    assert m.write(str(prom), str(js)) == [str(prom), str(js)]
+    assert seen == ['old\n', '{}']
+    assert prom.read_text() == m.prometheus()
+    assert json.loads(js.read_text())['counters'] == [{'name': 'daemon_cycles_total', 'labels': {}, 'value': 1}]
+    assert sorted(os.listdir(state)) == ['metrics.json', 'metrics.prom']
+
+
+def test_empty_path_skips_that_export(state):
+    assert Metrics().write('', str(state / 'metrics.json')) == [str(state / 'metrics.json')]
+    assert os.listdir(state) == ['metrics.json']
+
+
+def test_profile_call_returns_the_result_and_writes_stats(state, caplog):
+    caplog.set_level(logging.INFO, logger='shareholder_metrics')
+    path = str(state / 'run.prof')
+
+    def work(n):
+        return sum(range(n))
+    assert profile_call(work, 1000, path=path) == 499500
+    assert any('work' in func for _, _, func in pstats.Stats(path).stats)
+    assert f'Profile written to {path}' in caplog.text
+
+
+def test_profile_call_writes_stats_when_the_call_raises(state):
+    path = str(state / 'failed.prof')
+
+    def broken():
+        raise RuntimeError('scrape failed')
+    with pytest.raises(RuntimeError):
+        profile_call(broken, path=path)
+    assert os.path.exists(path)
+
+
+def test_unwritable_profile_is_only_a_warning(state, caplog):
+    assert profile_call(len, 'abc', path=str(state / 'missing' / 'run.prof')) == 3
+    assert 'Could not write profile' in caplog.text
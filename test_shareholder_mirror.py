@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+import pytest
+import shareholder_mirror
+from conftest import COLLECTION_ID
+from shareholder_config import Config
+from shareholder_mirror import CollectionMirror
+from shareholder_records import ShareholderRecord
+from shareholder_webflow_api import WebflowAPI
+
+LIST = 'GET /collections/{id}/items'
+INFO = 'GET /collections/{id}'
+
+
+def make_records(count=5):
+    return [ShareholderRecord(rank, f'HOLDER {rank} AS', '', 1000 * (count + 1 - rank), Decimal('2.0000'))
+            for rank in range(1, count + 1)]
+
+
+@pytest.fixture
+def synced(webflow):
+    """A collection synced once through the mirror, with the request counters reset"""
+    WebflowAPI().sync_shareholders(make_records())
+    webflow.stats.reset()
+    return webflow
+
+
+def edit_in_designer(server, holdings):
+    """Someone changes an item outside the scraper, which moves lastUpdated"""
+    item = next(iter(server.collections[COLLECTION_ID].values()))
+    item['holdings'] = holdings
+    server.last_updated[COLLECTION_ID] = datetime.now(timezone.utc).isoformat()
+    return item['_id']
+
+
+def test_next_run_starts_from_the_saved_mirror(synced):
+    # A new process: the mirror comes from disk and only the collection metadata is checked
+    mirror = CollectionMirror(COLLECTION_ID)
+    mirror.refresh(WebflowAPI())
+    assert synced.stats.by_route == {INFO: 1}
+    assert len(mirror.items) == 5
+
+
+def test_refresh_within_the_ttl_sends_nothing(synced):
+    mirror = CollectionMirror(COLLECTION_ID)
+    api = WebflowAPI()
+    mirror.refresh(api)
+    mirror.refresh(api)
+    assert synced.stats.requests == 1
+
+
+def test_outside_edit_is_listed_again(synced, monkeypatch):
+    item_id = edit_in_designer(synced, '1')
+    mirror = CollectionMirror(COLLECTION_ID)
+    mirror.refresh(WebflowAPI())
+    assert synced.stats.by_route == {INFO: 1, LIST: 1}
+    assert mirror.get(item_id)['holdings'] == '1'
+
+    # The next run's sync puts the register back with a single update
+    monkeypatch.setattr(shareholder_mirror, '_mirrors', {})
+    result = WebflowAPI().sync_shareholders(make_records())
+    assert (result.updated, result.created, result.deleted) == (1, 0, 0)
+
+
+def test_old_mirror_is_listed_again(synced, monkeypatch):
+    monkeypatch.setattr(Config, 'WEBFLOW_MIRROR_MAX_AGE', 60)
+    mirror = CollectionMirror(COLLECTION_ID)
+    mirror.listed_at = time.time() - 120
+    mirror.refresh(WebflowAPI())
+    assert synced.stats.by_route.get(LIST) == 1
+
+
+def test_unreadable_metadata_falls_back_to_listing(synced, monkeypatch):
+    api = WebflowAPI()
+
+    def unavailable(etag=None):
+        raise ConnectionError('metadata unavailable')
+    monkeypatch.setattr(api, 'collection_info', unavailable)
+    mirror = CollectionMirror(COLLECTION_ID)
+    mirror.refresh(api)
+    assert synced.stats.by_route == {LIST: 1}
+    assert len(mirror.items) == 5
+
+
+def test_invalidated_mirror_is_listed_again(synced):
+    mirror = CollectionMirror(COLLECTION_ID)
+    mirror.invalidate()
+    CollectionMirror(COLLECTION_ID).refresh(WebflowAPI())
+    assert synced.stats.by_route.get(LIST) == 1
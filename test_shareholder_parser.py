@@ -0,0 +1,42 @@
+import os
+from decimal import Decimal
+import pytest
+from registry_pages import make_rows, render_security_page
+from shareholder_parser import BACKENDS, parse_page, parse_shareholders
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures', 'security_top50.html')
+
+
+@pytest.fixture
+def fixture_page():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+def test_backends_agree_on_the_fixture(fixture_page):
+    results = {backend: parse_page(fixture_page, backend) for backend in BACKENDS}
+    assert results['soup'] == results['lxml']
+    rows, next_url = results['lxml']
+    assert len(rows) == 50 and next_url is None
+
+
+def test_backends_agree_on_a_paginated_page():
+    page = render_security_page(make_rows(30), start=500, next_url='/content/security/?orgnr=1&page=2')
+    page = page.encode('utf-8')
+    assert parse_page(page, 'soup') == parse_page(page, 'lxml')
+    assert parse_page(page, 'soup')[1] == '/content/security/?orgnr=1&page=2'
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_records_from_the_fixture(fixture_page, backend):
+    records = parse_shareholders(fixture_page, backend)
+    assert [record.rank for record in records] == list(range(1, 51))
+    assert all(record.holdings > 0 for record in records)
+    assert all(isinstance(record.percent, Decimal) for record in records)
+    assert records == sorted(records, key=lambda record: -record.holdings)
+    assert parse_shareholders(fixture_page, backend, limit=5) == records[:5]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        parse_page(b'<html></html>', 'regex')
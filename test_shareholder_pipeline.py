@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import pytest
+from registry_pages import make_rows
+from conftest import ORGNR
+from shareholder_config import Config
+from shareholder_pipeline import Pipeline
+from shareholder_scraper import ShareholderScraper
+from shareholder_webflow_api import WebflowAPI
+
+ISSUERS = [ORGNR, '912345670', '923456781', '934567892']
+UNKNOWN = '999999999'  # not in the registry, so its scrape fails with a 404
+
+
+class StageLog:
+    """Start and end times of every call into a stage, and how many ran at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.running = {}
+        self.peak = {}
+
+    def wrap(self, monkeypatch, owner, name, stage):
+        original = getattr(owner, name)
+
+        def tracked(*args, **kwargs):
+            with self.lock:
+                self.running[stage] = self.running.get(stage, 0) + 1
+                self.peak[stage] = max(self.peak.get(stage, 0), self.running[stage])
+            started = time.monotonic()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running[stage] -= 1
+                    self.calls.setdefault(stage, []).append((started, time.monotonic()))
+        monkeypatch.setattr(owner, name, tracked)
+
+
+@pytest.fixture
+def stages(registry, webflow, monkeypatch):
+    for orgnr in ISSUERS[1:]:
+        registry.registers[orgnr] = make_rows(30, seed=int(orgnr) % 1000)
+    registry.latency = 0.1
+    monkeypatch.setattr(Config, 'WEBFLOW_SITE_ID', 'test-site')
+    log = StageLog()
+    log.wrap(monkeypatch, ShareholderScraper, 'fetch_page', 'scrape')
+    log.wrap(monkeypatch, ShareholderScraper, 'parse_shareholders', 'parse')
+    log.wrap(monkeypatch, WebflowAPI, 'update_shareholders', 'sync')
+    return log
+
+
+def run(companies, **options):
+    pipeline = Pipeline(**options)
+    return pipeline, asyncio.run(pipeline.run(companies))
+
+
+def test_issuers_flow_through_overlapping_stages(stages, webflow):
+    companies = {orgnr: f'collection-{i}' for i, orgnr in enumerate(ISSUERS)}
+    pipeline, results = run(companies, scrape_workers=2, parse_workers=1, sync_workers=1)
+
+    assert [result.orgnr for result in results] == ISSUERS
+    assert all(result.ok for result in results)
+    assert pipeline.synced == len(ISSUERS)
+    assert sorted(webflow.collections) == sorted(companies.values())
+    # Syncing starts before scraping is over
+    assert min(start for start, _ in stages.calls['sync']) < max(end for _, end in stages.calls['scrape'])
+    assert stages.peak == {'scrape': 2, 'parse': 1, 'sync': 1}
+    # Four changed collections, one publish
+    assert webflow.publishes == 1 and pipeline.published
+
+
+def test_failing_stages_are_recorded_and_the_rest_continue(stages, webflow, monkeypatch):
+    update = WebflowAPI.update_shareholders
+
+    def failing_update(api, *args, **kwargs):
+        return False if api.collection_id == 'collection-1' else update(api, *args, **kwargs)
+    monkeypatch.setattr(WebflowAPI, 'update_shareholders', failing_update)
+    companies = {ORGNR: 'collection-0', ISSUERS[1]: 'collection-1', UNKNOWN: 'collection-2',
+                 ISSUERS[2]: 'collection-3'}
+    pipeline, results = run(companies)
+
+    errors = {result.orgnr: result.error for result in results}
+    assert errors[ORGNR] is None and errors[ISSUERS[2]] is None
+    assert errors[ISSUERS[1]] == 'Webflow update failed'
+    assert '404' in errors[UNKNOWN]
+    assert all(result.elapsed > 0 for result in results)
+    assert pipeline.synced == 2
+    assert webflow.publishes == 1
+
+
+def test_nothing_changed_publishes_nothing(stages, webflow):
+    companies = {orgnr: f'collection-{i}' for i, orgnr in enumerate(ISSUERS[:2])}
+    run(companies)
+    assert webflow.publishes == 1
+    pipeline, results = run(companies)
+    assert all(result.ok for result in results)
+    assert (pipeline.synced, pipeline.unchanged) == (0, 2)
+    assert webflow.publishes == 1
@@ -0,0 +1,50 @@
+from decimal import Decimal
+import pytest
+import shareholder_records
+from shareholder_records import ShareholderRecord, ShareholderTable
+
+
+def make_table():
+    return ShareholderTable.from_records([
+        ShareholderRecord(1, 'NOMINEE BANK', '', 300, Decimal('30.0000')),
+        ShareholderRecord(2, 'ALPHA AS', '', 500, Decimal('50.1234')),
+        ShareholderRecord(3, 'NOMINEE BANK', '', 100, Decimal('10.0000')),
+        ShareholderRecord(4, 'HANSEN', 'KARI', 200, Decimal('9.8766')),
+    ])
+
+
+def test_rows_round_trip():
+    table = make_table()
+    assert len(table) == 4
+    assert table[1] == ShareholderRecord(2, 'ALPHA AS', '', 500, Decimal('50.1234'))
+    assert len(table.names) == 3  # the repeated name is stored once
+
+
+@pytest.mark.parametrize('numpy_installed', [True, False])
+def test_totals(monkeypatch, numpy_installed):
+    if numpy_installed:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(shareholder_records, '_numpy', lambda: None)
+    table = make_table()
+    assert table.total_holdings() == 1100
+    assert table.total_percent() == Decimal('100.0000')
+    assert ShareholderTable().total_holdings() == 0
+
+
+def test_sorted_and_top():
+    table = make_table()
+    assert [r.holdings for r in table.sorted()] == [500, 300, 200, 100]
+    assert [r.rank for r in table.sorted('percent', reverse=False)] == [4, 3, 1, 2]
+    assert [r.holdings for r in table.top(2)] == [500, 300]
+
+
+def test_sorted_table_does_not_share_names_with_its_source():
+    table = make_table()
+    top = table.sorted()._take([0, 1])
+    assert top.names == [('ALPHA AS', ''), ('NOMINEE BANK', '')]
+
+    top.append(ShareholderRecord(5, 'NEWCOMER ASA', '', 50, Decimal('1.0000')))
+    assert len(table.names) == 3
+    assert ('NEWCOMER ASA', '') not in table._name_lookup
+    assert top[2].surname_company == 'NEWCOMER ASA'
@@ -0,0 +1,137 @@
+import time
+import pytest
+import requests
+from standins import StandInServer
+from shareholder_resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientAdapter,
+                                    RunBudget)
+from shareholder_scheduler import RequestScheduler
+
+
+class ScriptedServer(StandInServer):
+    """Answers with the given statuses in turn, then 200"""
+
+    def __init__(self, *statuses):
+        super().__init__()
+        self.statuses = list(statuses)
+
+    def handle(self, request, body):
+        status = self.statuses.pop(0) if self.statuses else 200
+        return request.path, status, [('Content-Type', 'text/plain')], b'ok'
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(*statuses):
+        servers.append(ScriptedServer(*statuses).start())
+        return servers[-1]
+    yield start
+    for s in servers:
+        s.stop()
+
+
+def session(**kwargs):
+    options = dict(timeout=(1, 1), retries=2, retry_statuses=(503,), budget=RunBudget(total=10))
+    options.update(kwargs)
+    s = requests.Session()
+    s.mount('http://', ResilientAdapter(**options))
+    return s
+
+
+def test_exhausted_budget_sends_nothing_and_leaves_breaker_closed(state, server):
+    stand_in = server()
+    breaker = CircuitBreaker('test', threshold=1, reset_after=60)
+    scheduler = RequestScheduler()
+    budget = RunBudget(total=0.01)
+    time.sleep(0.02)
+
+    with pytest.raises(DeadlineExceeded):
+        session(breaker=breaker, budget=budget, scheduler=scheduler).get(stand_in.url + '/page')
+
+    assert stand_in.stats.requests == 0
+    assert breaker.failures == 0
+    assert breaker.opened_at is None
+    breaker.before_request()  # still closed
+    assert all(host['in_flight'] == 0 for host in scheduler.snapshot())
+
+
+def test_deadline_while_waiting_for_slot_is_not_a_host_failure(state, server):
+    stand_in = server()
+    breaker = CircuitBreaker('test', threshold=1, reset_after=60)
+    scheduler = RequestScheduler()
+    budget = RunBudget(total=10)
+    http = session(breaker=breaker, budget=budget, scheduler=scheduler)
+    http.get(stand_in.url + '/warm')
+    # The budget runs out between the first check and the one after the slot is taken
+    checks = iter([(1, 1)])
+
+    def timeout(phase, value):
+        try:
+            return next(checks)
+        except StopIteration:
+            raise DeadlineExceeded('out of time')
+    budget.timeout = timeout
+
+    with pytest.raises(DeadlineExceeded):
+        http.get(stand_in.url + '/page')
+
+    assert stand_in.stats.by_route == {'/warm': 1}
+    assert breaker.opened_at is None
+    assert scheduler.snapshot()[0]['in_flight'] == 0
+
+
+def test_idempotent_requests_are_retried_on_retry_statuses(state, server):
+    stand_in = server(503, 503)
+    assert session().get(stand_in.url + '/page').status_code == 200
+    assert stand_in.stats.requests == 3
+
+
+def test_post_is_not_retried(state, server):
+    stand_in = server(503)
+    assert session().post(stand_in.url + '/page', data=b'x').status_code == 503
+    assert stand_in.stats.requests == 1
+
+
+def test_breaker_opens_fails_fast_and_closes_after_trial(state, server):
+    stand_in = server(500, 500)
+    breaker = CircuitBreaker('test', threshold=2, reset_after=0.1)
+    http = session(retries=0, breaker=breaker)
+    for _ in range(2):
+        assert http.get(stand_in.url + '/page').status_code == 500
+    assert breaker.opened_at is not None
+
+    with pytest.raises(CircuitOpenError):
+        http.get(stand_in.url + '/page')
+    assert stand_in.stats.requests == 2
+
+    time.sleep(0.15)
+    assert http.get(stand_in.url + '/page').status_code == 200  # half-open trial
+    assert breaker.opened_at is None and breaker.failures == 0
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker('test', threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_request()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_phase_deadline_is_its_share_of_the_total():
+    budget = RunBudget(total=100, shares={'scrape': 0.5})
+    assert budget.remaining('scrape') == pytest.approx(50, abs=0.5)
+    assert budget.remaining('sync') == pytest.approx(100, abs=0.5)  # no share: the whole run
+    assert budget.timeout('scrape', (5, 30)) == (5, 30)
+
+    budget.started -= 99.5  # half a second of the run left
+    connect, read = budget.timeout('scrape', (5, 30))
+    assert connect <= 0.5 and read <= 0.5
+    with pytest.raises(DeadlineExceeded):
+        budget.sleep('scrape', 1)
+
+    budget.started -= 1
+    with pytest.raises(DeadlineExceeded):
+        budget.timeout('sync', 5)
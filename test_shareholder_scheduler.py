@@ -0,0 +1,229 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from shareholder_config import Config
+from shareholder_resilience import DeadlineExceeded, ResilientAdapter
+from shareholder_scheduler import HostLimiter, RequestScheduler
+
+
+class Response:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def limiter(**kwargs):
+    options = dict(initial=2, minimum=1, maximum=4, decrease=0.5, latency_tolerance=3.0, min_interval=0,
+                   latency_floor=0, decrease_interval=0)
+    options.update(kwargs)
+    return HostLimiter('registry.test', **options)
+
+
+def saturate(host, latency=0.1, response=None, kind=''):
+    """Fill every slot, then release them all with the same latency and response"""
+    count = int(host.limit)
+    for _ in range(count):
+        host.acquire(1, time.monotonic() + 1)
+    for _ in range(count):
+        host.release(time.monotonic() - latency, response or Response(), kind)
+
+
+def test_limit_grows_additively_up_to_the_maximum():
+    host = limiter()
+    limits = [host.limit]
+    for _ in range(20):
+        saturate(host)
+        limits.append(host.limit)
+    assert limits == sorted(limits)
+    # About one slot per window of healthy responses, not a doubling
+    assert limits[1] - limits[0] <= 1
+    assert host.limit == 4
+    assert host.in_flight == 0
+
+
+def test_unused_limit_does_not_grow():
+    host = limiter()
+    for _ in range(10):
+        host.acquire(1, time.monotonic() + 1)
+        host.release(time.monotonic() - 0.1, Response())
+    assert host.limit == 2
+
+
+@pytest.mark.parametrize('response, latency', [
+    (Response(503), 0.1),
+    (Response(429), 0.1),
+    (None, 0.1),  # connection error
+    (Response(), 1.0),  # ten times the 0.1 s baseline
+])
+def test_overload_halves_the_limit(response, latency):
+    host = limiter(initial=4)
+    saturate(host, 0.1)
+    assert host.limit == 4
+    host.last_decrease = 0.0
+    host.acquire(1, time.monotonic() + 1)
+    host.release(time.monotonic() - latency, response)
+    assert host.limit == 2
+
+
+def test_one_burst_of_errors_counts_once_and_respects_the_floor():
+    host = limiter(initial=4)
+    saturate(host, 0.5)  # baseline 0.5 s: one cut per half second at most
+    for _ in range(3):
+        host.acquire(1, time.monotonic() + 1)
+        host.release(time.monotonic() - 0.1, Response(503))
+    assert host.limit == 2
+
+    host = limiter(initial=1)
+    host.acquire(1, time.monotonic() + 1)
+    host.release(time.monotonic(), None)
+    assert host.limit == 1
+
+
+def test_small_and_large_pages_keep_their_own_baselines():
+    host = limiter()
+    for _ in range(20):
+        saturate(host, 0.005, kind='login')
+        saturate(host, 0.2, kind='register')
+    # Register pages are 40x slower than login pages, but as fast as register pages usually are
+    assert host.limit == 4
+    assert host.baselines['login'] < 0.01 and host.baselines['register'] > 0.1
+
+
+def test_latency_under_the_floor_is_not_overload():
+    host = limiter(initial=4, latency_floor=0.5)
+    saturate(host, 0.01)
+    saturate(host, 0.3)  # 30x the baseline, but still fast
+    assert host.limit == 4
+    saturate(host, 0.6)
+    assert host.limit == 2
+
+
+def test_cuts_are_spaced_and_stop_logging_at_the_minimum(caplog):
+    host = limiter(initial=4, decrease_interval=60)
+    for _ in range(3):
+        host.acquire(1, time.monotonic() + 1)
+        host.release(time.monotonic(), Response(503))
+    assert host.limit == 2
+    assert caplog.text.count('concurrency limit') == 1
+
+    host.last_decrease = 0.0
+    host.acquire(1, time.monotonic() + 1)
+    host.release(time.monotonic(), Response(503))
+    assert host.limit == 1
+    host.last_decrease = 0.0
+    host.acquire(1, time.monotonic() + 1)
+    host.release(time.monotonic(), Response(503))
+    assert caplog.text.count('concurrency limit') == 2
+    assert '1.0 -> 1.0' not in caplog.text
+
+
+def test_single_company_run_keeps_its_limit(registry, webflow, caplog):
+    from shareholder_main import main
+    from shareholder_scheduler import registry_scheduler
+    assert main([]) == 0
+    assert 'concurrency limit' not in caplog.text
+    assert all(host['limit'] >= Config.REGISTRY_CONCURRENCY_START for host in registry_scheduler.snapshot())
+
+
+def test_retry_after_pauses_new_requests():
+    host = limiter()
+    host.acquire(1, time.monotonic() + 1)
+    host.release(time.monotonic(), Response(429, {'Retry-After': '30'}))
+    with pytest.raises(DeadlineExceeded):
+        host.acquire(1, time.monotonic() + 0.2)
+    assert host.waiting == []
+
+
+def test_waiting_requests_are_admitted_by_priority():
+    host = limiter(initial=1, maximum=1)
+    host.acquire(1, time.monotonic() + 1)
+    order = []
+
+    def request(priority, name):
+        host.acquire(priority, time.monotonic() + 5)
+        order.append(name)
+        host.release(time.monotonic(), Response())
+
+    bulk = threading.Thread(target=request, args=(2, 'register'))
+    bulk.start()
+    while not host.waiting:
+        time.sleep(0.001)
+    login = threading.Thread(target=request, args=(0, 'login'))
+    login.start()
+    while len(host.waiting) < 2:
+        time.sleep(0.001)
+    host.release(time.monotonic(), Response())
+    bulk.join()
+    login.join()
+    assert order == ['login', 'register']
+
+
+class SlowBodyServer(ThreadingHTTPServer):
+    """Sends the headers at once and the body 50 ms later; records peak concurrency"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        super().__init__(('127.0.0.1', 0), SlowBodyHandler)
+
+
+class SlowBodyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        body = b'x' * 1024
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.flush()
+        time.sleep(0.05)
+        with server.lock:
+            server.active -= 1
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def slow_body_server():
+    server = SlowBodyServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_requests_stay_under_the_limit_until_bodies_are_read(slow_body_server, monkeypatch):
+    monkeypatch.setattr(Config, 'BATCH_MAX_PER_HOST', 2)
+    monkeypatch.setattr(Config, 'REGISTRY_CONCURRENCY_START', 2)
+    scheduler = RequestScheduler()
+    session = requests.Session()
+    session.mount('http://', ResilientAdapter((5, 5), scheduler=scheduler, pool_maxsize=8))
+    url = f'http://127.0.0.1:{slow_body_server.server_address[1]}/page'
+
+    def fetch():
+        assert len(session.get(url).content) == 1024
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    session.close()
+
+    assert slow_body_server.peak <= 2
+    limiter = scheduler.hosts[url.split('/')[2]]
+    assert limiter.in_flight == 0
+    # Latency samples include the body download
+    assert limiter.baselines['other'] >= 0.05
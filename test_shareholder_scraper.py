@@ -0,0 +1,62 @@
+import threading
+import pytest
+import requests
+from registry_pages import make_rows
+from conftest import ORGNR
+from shareholder_config import Config
+from shareholder_scraper import ShareholderScraper
+
+SECURITY = 'GET /content/security/'
+
+
+@pytest.fixture
+def scraper(registry):
+    scraper = ShareholderScraper()
+    assert scraper.ensure_login()
+    registry.stats.reset()
+    return scraper
+
+
+def producers():
+    return [thread for thread in threading.enumerate() if thread.name == f'register-{ORGNR}']
+
+
+def test_every_page_streams_in_rank_order(registry, scraper):
+    registry.page_size = 10
+    records = list(scraper.iter_register())
+    assert [record.rank for record in records] == list(range(1, 51))
+    assert [(r.surname_company, r.first_name, r.holdings) for r in records] == [
+        (name, first, holdings) for name, first, holdings in registry.registers[ORGNR]]
+    assert registry.stats.by_route == {SECURITY: 5}
+    assert not producers()
+
+
+def test_stopping_early_shuts_the_producer_down(registry, scraper, monkeypatch):
+    monkeypatch.setattr(Config, 'REGISTER_PREFETCH_PAGES', 1)
+    registry.registers[ORGNR] = make_rows(400, seed=7)
+    registry.page_size = 5
+    stream = scraper.iter_register()
+    first = [next(stream) for _ in range(3)]
+    assert [record.rank for record in first] == [1, 2, 3]
+    stream.close()
+    assert not producers()
+    # One page being read, one queued and at most one waiting to be handed over; not all 80
+    assert registry.stats.by_route[SECURITY] <= 4
+
+
+def test_http_error_reaches_the_consumer(registry, scraper):
+    registry.page_size = 20
+    handle = registry.handle
+
+    def failing_second_page(request, body):
+        if 'page=1' in request.path:
+            return SECURITY, 500, [('Content-Type', 'text/plain')], b'boom'
+        return handle(request, body)
+    registry.handle = failing_second_page
+
+    streamed = []
+    with pytest.raises(requests.HTTPError, match='500'):
+        for record in scraper.iter_register():
+            streamed.append(record)
+    assert len(streamed) == 20  # the first page still arrived
+    assert not producers()
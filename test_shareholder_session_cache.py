@@ -0,0 +1,87 @@
+import os
+import stat
+import time
+import pytest
+from requests.cookies import RequestsCookieJar
+from shareholder_config import Config
+from shareholder_scraper import ShareholderScraper
+from shareholder_session_cache import SessionCache
+
+LOGIN = 'POST /login/'
+
+
+@pytest.fixture
+def key(state, monkeypatch):
+    fernet = pytest.importorskip('cryptography.fernet')
+    key = fernet.Fernet.generate_key().decode()
+    monkeypatch.setattr(Config, 'SESSION_CACHE_KEY', key)
+    return key
+
+
+def make_jar(expires=None):
+    jar = RequestsCookieJar()
+    jar.set('sessionid', 'live-session-value', domain='127.0.0.1', path='/', expires=expires)
+    return jar
+
+
+def test_encrypted_round_trip(key):
+    cache = SessionCache()
+    assert cache.save(make_jar())
+    with open(cache.path, 'rb') as f:
+        assert b'live-session-value' not in f.read()
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert SessionCache().load().get('sessionid') == 'live-session-value'
+
+
+@pytest.mark.parametrize('ttl,cookie_expires', [(0, None), (3600, time.time() - 1)])
+def test_expired_cache_is_cleared(key, ttl, cookie_expires):
+    # Either our TTL or the cookie's own expiry ends the cached session
+    cache = SessionCache(ttl=ttl)
+    assert cache.save(make_jar(int(cookie_expires) if cookie_expires else None))
+    assert cache.load() is None
+    assert not os.path.exists(cache.path)
+
+
+def test_corrupt_or_foreign_cache_is_cleared(key):
+    cache = SessionCache()
+    with open(cache.path, 'wb') as f:
+        f.write(b'not a fernet token')
+    assert cache.load() is None
+    assert not os.path.exists(cache.path)
+
+    cache.save(make_jar())
+    other_key = pytest.importorskip('cryptography.fernet').Fernet.generate_key().decode()
+    assert SessionCache(key=other_key).load() is None
+    assert not os.path.exists(cache.path)
+
+
+def test_nothing_is_written_without_a_key(state):
+    cache = SessionCache()
+    assert not cache.enabled
+    assert not cache.save(make_jar())
+    assert not os.path.exists(cache.path)
+    assert cache.load() is None
+
+
+def test_cached_session_skips_the_login(registry, key):
+    assert ShareholderScraper().ensure_login()
+    registry.stats.reset()
+    scraper = ShareholderScraper()
+    assert scraper.ensure_login()
+    assert LOGIN not in registry.stats.by_route
+    assert registry.stats.by_route == {'GET /': 1}  # the single probe
+
+
+def test_rejected_cached_session_falls_back_to_a_full_login(registry, key):
+    assert ShareholderScraper().ensure_login()
+    old_session = SessionCache().load().get('sessionid')
+    registry.sessions.clear()  # the registry dropped the session
+    registry.stats.reset()
+
+    scraper = ShareholderScraper()
+    assert not scraper.restore_session()
+    assert not os.path.exists(Config.SESSION_CACHE_PATH)
+    assert scraper.ensure_login()
+    assert registry.stats.by_route[LOGIN] == 1
+    new_session = SessionCache().load().get('sessionid')
+    assert new_session != old_session and new_session in registry.sessions
@@ -0,0 +1,119 @@
+import csv
+import json
+import threading
+import time
+from decimal import Decimal
+import pytest
+from conftest import ORGNR
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord
+from shareholder_sinks import FileSink, Sink, SinkFanOut, Snapshot, WebhookSink, build_sinks
+
+
+def make_records(count=3):
+    return [ShareholderRecord(rank, f'HOLDER {rank} AS', '', 1000 * (count + 1 - rank), Decimal('2.5000'))
+            for rank in range(1, count + 1)]
+
+
+class RecordingSink(Sink):
+    """Keeps what it is given; while ``gate`` is clear every delivery waits on it"""
+
+    def __init__(self, name, gate=None):
+        self.name = name
+        self.gate = gate
+        self.started = threading.Event()
+        self.snapshots = []
+
+    def deliver(self, snapshot):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(10)
+        self.snapshots.append(snapshot)
+        return True
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_slow_sink_does_not_hold_up_the_others(state):
+    gate = threading.Event()
+    slow, fast = RecordingSink('slow', gate), RecordingSink('fast')
+    fanout = SinkFanOut([slow, fast], queue_size=8)
+    started = time.monotonic()
+    for orgnr in ('1', '2', '3'):
+        assert fanout.submit(Snapshot.of(orgnr, make_records()))
+    wait_for(lambda: len(fast.snapshots) == 3)
+    assert time.monotonic() - started < 1
+    assert slow.snapshots == []
+
+    gate.set()
+    assert fanout.close(timeout=5)
+    assert [s.orgnr for s in slow.snapshots] == ['1', '2', '3']
+
+
+def test_full_queue_drops_after_the_timeout(state, monkeypatch):
+    monkeypatch.setattr(Config, 'SINK_QUEUE_TIMEOUT', 0.2)
+    gate = threading.Event()
+    slow, fast = RecordingSink('slow', gate), RecordingSink('fast')
+    fanout = SinkFanOut([slow, fast], queue_size=1)
+    assert fanout.submit(Snapshot.of('1', make_records()))
+    assert slow.started.wait(5)  # the worker holds the first, so the queue has room for one more
+    assert fanout.submit(Snapshot.of('2', make_records()))
+
+    started = time.monotonic()
+    assert not fanout.submit(Snapshot.of('3', make_records()))
+    assert time.monotonic() - started >= 0.2
+    slow_worker, fast_worker = fanout.workers
+    assert (slow_worker.dropped, fast_worker.dropped) == (1, 0)
+
+    gate.set()
+    assert not fanout.close(timeout=5)
+    assert [s.orgnr for s in slow.snapshots] == ['1', '2']
+    assert [s.orgnr for s in fast.snapshots] == ['1', '2', '3']
+
+
+def test_csv_header_is_written_once_across_runs(state, tmp_path):
+    path = str(tmp_path / 'out' / 'holders.csv')
+    for _ in range(2):  # two runs appending to the same file
+        fanout = SinkFanOut([FileSink(path)])
+        fanout.submit(Snapshot.of(ORGNR, make_records()))
+        assert fanout.close(timeout=5)
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['orgnr', 'scraped_at'] + list(ShareholderRecord._fields)
+    assert len(rows) == 1 + 2 * 3
+    assert [row[0] for row in rows[1:]] == [ORGNR] * 6
+    assert rows[1][2:] == ['1', 'HOLDER 1 AS', '', '3000', '2.5000']
+
+
+def test_jsonl_rows_carry_the_issuer_and_date(state, tmp_path):
+    sink = FileSink(str(tmp_path / 'holders-{date}.jsonl'))
+    snapshot = Snapshot.of(ORGNR, make_records(2))
+    fanout = SinkFanOut([sink])
+    fanout.submit(snapshot)
+    assert fanout.close(timeout=5)
+    path = tmp_path / f'holders-{snapshot.scraped_at[:10]}.jsonl'
+    rows = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert rows == [dict(record.as_dict(), orgnr=ORGNR, scraped_at=snapshot.scraped_at)
+                    for record in snapshot.records]
+
+
+def test_build_sinks(state):
+    webflow = RecordingSink('webflow')
+    sinks = build_sinks('webflow, csv:out/holders, jsonl:out/holders.jsonl, webhook:http://127.0.0.1:9/hook',
+                        webflow=webflow)
+    assert sinks[0] is webflow
+    assert [(type(s), getattr(s, 'path', None)) for s in sinks[1:3]] == [
+        (FileSink, 'out/holders.csv'), (FileSink, 'out/holders.jsonl')]
+    assert isinstance(sinks[3], WebhookSink)
+    assert build_sinks('webflow') == []  # no Webflow sink was passed in
+
+
+@pytest.mark.parametrize('spec', ['ftp:host/path', 'csv', 'jsonl:', 'webhook'])
+def test_build_sinks_rejects_unknown_entries(state, spec):
+    with pytest.raises(ValueError, match='Invalid OUTPUT_SINKS'):
+        build_sinks(spec)
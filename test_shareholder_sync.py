@@ -0,0 +1,103 @@
+from decimal import Decimal
+import shareholder_sync
+from shareholder_config import Config
+from shareholder_records import ShareholderRecord
+from shareholder_sync import ANALYTICS_FIELDS, plan_sync
+
+
+def make_records(count=5):
+    return [ShareholderRecord(rank, f'HOLDER {rank} AS', '', 1000 * (count + 1 - rank), Decimal('7.6600'))
+            for rank in range(1, count + 1)]
+
+
+def stored(plan):
+    """The created items as the CMS hands them back: IDs added, decimals as numbers"""
+    items = []
+    for index, fields in enumerate(plan.creates):
+        item = dict(fields, _id=f'item-{index}')
+        for key in ('percentage', 'percentage-change'):
+            if item.get(key) is not None:
+                item[key] = float(item[key])
+        items.append(item)
+    return items
+
+
+def test_second_run_against_stored_change_fields_plans_nothing(monkeypatch):
+    monkeypatch.setattr(Config, 'WEBFLOW_ANALYTICS', True)
+    monkeypatch.setattr(shareholder_sync, 'MANAGED_FIELDS', shareholder_sync.MANAGED_FIELDS + ANALYTICS_FIELDS)
+    records = make_records()
+    derived = [{'rank-change': 1, 'holdings-change': 100, 'percentage-change': '0.1000'},
+               {'rank-change': -1, 'holdings-change': -100, 'percentage-change': '-0.2500'},
+               {'rank-change': 0, 'holdings-change': 0, 'percentage-change': '0.0000'},
+               {'rank-change': None, 'holdings-change': 3000, 'percentage-change': '7.6600'},
+               {'rank-change': 0, 'holdings-change': 0, 'percentage-change': '0E-4'}]
+
+    first = plan_sync([], records, derived=derived)
+    assert len(first.creates) == len(records)
+
+    items = stored(first)
+    second = plan_sync(items, records, derived=derived)
+    assert second.is_empty() and second.unchanged == len(records)
+
+    # Text with the trailing zeros trimmed is the same value too
+    for item in items:
+        item['percentage-change'] = str(item['percentage-change']).rstrip('0').rstrip('.')
+    assert plan_sync(items, records, derived=derived).is_empty()
+
+    # A real change is still an update
+    derived[0] = dict(derived[0], **{'percentage-change': '0.1100'})
+    assert [fields['rank'] for _, fields in plan_sync(items, records, derived=derived).updates] == [1]
+
+
+def items_from(records):
+    """The collection as an earlier sync of ``records`` left it"""
+    return [dict(fields, _id=f'item-{fields["rank"]}') for fields in plan_sync([], records).creates]
+
+
+def test_plan_sync_diffs_creates_updates_and_deletes():
+    records = make_records(5)
+    items = items_from(records)
+
+    assert plan_sync(items, records).is_empty()
+
+    # Holder 2 sells 500 shares, holder 5 leaves the list and a new holder comes in
+    current = records[:4] + [ShareholderRecord(5, 'NEWCOMER ASA', '', 1500, Decimal('1.2000'))]
+    current[1] = current[1]._replace(holdings=current[1].holdings - 500)
+    plan = plan_sync(items, current)
+
+    assert [item_id for item_id, _ in plan.updates] == ['item-2']
+    assert [fields['name'] for fields in plan.creates] == ['NEWCOMER ASA']
+    assert plan.deletes == ['item-5']
+    assert plan.unchanged == 3
+
+
+def test_cosmetic_name_changes_keep_the_item():
+    records = make_records(2)
+    items = items_from(records)
+    items[0]['surname-company'] = '  holder   1 as '
+    items[0]['rank'] = '1'  # Webflow may return numbers as text
+    plan = plan_sync(items, records)
+    # Same identity, so only the displayed name is corrected in place
+    assert not plan.creates and not plan.deletes
+    assert [item_id for item_id, _ in plan.updates] == ['item-1']
+
+
+def test_items_with_old_rank_slugs_are_migrated_in_place():
+    records = make_records(3)
+    items = items_from(records)
+    for item in items:
+        item['slug'] = f"shareholder-{item['rank']}"
+    plan = plan_sync(items, records)
+    assert not plan.creates and not plan.deletes
+    assert len(plan.updates) == 3
+
+
+def test_repeated_names_are_matched_by_occurrence():
+    records = [ShareholderRecord(rank, 'NOMINEE BANK', '', 1000 * (4 - rank), Decimal('10.0000'))
+               for rank in range(1, 4)]
+    items = items_from(records)
+    assert len({item['slug'] for item in items}) == 3
+    assert plan_sync(items, records).is_empty()
+
+    # The third nominee account closes: the last occurrence is the one deleted
+    assert plan_sync(items, records[:2]).deletes == ['item-3']
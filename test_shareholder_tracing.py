@@ -0,0 +1,74 @@
+import json
+import os
+import pytest
+from shareholder_config import Config
+from shareholder_main import EXIT_SUCCESS, main
+from shareholder_tracing import current_phase, phase, tracer, url_template
+
+
+@pytest.mark.parametrize('url,template', [
+    ('https://api.webflow.com/collections/5f1a2b3c4d5e6f7a8b9c0d1e/items/abc?offset=100&limit=100',
+     'api.webflow.com/collections/{id}/items/abc?offset={offset}&limit={limit}'),
+    ('http://127.0.0.1:8000/content/security/?orgnr=985279721&page=2',
+     '127.0.0.1:8000/content/security/?orgnr={orgnr}&page={page}'),
+    ('https://api.webflow.com/sites/42/publish', 'api.webflow.com/sites/{id}/publish'),
+    ('https://example.com/', 'example.com/'),
+])
+def test_url_template(url, template):
+    assert url_template(url) == template
+
+
+def test_phases_nest_and_restore():
+    assert current_phase() == 'other'
+    with phase('login'):
+        with phase('login.2fa'):
+            assert current_phase() == 'login.2fa'
+        assert current_phase() == 'login'
+    assert current_phase() == 'other'
+
+
+def phases(client):
+    return {(group['phase'], group['method'], group['template'].split('/', 1)[1]): group['count']
+            for group in tracer.summary() if group['client'] == client}
+
+
+def test_run_is_attributed_to_phases_and_reported(registry, webflow, state):
+    assert main([]) == EXIT_SUCCESS
+    assert phases('registry') == {
+        ('login', 'GET', 'login/'): 1,
+        ('login', 'POST', 'login/'): 1,
+        ('login.2fa', 'POST', 'login/2fa/'): 1,
+        ('login.2fa', 'GET', ''): 1,  # the logged-in check
+        ('fetch', 'GET', 'content/security/?orgnr={orgnr}'): 1,
+    }
+    assert phases('webflow')[('webflow.create', 'POST', 'collections/test-collection/items')] == \
+        Config.MAX_SHAREHOLDERS
+
+    with open(Config.TRACE_REPORT_PATH) as f:
+        report = json.load(f)
+    assert len(report['requests']) == sum(group['count'] for group in report['summary'])
+    assert report['metrics']['twofa_seconds'] >= 0
+    page = next(r for r in report['requests'] if r['phase'] == 'fetch')
+    assert page['status'] == 200 and page['bytes'] > 0 and page['client'] == 'registry'
+
+
+def test_lean_navigation_skips_the_dashboard_and_search(registry, webflow):
+    assert Config.LEAN_NAVIGATION  # on by default
+    assert main([]) == EXIT_SUCCESS
+    assert 'POST /' not in registry.stats.by_route
+    assert registry.stats.by_route['GET /'] == 1  # only the logged-in check
+    assert not any(group['phase'] == 'navigation' for group in tracer.summary())
+
+
+def test_full_navigation_when_lean_is_off(registry, webflow, monkeypatch):
+    monkeypatch.setattr(Config, 'LEAN_NAVIGATION', False)
+    assert main(['--force']) == EXIT_SUCCESS
+    assert registry.stats.by_route['POST /'] == 1
+    assert registry.stats.by_route['GET /'] == 2
+    assert {('navigation', 'GET', ''), ('navigation', 'POST', '')} <= set(phases('registry'))
+
+
+def test_no_report_without_a_path(state, monkeypatch):
+    monkeypatch.setattr(Config, 'TRACE_REPORT_PATH', '')
+    assert tracer.write_report() is None
+    assert not os.path.exists('shareholder-trace.json')
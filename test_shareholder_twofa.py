@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from standins import ImapStandIn
+from shareholder_config import Config
+from shareholder_scraper import ShareholderScraper
+from shareholder_twofa import FileCodeProvider, ImapCodeProvider, poll_until
+
+SENDER = 'noreply@aksjeeierregisteret.no'
+
+
+@pytest.fixture
+def mailbox():
+    server = ImapStandIn().start()
+    yield server
+    server.stop()
+
+
+def imap(mailbox):
+    return ImapCodeProvider('127.0.0.1', mailbox.port, mailbox.username, mailbox.password, use_ssl=False,
+                            folder='INBOX', sender=SENDER)
+
+
+def test_code_arriving_late_is_picked_up(mailbox):
+    mailbox.deliver(SENDER, 'Nyhetsbrev', 'Ingen kode her')
+    since = time.time()
+    timer = threading.Timer(0.3, mailbox.deliver, args=(SENDER, 'Engangskode', 'Din engangskode er 482913'))
+    timer.start()
+    started = time.monotonic()
+    assert imap(mailbox).wait_for_code(since, timeout=5) == '482913'
+    assert time.monotonic() - started < 3
+    # Only the code mail is marked read; the newsletter stays unread for its owner
+    assert [message['seen'] for message in mailbox.messages] == [False, True]
+
+
+def test_stale_and_used_codes_are_skipped(mailbox):
+    since = time.time()
+    mailbox.deliver(SENDER, 'Engangskode', 'Din engangskode er 111111', sent=datetime.now(timezone.utc) - timedelta(
+        minutes=30))
+    provider = imap(mailbox)
+    assert provider.poll(since) is None
+    mailbox.deliver(SENDER, 'Engangskode', 'Din engangskode er 222222')
+    assert provider.poll(since) == '222222'
+    assert provider.poll(since) is None  # the code mail was marked read
+    provider.close()
+
+
+def test_unparseable_date_is_accepted(mailbox):
+    mailbox.deliver(SENDER, 'Engangskode', 'Din engangskode er 333333')
+    with mailbox.lock:
+        message = mailbox.messages[-1]
+        message['raw'] = message['raw'].replace(b'Date: ', b'Date: not a date\r\nX-Original-Date: ', 1)
+    provider = imap(mailbox)
+    assert provider.poll(time.time()) == '333333'
+    provider.close()
+
+
+def test_file_counts_only_after_the_login_started(tmp_path):
+    path = tmp_path / 'twofa-code'
+    path.write_text('123456\n')
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    provider = FileCodeProvider(str(path))
+    since = time.time()
+    assert provider.poll(since) is None
+
+    path.write_text('Din kode: 654321\n')
+    os.utime(path, (since + 1, since + 1))
+    assert provider.poll(since) == '654321'
+    assert path.read_text() == ''  # emptied so the code is not used twice
+    assert provider.poll(since) is None
+
+
+def test_fifo_is_read_without_blocking_the_writer(tmp_path):
+    path = str(tmp_path / 'twofa-code')
+    os.mkfifo(path)
+    provider = FileCodeProvider(path)
+    since = time.time()
+    assert provider.poll(since) is None  # opens the read end, so the writer below does not hang
+    with open(path, 'w') as f:
+        f.write('777888\n')
+    assert provider.poll(since) == '777888'
+    provider.close()
+    assert provider.fd is None
+
+
+def test_poll_until_stops_at_the_deadline():
+    calls = []
+
+    def never():
+        calls.append(time.monotonic())
+        return None
+    started = time.monotonic()
+    assert poll_until(never, started + 0.3, initial=0.05, maximum=0.1) is None
+    assert 0.3 <= time.monotonic() - started < 0.5
+    assert 3 <= len(calls) <= 8
+    assert poll_until(lambda: 'code', started) == 'code'  # a ready value wins even past the deadline
+
+
+def test_login_waits_for_a_late_mailed_code(registry, mailbox, monkeypatch):
+    for name, value in {'TWOFA_CODE': None, 'TWOFA_PROVIDER': 'imap', 'TWOFA_TIMEOUT': 10,
+                        'TWOFA_IMAP_HOST': '127.0.0.1', 'TWOFA_IMAP_PORT': mailbox.port,
+                        'TWOFA_IMAP_USERNAME': mailbox.username, 'TWOFA_IMAP_PASSWORD': mailbox.password,
+                        'TWOFA_IMAP_SSL': False, 'TWOFA_SENDER': 'aksjeeierregisteret.no'}.items():
+        monkeypatch.setattr(Config, name, value)
+    registry.mailbox, registry.mail_delay = mailbox, 0.5
+    scraper = ShareholderScraper()
+    assert scraper.login()
+    assert scraper.twofa_seconds >= 0.5
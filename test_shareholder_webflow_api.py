@@ -0,0 +1,92 @@
+import os
+from decimal import Decimal
+import pytest
+from conftest import COLLECTION_ID
+from shareholder_config import Config
+from shareholder_main import EXIT_FAILURE, EXIT_SUCCESS, EXIT_UNCHANGED, main
+from shareholder_records import ShareholderRecord
+from shareholder_sync import assign_identities, plan_sync
+from shareholder_webflow_api import SitePublisher, WebflowAPI
+
+
+def nominee_table():
+    """Three rows under the same nominee name, as custodians often appear"""
+    return [ShareholderRecord(rank, 'NOMINEE BANK', '', 1000 * (4 - rank), Decimal('10.0000'))
+            for rank in range(1, 4)]
+
+
+def test_create_shareholder_item_uses_the_table_identity(webflow):
+    records = nominee_table()
+    identities = assign_identities([(r.surname_company, r.first_name) for r in records])
+    api = WebflowAPI()
+    for record, identity in zip(records, identities):
+        assert api.create_shareholder_item(record, identity)
+
+    items = list(webflow.collections[COLLECTION_ID].values())
+    assert len({item['slug'] for item in items}) == 3
+    # The items match plan_sync's identities, so the next sync has nothing to do
+    assert plan_sync(items, records).is_empty()
+
+
+def writes(server):
+    return {route: count for route, count in server.stats.by_route.items() if not route.startswith('GET')}
+
+
+def test_sync_writes_only_the_difference(webflow, monkeypatch):
+    monkeypatch.setattr(Config, 'WEBFLOW_MIRROR', False)
+    records = [ShareholderRecord(rank, f'HOLDER {rank} AS', '', 1000 * (6 - rank), Decimal('5.0000'))
+               for rank in range(1, 6)]
+    api = WebflowAPI()
+
+    assert api.sync_shareholders(records).created == 5
+    webflow.stats.reset()
+    result = api.sync_shareholders(records)
+    assert not result.changed and result.unchanged == 5
+    assert writes(webflow) == {}
+
+    current = records[:3] + [records[3]._replace(holdings=1)]
+    result = api.sync_shareholders(current)
+    assert (result.updated, result.created, result.deleted) == (1, 0, 1)
+    assert sorted(item['holdings'] for item in webflow.collections[COLLECTION_ID].values())[0] == '1'
+
+
+@pytest.fixture
+def site(registry, webflow, monkeypatch):
+    """Webflow stand-in with site publishing on; the registry is only there to pass config validation"""
+    monkeypatch.setattr(Config, 'WEBFLOW_SITE_ID', 'test-site')
+    return webflow
+
+
+def test_changed_collections_share_one_publish_per_flush(site):
+    publisher = SitePublisher()
+    for collection_id in ('first', 'second', 'third'):
+        publisher.mark_changed(collection_id)
+    assert site.publishes == 0
+    assert publisher.flush()
+    assert site.publishes == 1
+    assert publisher.flush()  # nothing owed any more
+    publisher.mark_changed('first')
+    assert publisher.flush()
+    assert site.publishes == 2
+
+
+def test_failed_publish_is_retried_by_resume(site):
+    publisher = SitePublisher()
+    publisher.mark_changed(COLLECTION_ID)
+    site.fail_publish = True
+    assert not publisher.flush()
+    assert os.path.exists(Config.PUBLISH_PENDING_PATH)
+
+    assert main(['--resume']) == EXIT_FAILURE  # still failing: the marker stays
+    assert os.path.exists(Config.PUBLISH_PENDING_PATH)
+    site.fail_publish = False
+    assert main(['--resume']) == EXIT_SUCCESS
+    assert site.publishes == 1
+    assert not os.path.exists(Config.PUBLISH_PENDING_PATH)
+
+
+def test_nothing_changed_publishes_nothing(site):
+    assert SitePublisher().flush()
+    assert main(['--resume']) == EXIT_UNCHANGED
+    assert site.publishes == 0
+    assert 'POST /sites/{id}/publish' not in site.stats.by_route